@@ -0,0 +1,199 @@
+# bench/bench_extractors.py
+# Microbenchmark of the listing-page extractors on a saved page corpus. Times each
+# extractor per page and the total parse cost per page, grouped by page kind
+# (zillow, idx, showingtime), so parser changes can be compared against a baseline.
+#
+#   python -m bench.bench_extractors --from-cassette prod.jsonl        # save real pages into the corpus
+#   python -m bench.bench_extractors --json before.json                 # measure
+#   python -m bench.bench_extractors --compare before.json              # measure and diff against it
+#
+# The corpus is bench/corpus/<kind>/*.html (git-ignored: real pages stay local). With
+# no saved pages, synthetic pages of each kind (Zillow pages at 1-3 MB) are used.
+
+import os, re, sys, json, time, argparse, statistics
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench.stub_server import listing_page, mls_for, STREET, CITY, STATE, ZIP
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.getenv("BENCH_CORPUS_DIR", os.path.join(HERE, "corpus"))
+KINDS = ("zillow", "idx", "showingtime")
+
+Page = Tuple[str, str, str]   # (kind, name, html)
+
+# ---------- Corpus ----------
+def kind_for_url(url: str) -> Optional[str]:
+    u = (url or "").lower()
+    if "zillow.com/homedetails/" in u: return "zillow"
+    if "showingtime.com" in u and "/print" in u: return "showingtime"
+    if any(k in u for k in ("homespotter", "idx", "/listing", "mls", "spark")): return "idx"
+    return None
+
+def load_corpus(directory: str = CORPUS_DIR) -> List[Page]:
+    pages = []
+    for kind in KINDS:
+        d = os.path.join(directory, kind)
+        if not os.path.isdir(d): continue
+        for name in sorted(os.listdir(d)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(d, name), encoding="utf-8", errors="ignore") as f:
+                    pages.append((kind, name, f.read()))
+    return pages
+
+def import_cassette(path: str, directory: str = CORPUS_DIR) -> int:
+    """Save every HTML page body from a recorded cassette (services/cassette.py) into the corpus."""
+    n = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            ctype = next((v for k, v in (e.get("headers") or {}).items() if k.lower() == "content-type"), "")
+            kind = kind_for_url(e.get("final_url") or e.get("url", ""))
+            if not kind or e.get("encoding") == "b64" or "html" not in ctype.lower() or int(e.get("status") or 0) != 200:
+                continue
+            d = os.path.join(directory, kind)
+            os.makedirs(d, exist_ok=True)
+            name = re.sub(r"[^A-Za-z0-9]+", "-", e["url"].split("://", 1)[-1]).strip("-")[:120] + ".html"
+            with open(os.path.join(d, name), "w", encoding="utf-8") as out:
+                out.write(e["body"])
+            n += 1
+    return n
+
+def _idx_page(n: int) -> str:
+    # Homespotter/IDX-style: address in visible markup, "MLS #:" label, a little JSON-LD, moderate size
+    body = "".join(f"<li class='feature'>Feature {i}: hardwood floors, updated kitchen</li>" for i in range(1500))
+    return (
+        f"<html><head><title>{n} {STREET} St, {CITY}, {STATE} {ZIP} - Listing</title>"
+        f"<meta name='description' content='3 bed 2 bath home in {CITY}.'>"
+        f"<script type='application/ld+json'>{{\"address\":{{\"streetAddress\":\"{n} {STREET} St\","
+        f"\"addressLocality\":\"{CITY}\",\"addressRegion\":\"{STATE}\",\"postalCode\":\"{ZIP}\"}}}}</script></head>"
+        f"<body><h1>{n} {STREET} St</h1><div class='mls'>MLS #: {mls_for(n)}</div><ul>{body}</ul></body></html>"
+    )
+
+def _showingtime_page(stops: int) -> str:
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{100 + i} {STREET} St, {CITY}, {STATE} {ZIP}</td>"
+        f"<td>{9 + i // 2}:{'30' if i % 2 else '00'} AM - {9 + (i + 1) // 2}:{'00' if i % 2 else '30'} AM</td>"
+        f"<td>#{700000 + i} | Confirmed</td></tr>\n"
+        for i in range(1, stops + 1)
+    )
+    return (
+        "<html><head><title>ShowingTime - Tour Details</title><style>td{padding:2px}</style></head><body>"
+        "<div>Agent Name<br>Brokerage</div><h2>Buyer's Tour - Saturday, March 8, 2025</h2><div>Jane Buyer</div>"
+        f"<table>{rows}</table></body></html>"
+    )
+
+def synthetic_corpus() -> List[Page]:
+    pages: List[Page] = []
+    for n, kb in ((101, 1024), (102, 2048), (103, 3072)):
+        pages.append(("zillow", f"synthetic-{kb // 1024}mb.html", listing_page(n, kb)))
+    for n in (201, 202):
+        pages.append(("idx", f"synthetic-{n}.html", _idx_page(n)))
+    pages.append(("showingtime", "synthetic-print.html", _showingtime_page(12)))
+    return pages
+
+# ---------- Extractors ----------
+def extractors() -> Dict[str, Callable[[str], object]]:
+    from services.resolver import extract_any_mls_id, extract_address_from_html, extract_title_or_desc, page_contains_mls
+    from services.enrich import parse_listing_meta, extract_zillow_first_image
+    return {
+        "extract_any_mls_id":         extract_any_mls_id,
+        "extract_address_from_html":  extract_address_from_html,
+        "extract_title_or_desc":      extract_title_or_desc,
+        "parse_listing_meta":         parse_listing_meta,
+        "extract_zillow_first_image": extract_zillow_first_image,
+        # a hit stops early; a miss scans every pattern over the whole page
+        "page_contains_mls[hit]":     lambda html: page_contains_mls(html, extract_any_mls_id(html) or "BX000000"),
+        "page_contains_mls[miss]":    lambda html: page_contains_mls(html, "ZZ9999999"),
+    }
+
+def _cold(fn: Callable[[str], object]) -> Callable[[str], object]:
+    """Each call pays for its own page scan (the extractors share one per page otherwise)."""
+    from services import html_scan
+    def run(html):
+        html_scan.clear_memo()
+        return fn(html)
+    return run
+
+def _all(ex: Dict[str, Callable[[str], object]]) -> Callable[[str], object]:
+    """Every extractor on one page, as resolution + enrichment run them (sharing one scan)."""
+    fns = [fn for label, fn in ex.items() if label != "page_contains_mls[miss]"]
+    return _cold(lambda html: [fn(html) for fn in fns])
+
+def time_call(fn: Callable[[str], object], html: str, *, min_time: float = 0.2, repeat: int = 5) -> float:
+    """Median seconds per call over `repeat` rounds of enough calls to fill `min_time`."""
+    t0 = time.perf_counter(); fn(html); once = time.perf_counter() - t0
+    number = max(1, int(min_time / max(once, 1e-6)))
+    rounds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number): fn(html)
+        rounds.append((time.perf_counter() - t0) / number)
+    return statistics.median(rounds)
+
+def run(pages: List[Page], *, min_time: float, repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    kind -> extractor -> mean ms per page; "mb" is the mean page size. "total" sums the
+    extractors timed separately, "all (one scan)" runs them together on one page.
+    """
+    ex = extractors()
+    per_kind: Dict[str, Dict[str, List[float]]] = {}
+    for kind, name, html in pages:
+        acc = per_kind.setdefault(kind, {"mb": []})
+        acc["mb"].append(len(html.encode("utf-8")) / 1e6)
+        total = 0.0
+        for label, fn in ex.items():
+            ms = time_call(_cold(fn), html, min_time=min_time, repeat=repeat) * 1000
+            acc.setdefault(label, []).append(ms)
+            if label != "page_contains_mls[miss]": total += ms
+        acc.setdefault("total", []).append(total)
+        acc.setdefault("all (one scan)", []).append(time_call(_all(ex), html, min_time=min_time, repeat=repeat) * 1000)
+    return {k: {label: round(statistics.mean(v), 4) for label, v in acc.items()} for k, acc in per_kind.items()}
+
+def print_report(result: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+    for kind, row in result.items():
+        print(f"\n[{kind}] mean page {row['mb']:.2f} MB")
+        for label, ms in row.items():
+            if label == "mb": continue
+            line = f"  {label:<28}{ms:>10.3f} ms"
+            base = (baseline or {}).get(kind, {}).get(label)
+            if base:
+                line += f"   (was {base:.3f} ms, {base / ms:.2f}x)" if ms else ""
+            print(line)
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Time the listing-page extractors on a saved page corpus.")
+    p.add_argument("--corpus", default=CORPUS_DIR, help="corpus directory with zillow/, idx/, showingtime/ subfolders")
+    p.add_argument("--from-cassette", metavar="CASSETTE", help="import HTML pages from a recorded cassette into the corpus, then exit")
+    p.add_argument("--synthetic", action="store_true", help="use synthetic pages even if a corpus exists")
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds of calls per timing round")
+    p.add_argument("--repeat", type=int, default=5, help="timing rounds per extractor and page (median is reported)")
+    p.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    p.add_argument("--compare", metavar="FILE", help="baseline JSON from an earlier --json run")
+    return p.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.from_cassette:
+        n = import_cassette(args.from_cassette, args.corpus)
+        print(f"saved {n} page(s) into {args.corpus}")
+        return 0
+    pages = [] if args.synthetic else load_corpus(args.corpus)
+    if not pages:
+        print("no saved pages found; using the synthetic corpus", file=sys.stderr)
+        pages = synthetic_corpus()
+    result = run(pages, min_time=args.min_time, repeat=args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("results")
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"pages": len(pages), "results": result}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
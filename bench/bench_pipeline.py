@@ -0,0 +1,161 @@
+# bench/bench_pipeline.py
+# End-to-end benchmark of the resolution pipeline against bench/stub_server.py.
+# Runs process_single_row (address / MLS rows), resolve_from_source_url (IDX listing
+# links) and enrich_results_async over synthetic batches and reports wall time,
+# throughput, p50/p95 per row and upstream calls per route.
+#
+#   python -m bench.bench_pipeline --sizes 10,100,1000 --latency 0.05 --error-rate 0.02
+#
+# Caches live in a throwaway directory and are cleared before every scenario (use
+# --warm to keep them), so each number is a cold run unless asked otherwise.
+
+import os, sys, json, time, asyncio, argparse, tempfile
+from typing import Any, Callable, Dict, List
+
+from bench.stub_server import StubConfig, StubServer, CITY, STATE, ZIP, STREET, IDX_HOST, SHORT_HOST, mls_for, idx_url, short_url, homedetails_url
+
+SCENARIOS = ("process_single_row", "resolve_from_source_url", "enrich_results_async")
+
+def make_rows(n: int, *, mls_share: float = 0.5) -> List[Dict[str, str]]:
+    """Address rows; every 1/mls_share-th row also carries its MLS id."""
+    every = max(1, round(1 / mls_share)) if mls_share > 0 else 0
+    rows = []
+    for i in range(1, n + 1):
+        row = {"address": f"{i} {STREET} St, {CITY}, {STATE} {ZIP}"}
+        if every and i % every == 0: row["mls #"] = mls_for(i)
+        rows.append(row)
+    return rows
+
+def make_links(n: int, *, short: bool = False) -> List[str]:
+    return [(short_url if short else idx_url)(i) for i in range(1, n + 1)]
+
+def percentile(xs: List[float], p: float) -> float:
+    if not xs: return 0.0
+    xs = sorted(xs)
+    k = (len(xs) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def _env(stub_base: str, cache_dir: str) -> None:
+    # Must run before the services are imported: they read keys and endpoints at import.
+    os.environ["AA_CACHE_DIR"] = cache_dir
+    os.environ.setdefault("BING_API_KEY", "bench")
+    os.environ.setdefault("AZURE_SEARCH_API_KEY", "bench")
+    os.environ.setdefault("AZURE_SEARCH_INDEX", "bench")
+    os.environ["AZURE_SEARCH_ENDPOINT"] = stub_base
+    os.environ["HTTP_ROUTES"] = ",".join(f"{h}={stub_base}" for h in ("api.bing.microsoft.com", "www.zillow.com", IDX_HOST, SHORT_HOST))
+
+def _reset(warm: bool) -> None:
+    from services import resolution_cache, negative_cache, search_cache, page_cache, listing, stage_stats, shortlinks
+    if warm: return
+    resolution_cache.clear(); negative_cache.clear(); search_cache.clear(); page_cache.clear(); listing.clear(); stage_stats.clear()
+    shortlinks.clear()
+
+def _timed(fn: Callable, times: List[float]) -> Callable:
+    def run(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return fn(*a, **kw)
+        finally:
+            times.append(time.perf_counter() - t0)
+    return run
+
+def _timed_async(fn: Callable, times: List[float]) -> Callable:
+    async def run(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return await fn(*a, **kw)
+        finally:
+            times.append(time.perf_counter() - t0)
+    return run
+
+def run_scenario(name: str, size: int, stub: StubServer, args: argparse.Namespace) -> Dict[str, Any]:
+    from services import resolver, listing, enrich
+    from services.batch import resolve_rows
+
+    defaults = {"city": "", "state": "", "zip": ""}
+    row_opts = dict(land_mode=True, defaults=defaults, require_state=True, mls_first=True, max_candidates=20, use_cache=True)
+    times: List[float] = []
+
+    if name == "enrich_results_async":
+        # enrichment works on resolved rows; build them without touching the stub
+        results = [{"input_address": r["address"], "zillow_url": resolver.canonicalize_zillow(u)[0]}
+                   for r, u in zip(make_rows(size), (homedetails_url(i) for i in range(1, size + 1)))]
+    _reset(args.warm)
+    before, errors_before = stub.snapshot(), dict(stub.cfg.errors)
+    t0 = time.perf_counter()
+    if name == "process_single_row":
+        out = resolve_rows(make_rows(size), _timed(lambda row: resolver.process_single_row(row, **row_opts), times),
+                           max_workers=args.workers)
+    elif name == "resolve_from_source_url":
+        out = resolve_rows([{"source_url": u} for u in make_links(size, short=args.short_links)],
+                           _timed(lambda row: dict(zip(("zillow_url", "input_address"),
+                                                       resolver.resolve_from_source_url(row["source_url"], defaults))), times),
+                           max_workers=args.workers)
+    else:
+        real = listing.get_listing_document_async
+        listing.get_listing_document_async = _timed_async(real, times)
+        try:
+            out = asyncio.run(enrich.enrich_results_async(results))
+        finally:
+            listing.get_listing_document_async = real
+    wall = time.perf_counter() - t0
+    after = stub.snapshot()
+    calls = {k: after.get(k, 0) - before.get(k, 0) for k in sorted(set(after) | set(before))}
+    ok = sum(1 for r in out if "/homedetails/" in (r.get("zillow_url") or ""))
+    return {
+        "scenario": name, "rows": size, "wall_s": round(wall, 3), "rows_per_s": round(size / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(times, 0.50) * 1000, 1), "p95_ms": round(percentile(times, 0.95) * 1000, 1),
+        "homedetails": ok, "calls": {k: v for k, v in calls.items() if v}, "calls_per_row": round(sum(calls.values()) / size, 2),
+        "injected_errors": sum(stub.cfg.errors.values()) - sum(errors_before.values()),
+    }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark the resolution pipeline against a local stub of Bing, Azure and Zillow.")
+    p.add_argument("--sizes", default="10,100,1000", help="comma-separated batch sizes (default 10,100,1000)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    p.add_argument("--workers", type=int, default=8, help="rows in parallel for the thread-pool scenarios")
+    p.add_argument("--latency", type=float, default=0.05, help="stub latency per call, seconds")
+    p.add_argument("--jitter", type=float, default=0.02, help="+/- latency jitter, seconds")
+    p.add_argument("--error-rate", type=float, default=0.0, help="share of stub calls answered 503")
+    p.add_argument("--azure-hit-rate", type=float, default=0.5)
+    p.add_argument("--bing-hit-rate", type=float, default=0.9)
+    p.add_argument("--page-kb", type=int, default=300, help="size of each homedetails page")
+    p.add_argument("--rate-limits", action="store_true", help="keep the production per-upstream rate limits")
+    p.add_argument("--short-links", action="store_true", help="start resolve_from_source_url from short links to the listings")
+    p.add_argument("--warm", action="store_true", help="don't clear caches between scenarios")
+    p.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    return p.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"unknown scenario(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    cfg = StubConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     azure_hit_rate=args.azure_hit_rate, bing_hit_rate=args.bing_hit_rate, page_kb=args.page_kb)
+    report = []
+    with StubServer(cfg) as stub, tempfile.TemporaryDirectory(prefix="aa-bench-") as cache_dir:
+        _env(stub.base, cache_dir)
+        from services import ratelimit
+        if not args.rate_limits:
+            for name in ratelimit.RATE_LIMITS:
+                ratelimit.configure_rate_limit(name, 0, 1)
+        print(f"{'scenario':<26}{'rows':>6}{'wall s':>9}{'rows/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'hd':>6}{'calls/row':>10}{'errors':>8}  calls")
+        for size in sizes:
+            for name in scenarios:
+                r = run_scenario(name, size, stub, args)
+                report.append(r)
+                calls = " ".join(f"{k}={v}" for k, v in r["calls"].items())
+                print(f"{r['scenario']:<26}{r['rows']:>6}{r['wall_s']:>9}{r['rows_per_s']:>9}{r['p50_ms']:>9}"
+                      f"{r['p95_ms']:>9}{r['homedetails']:>6}{r['calls_per_row']:>10}{r['injected_errors']:>8}  {calls}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": report}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# bench/stub_server.py
+# Local stand-in for the upstreams the resolver talks to: Bing web/custom search JSON,
+# Azure Search docs/search, Zillow homedetails pages, /homes/..._rb/ search pages,
+# IDX listing pages (the links resolve_from_source_url starts from) and a link
+# shortener redirecting to them.
+# Answers are derived from the synthetic row number in the query, so a batch from
+# bench_pipeline.make_rows() resolves deterministically. Latency, jitter and error
+# rate are configurable; every request is counted per route.
+
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+IDX_HOST = "idx.example.com"
+SHORT_HOST = "l.hms.pt"
+STREET = "Bench"
+CITY, STATE, ZIP = "Raleigh", "NC", "27601"
+
+RE_ROW = re.compile(rf"\b(\d+)\s+{STREET}\b", re.I)
+RE_MLS = re.compile(r"\bBX(\d{6})\b", re.I)
+RE_SLUG_ROW = re.compile(rf"/(\d+)-{STREET}-", re.I)
+
+def zpid_for(n: int) -> int:
+    return 100000 + n
+
+def homedetails_url(n: int) -> str:
+    return f"https://www.zillow.com/homedetails/{n}-{STREET}-St-{CITY}-{STATE}-{ZIP}/{zpid_for(n)}_zpid/"
+
+def mls_for(n: int) -> str:
+    return f"BX{n:06d}"
+
+def idx_url(n: int) -> str:
+    return f"https://{IDX_HOST}/listing/{n}-{STREET}-St/"
+
+def short_url(n: int) -> str:
+    """A short link to row n's IDX page; every third one goes straight to its Zillow page."""
+    return f"https://{SHORT_HOST}/s/{n}"
+
+def short_target(n: int) -> str:
+    return homedetails_url(n) if n % 3 == 0 else idx_url(n)
+
+def _unit(n: int, salt: str) -> float:
+    """Stable pseudo-random number in [0, 1) per row, so hit/miss patterns repeat across runs."""
+    return int(hashlib.sha1(f"{salt}:{n}".encode()).hexdigest()[:8], 16) / 0x100000000
+
+class StubConfig:
+    def __init__(self, *, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 azure_hit_rate: float = 0.5, bing_hit_rate: float = 0.9, page_kb: int = 300, seed: int = 7):
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.azure_hit_rate, self.bing_hit_rate, self.page_kb = azure_hit_rate, bing_hit_rate, page_kb
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+
+def listing_page(n: int, page_kb: int) -> str:
+    """
+    A homedetails page shaped like Zillow's: JSON-LD address, the listing record inside
+    __NEXT_DATA__'s JSON-encoded gdpClientCache, a nearby-homes widget with its own
+    prices and descriptions ahead of it, photos and filler.
+    """
+    addr = f"{n} {STREET} St"
+    ld = {"@type": "SingleFamilyResidence", "address": {"streetAddress": addr, "addressLocality": CITY,
+          "addressRegion": STATE, "postalCode": ZIP}}
+    data = {"zpid": zpid_for(n), "mlsid": mls_for(n), "attributionInfo": {"mlsId": mls_for(n)},
+            "address": {"streetAddress": addr, "city": CITY, "state": STATE, "zipcode": ZIP},
+            "price": 250000 + n * 100, "homeStatus": "FOR_SALE", "bedrooms": 3, "bathrooms": 2, "livingArea": 1500 + n % 900,
+            "description": f"Updated ranch at {addr}. New roof and HVAC in 2022. Fenced yard, no HOA. Close to schools."}
+    nearby = [{"zpid": zpid_for(n + k), "price": 199000 + k, "homeStatus": "RECENTLY_SOLD", "bedrooms": 2, "bathrooms": 1,
+               "livingArea": 900 + k, "description": f"Nearby home {k}"} for k in range(1, 4)]
+    cache = {f'ForSaleShopperPlatformFullRenderQuery{{"zpid":{zpid_for(n)}}}': {"property": data}}
+    next_data = {"props": {"pageProps": {"componentProps": {"gdpClientCache": json.dumps(cache)}}}}
+    img = f"https://photos.zillowstatic.com/fp/{hashlib.md5(str(n).encode()).hexdigest()}-cc_ft_960.jpg"
+    head = (
+        f"<!doctype html><html><head><title>{addr}, {CITY}, {STATE} {ZIP} | MLS# {mls_for(n)} | Zillow</title>"
+        f"<meta property=\"og:title\" content=\"{addr}, {CITY}, {STATE} {ZIP}\">"
+        f"<meta property=\"og:image\" content=\"{img}\">"
+        f"<meta name=\"description\" content=\"{data['description']}\">"
+        f"<script type=\"application/ld+json\">{json.dumps(ld)}</script></head><body>"
+        f"<img src=\"{img}\" alt=\"\">"
+        f"<script type=\"application/json\" data-widget=\"nearby\">{json.dumps({'nearbyHomes': nearby})}</script>"
+    )
+    tail = f"<script id=\"__NEXT_DATA__\" type=\"application/json\">{json.dumps(next_data)}</script></body></html>"
+    filler_unit = "<div class=\"x\"><span>Lorem ipsum dolor sit amet, nearby homes and price history.</span></div>\n"
+    filler = filler_unit * max(0, (page_kb * 1024 - len(head) - len(tail)) // len(filler_unit))
+    return head + filler + tail
+
+def search_page(n: Optional[int]) -> str:
+    links = f'<a href="{homedetails_url(n)}">{n} {STREET} St</a>' if n is not None else ""
+    return f"<!doctype html><html><head><title>Homes for sale</title></head><body>{links}</body></html>"
+
+def make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: str, ctype: str) -> None:
+            raw = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            try:
+                self.wfile.write(raw)
+            except (BrokenPipeError, ConnectionResetError):
+                pass   # client hung up early (streamed fetches stop once they have what they need)
+
+        def _route(self, path: str) -> str:
+            if path.startswith("/v7.0/"): return "bing"
+            if "/docs/search" in path: return "azure"
+            if path.startswith("/homedetails/"): return "zillow_homedetails"
+            if path.startswith("/homes/"): return "zillow_rb"
+            if path.startswith("/listing/"): return "idx"
+            if path.startswith("/s/"): return "short"
+            return "other"
+
+        def _begin(self, route: str) -> bool:
+            """Count, sleep and maybe fail; False means an error response was sent."""
+            with cfg.lock:
+                cfg.calls[route] += 1
+                delay = max(0.0, cfg.latency + cfg.rng.uniform(-cfg.jitter, cfg.jitter))
+                fail = cfg.rng.random() < cfg.error_rate
+                if fail: cfg.errors[route] += 1
+            if delay: time.sleep(delay)
+            if fail:
+                self._send(503, "upstream unavailable", "text/plain")
+                return False
+            return True
+
+        def _redirect(self, location: str) -> None:
+            self.send_response(301)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_HEAD(self):
+            parts = urlsplit(self.path)
+            route = self._route(parts.path)
+            if route != "short":
+                # like many origins: no HEAD support
+                self.send_response(405); self.send_header("Content-Length", "0"); self.end_headers()
+                return
+            if not self._begin(route): return
+            m = re.match(r"^/s/(\d+)$", parts.path)
+            if not m:
+                self.send_response(404); self.send_header("Content-Length", "0"); self.end_headers()
+                return
+            self._redirect(short_target(int(m.group(1))))
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            route = self._route(parts.path)
+            if not self._begin(route): return
+            if route == "short":
+                m = re.match(r"^/s/(\d+)$", parts.path)
+                return self._redirect(short_target(int(m.group(1)))) if m else self._send(404, "not found", "text/plain")
+            if route == "bing":
+                q = (parse_qs(parts.query).get("q") or [""])[0]
+                m = RE_ROW.search(q) or RE_MLS.search(q)
+                n = int(m.group(1)) if m else None
+                hits = []
+                if n is not None and _unit(n, "bing") < cfg.bing_hit_rate:
+                    hits.append({"name": f"{n} {STREET} St", "url": homedetails_url(n)})
+                hits.append({"name": "Homes for sale", "url": f"https://www.zillow.com/homes/{CITY}-{STATE}_rb/"})
+                return self._send(200, json.dumps({"webPages": {"value": hits}}), "application/json")
+            if route == "zillow_homedetails":
+                m = RE_SLUG_ROW.search(parts.path)
+                if not m: return self._send(404, "not found", "text/plain")
+                return self._send(200, listing_page(int(m.group(1)), cfg.page_kb), "text/html; charset=utf-8")
+            if route == "idx":
+                m = RE_SLUG_ROW.search(parts.path)
+                if not m: return self._send(404, "not found", "text/plain")
+                return self._send(200, listing_page(int(m.group(1)), min(cfg.page_kb, 100)), "text/html; charset=utf-8")
+            if route == "zillow_rb":
+                m = RE_SLUG_ROW.search(parts.path)
+                return self._send(200, search_page(int(m.group(1)) if m else None), "text/html; charset=utf-8")
+            self._send(404, "not found", "text/plain")
+
+        def do_POST(self):
+            parts = urlsplit(self.path)
+            route = self._route(parts.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if not self._begin(route): return
+            if route != "azure": return self._send(404, "not found", "text/plain")
+            try:
+                q = json.loads(body or b"{}").get("search", "")
+            except ValueError:
+                q = ""
+            m = RE_ROW.search(q)
+            n = int(m.group(1)) if m else None
+            value = [{"document": {"zillow_url": homedetails_url(n)}}] if n is not None and _unit(n, "azure") < cfg.azure_hit_rate else []
+            self._send(200, json.dumps({"value": value}), "application/json")
+
+    return Handler
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)): return
+        super().handle_error(request, client_address)
+
+class StubServer:
+    """ThreadingHTTPServer on 127.0.0.1 in a daemon thread; `base` is its URL."""
+
+    def __init__(self, cfg: StubConfig, port: int = 0):
+        self.cfg = cfg
+        self.httpd = _Server(("127.0.0.1", port), make_handler(cfg))
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.cfg.lock:
+            return dict(self.cfg.calls)
@@ -1,6 +1,15 @@
-import streamlit as st
+# core/cache.py
+# cache_data / cache_resource: Streamlit's own decorators when the process is a
+# Streamlit app, plain in-process memos otherwise -- so the services the CLI and the
+# benchmarks import never pull in streamlit.
+
+import sys
+import time
+import threading
+import functools
 
 def safe_rerun():
+    import streamlit as st
     try:
         st.rerun()
     except Exception:
@@ -9,6 +18,50 @@ def safe_rerun():
         except Exception:
             pass
 
-# Expose aliases so you can use from core.cache import cache_data / cache_resource
-cache_data = st.cache_data
-cache_resource = st.cache_resource
+def _streamlit():
+    """The streamlit module when a Streamlit runtime is running, else None."""
+    st = sys.modules.get("streamlit")
+    try:
+        return st if st is not None and st.runtime.exists() else None
+    except Exception:
+        return None
+
+def _memo(fn, ttl=None, once=False):
+    # `once`: build under the lock, so a shared resource is only ever created once
+    ttl = ttl.total_seconds() if hasattr(ttl, "total_seconds") else ttl
+    memo, lock = {}, threading.Lock()
+
+    def fresh(hit, now):
+        return hit is not None and (ttl is None or now - hit[0] < ttl)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kw):
+        key = (args, tuple(sorted(kw.items())))
+        now = time.monotonic()
+        with lock:
+            hit = memo.get(key)
+            if fresh(hit, now): return hit[1]
+            if once:
+                value = fn(*args, **kw)
+                memo[key] = (now, value)
+                return value
+        value = fn(*args, **kw)
+        with lock:
+            memo[key] = (now, value)
+        return value
+
+    wrapper.clear = memo.clear
+    return wrapper
+
+def _decorator(name, once):
+    def decorate(fn=None, **opts):
+        def wrap(f):
+            st = _streamlit()
+            if st is not None: return getattr(st, name)(**opts)(f)
+            return _memo(f, opts.get("ttl"), once=once)
+        return wrap(fn) if callable(fn) else wrap
+    return decorate
+
+# Use as `from core.cache import cache_data, cache_resource`, with or without arguments
+cache_data = _decorator("cache_data", once=False)
+cache_resource = _decorator("cache_resource", once=True)
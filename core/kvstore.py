@@ -0,0 +1,166 @@
+# core/kvstore.py
+# Small disk-backed key/value store (SQLite) with per-entry TTL, LRU eviction and
+# hit/miss counters. Each cache in the app is one namespace inside the same file.
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("AA_CACHE_DIR", os.path.join(os.path.dirname(HERE), ".cache"))
+CACHE_DB  = os.path.join(CACHE_DIR, "cache.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns          TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    expires_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE INDEX IF NOT EXISTS kv_ns_access ON kv (ns, last_access);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+def _conn(path: str) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    c = conns.get(path)
+    if c is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        c = sqlite3.connect(path, timeout=30, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        with _init_lock:
+            if path not in _initialized:
+                c.executescript(_SCHEMA)
+                _initialized.add(path)
+        conns[path] = c
+    return c
+
+class KVStore:
+    """
+    One namespace of the on-disk cache. Values are JSON-serialisable.
+    `max_entries` / `max_bytes` bound the namespace; least recently used rows go first.
+    """
+
+    def __init__(self, ns: str, *, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 path: Optional[str] = None, evict_every: int = 100):
+        self.ns = ns
+        self.path = path or CACHE_DB
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---- reads/writes
+    def get(self, key: str, *, touch: bool = True, count: bool = True) -> Optional[Any]:
+        now = time.time()
+        try:
+            c = _conn(self.path)
+            row = c.execute("SELECT value, expires_at FROM kv WHERE ns=? AND key=?", (self.ns, key)).fetchone()
+            if row and row[1] >= now:
+                if touch:
+                    c.execute("UPDATE kv SET last_access=? WHERE ns=? AND key=?", (now, self.ns, key))
+                if count: self.record(hit=True)
+                return json.loads(row[0])
+            if row:
+                c.execute("DELETE FROM kv WHERE ns=? AND key=?", (self.ns, key))
+        except Exception:
+            pass
+        if count: self.record(hit=False)
+        return None
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """Return the stored value even if expired (used for revalidation)."""
+        try:
+            row = _conn(self.path).execute("SELECT value FROM kv WHERE ns=? AND key=?", (self.ns, key)).fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception:
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        try:
+            blob = json.dumps(value, separators=(",", ":"))
+            _conn(self.path).execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, size, expires_at, last_access) VALUES (?,?,?,?,?,?)",
+                (self.ns, key, blob, len(blob), now + float(ttl), now),
+            )
+        except Exception:
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            _conn(self.path).execute("DELETE FROM kv WHERE ns=? AND key=?", (self.ns, key))
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        try:
+            _conn(self.path).execute("DELETE FROM kv WHERE ns=?", (self.ns,))
+        except Exception:
+            pass
+        with self._lock:
+            self.hits = self.misses = 0
+
+    # ---- eviction
+    def evict(self) -> int:
+        """Drop expired rows, then LRU rows until the namespace fits its bounds."""
+        removed = 0
+        try:
+            c = _conn(self.path)
+            removed += c.execute("DELETE FROM kv WHERE ns=? AND expires_at<?", (self.ns, time.time())).rowcount
+            if self.max_entries:
+                n = c.execute("SELECT COUNT(*) FROM kv WHERE ns=?", (self.ns,)).fetchone()[0]
+                if n > self.max_entries:
+                    removed += c.execute(
+                        "DELETE FROM kv WHERE ns=? AND key IN (SELECT key FROM kv WHERE ns=? ORDER BY last_access ASC LIMIT ?)",
+                        (self.ns, self.ns, n - self.max_entries),
+                    ).rowcount
+            if self.max_bytes:
+                total = c.execute("SELECT COALESCE(SUM(size),0) FROM kv WHERE ns=?", (self.ns,)).fetchone()[0]
+                if total > self.max_bytes:
+                    over = total - self.max_bytes
+                    victims, freed = [], 0
+                    for key, size in c.execute("SELECT key, size FROM kv WHERE ns=? ORDER BY last_access ASC", (self.ns,)):
+                        victims.append((self.ns, key)); freed += size
+                        if freed >= over: break
+                    c.executemany("DELETE FROM kv WHERE ns=? AND key=?", victims)
+                    removed += len(victims)
+        except Exception:
+            pass
+        return removed
+
+    # ---- counters
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit: self.hits += 1
+            else:   self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        entries = size = 0
+        try:
+            entries, size = _conn(self.path).execute(
+                "SELECT COUNT(*), COALESCE(SUM(size),0) FROM kv WHERE ns=?", (self.ns,)
+            ).fetchone()
+        except Exception:
+            pass
+        return {"hits": self.hits, "misses": self.misses, "entries": int(entries), "bytes": int(size)}
@@ -0,0 +1,157 @@
+# resolve_cli.py
+# Headless batch resolver: the Run tab's pipeline (resolve -> homedetails upgrade ->
+# enrich -> thumbnail) over a CSV, without a browser session. Rows are written as they
+# finish (in input order), so a long nightly run can be tailed or cut short safely.
+#
+#   python resolve_cli.py listings.csv -o out.jsonl --concurrency 12 --row-deadline 30
+#
+# Keys come from the environment (BING_API_KEY, AZURE_SEARCH_*, BITLY_TOKEN, ...).
+
+import sys, csv, json, time, asyncio, argparse
+from typing import Any, Dict, List, Optional, TextIO
+
+from utils.address import URL_KEYS, extract_components, get_first_by_keys, is_probable_url
+from services.resolver_async import resolve_enrich_rows_async
+from services.deadline import ROW_DEADLINE, BATCH_DEADLINE, BUDGET_EXHAUSTED
+from services import resolution_cache, cassette
+from services.journal import Journal
+
+# Same row options the Run tab resolves with.
+ROW_OPTIONS = dict(delay=0.45, require_state=True, mls_first=True, default_mls_name="", max_candidates=20)
+
+CSV_FIELDS = [
+    "row", "input_address", "mls_id", "zillow_url", "status", "image_url",
+    "price", "beds", "baths", "sqft", "summary", "highlights", "remarks", "csv_photo",
+]
+
+def read_rows(path: str) -> List[Dict[str, Any]]:
+    """CSV rows from `path` ("-" = stdin). A one-column file without a known header is read as addresses/links."""
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig", errors="ignore")
+    try:
+        text = f.read()
+    finally:
+        if f is not sys.stdin: f.close()
+    rows = list(csv.DictReader(text.splitlines()))
+    if rows and not any(_usable(r) for r in rows[:20]):
+        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+        rows = [{"source_url": ln} if is_probable_url(ln) else {"address": ln} for ln in lines]
+    return rows
+
+def _usable(row: Dict[str, Any]) -> bool:
+    url = get_first_by_keys(row, URL_KEYS) or row.get("source_url", "")
+    if url and is_probable_url(url): return True
+    comp = extract_components(row)
+    return bool(comp["street_raw"] or comp["mls_id"])
+
+class OrderedWriter:
+    """Buffers out-of-order results and flushes every row whose predecessors are done."""
+
+    def __init__(self, out: TextIO, fmt: str):
+        self.out, self.fmt, self.next, self.pending = out, fmt, 0, {}
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self.csv.writeheader()
+
+    def add(self, i: int, res: Dict[str, Any]) -> None:
+        self.pending[i] = res
+        while self.next in self.pending:
+            self._write(self.next, self.pending.pop(self.next))
+            self.next += 1
+        self.out.flush()
+
+    def _write(self, i: int, res: Dict[str, Any]) -> None:
+        rec = {"row": i, **res}
+        if self.csv is not None:
+            rec = {k: ("; ".join(v) if isinstance(v, list) else v) for k, v in rec.items()}
+            self.csv.writerow(rec)
+        else:
+            self.out.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Resolve a CSV of addresses, MLS ids or links to Zillow listings.")
+    p.add_argument("input", help="CSV file, or - for stdin")
+    p.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    p.add_argument("--format", choices=["csv", "jsonl"], help="default: from the output extension, else jsonl")
+    p.add_argument("--concurrency", type=int, default=8, help="rows in flight at once (default 8)")
+    p.add_argument("--no-cache", action="store_true", help="ignore and don't write the resolution cache")
+    p.add_argument("--retry-misses", action="store_true", help="search again for rows that recently found no listing")
+    p.add_argument("--row-deadline", type=float, default=ROW_DEADLINE, help=f"seconds per row, 0 = none (default {ROW_DEADLINE:g})")
+    p.add_argument("--batch-deadline", type=float, default=BATCH_DEADLINE, help=f"seconds for the whole run, 0 = none (default {BATCH_DEADLINE:g})")
+    p.add_argument("--no-enrich", action="store_true", help="skip price/beds/remarks extraction")
+    p.add_argument("--no-thumbnails", action="store_true", help="skip thumbnail lookup")
+    p.add_argument("--no-land-mode", action="store_true", help="don't generate lot/land address variants")
+    p.add_argument("--no-resume", action="store_true", help="ignore the checkpoint journal of an interrupted run of this input")
+    p.add_argument("--state", default="", help="default state for rows without one")
+    p.add_argument("--city", default="", help="default city for rows without one")
+    p.add_argument("--record", metavar="CASSETTE", help="record all HTTP traffic to this cassette file")
+    p.add_argument("--replay", metavar="CASSETTE", help="answer HTTP from this cassette instead of the network")
+    p.add_argument("--latency", type=float, default=0.0, help="replay: seconds added to every call")
+    p.add_argument("--latency-scale", type=float, default=0.0, help="replay: multiple of the recorded upstream time added to every call")
+    p.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    return p.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.record and args.replay:
+        print("--record and --replay are exclusive.", file=sys.stderr)
+        return 2
+    if args.record or args.replay:
+        cassette.use(args.record or args.replay, cassette.RECORD if args.record else cassette.REPLAY,
+                     latency=args.latency, latency_scale=args.latency_scale)
+
+    rows = read_rows(args.input)
+    if not rows:
+        print("No rows to resolve.", file=sys.stderr)
+        return 1
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    writer = OrderedWriter(out, fmt)
+    t0 = time.monotonic()
+    defaults = {"city": args.city, "state": args.state, "zip": ""}
+    row_kw = dict(ROW_OPTIONS, use_cache=not args.no_cache, land_mode=not args.no_land_mode, force=args.retry_misses)
+
+    journal = Journal(
+        rows, dict(row_kw, defaults=defaults, enrich=not args.no_enrich, thumbnails=not args.no_thumbnails),
+        resume=not args.no_resume,
+    )
+    if journal.resumed and not args.quiet:
+        print(f"resuming: {journal.resumed}/{len(rows)} row(s) already done ({journal.path})", file=sys.stderr)
+
+    def progress(done: int, total: int) -> None:
+        if not args.quiet and (done == total or done % 25 == 0):
+            print(f"resolved {done}/{total} ({time.monotonic() - t0:.1f}s)", file=sys.stderr)
+
+    try:
+        results = asyncio.run(resolve_enrich_rows_async(
+            rows,
+            defaults=defaults,
+            enrich=not args.no_enrich,
+            thumbnails=not args.no_thumbnails,
+            concurrency=args.concurrency,
+            on_progress=progress,
+            on_result=writer.add,
+            batch_budget=args.batch_deadline,
+            budget=args.row_deadline,
+            journal=journal,
+            **row_kw,
+        ))
+    finally:
+        if out is not sys.stdout: out.close()
+
+    if not args.quiet:
+        n_hd = sum(1 for r in results if "/homedetails/" in (r.get("zillow_url") or ""))
+        n_exhausted = sum(1 for r in results if r.get("status") == BUDGET_EXHAUSTED)
+        rc = resolution_cache.stats()
+        print(
+            f"{len(results)} row(s) in {time.monotonic() - t0:.1f}s: {n_hd} homedetails, "
+            f"{n_exhausted} out of time budget; cache {rc['hits']} hits / {rc['misses']} misses",
+            file=sys.stderr,
+        )
+        if cassette.active() is not None:
+            cs = cassette.active().stats()
+            print(f"cassette ({cs['mode']}): {cs['calls']} call(s), {cs['misses']} miss(es)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
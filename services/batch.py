@@ -0,0 +1,258 @@
+# services/batch.py
+# Bounded worker pool for resolving a whole upload, plus per-host concurrency caps
+# shared by every fetch helper so a wide pool does not hammer a single upstream.
+# Each slot also pays the upstream's token bucket (services/ratelimit.py).
+
+import os
+import asyncio
+import contextvars
+import threading
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from services.ratelimit import throttle, throttle_async
+
+DEFAULT_MAX_WORKERS    = int(os.getenv("RESOLVE_MAX_WORKERS", "8"))
+DEFAULT_PER_HOST_LIMIT = int(os.getenv("RESOLVE_PER_HOST_LIMIT", "4"))
+CONFIRM_FAN_OUT        = int(os.getenv("CONFIRM_FAN_OUT", "4"))
+
+# ---------- Per-host limits ----------
+_HOST_LOCK = threading.Lock()
+_HOST_SEMS: Dict[str, threading.BoundedSemaphore] = {}
+_HOST_OVERRIDES: Dict[str, int] = {}
+_ASYNC_SEMS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+_host_default = DEFAULT_PER_HOST_LIMIT
+
+def _host_of(url: str) -> str:
+    try:
+        return (urlparse(url or "").hostname or "").lower()
+    except Exception:
+        return ""
+
+def configure_host_limits(default: Optional[int] = None, overrides: Optional[Dict[str, int]] = None) -> None:
+    """
+    Set the max number of in-flight requests per host (process-wide).
+    `overrides` maps a hostname (e.g. "www.zillow.com") to its own cap.
+    Requests already holding a slot finish on the old semaphore.
+    """
+    global _host_default
+    with _HOST_LOCK:
+        if default is not None:
+            _host_default = max(1, int(default))
+        if overrides is not None:
+            _HOST_OVERRIDES.clear()
+            _HOST_OVERRIDES.update({h.lower(): max(1, int(n)) for h, n in overrides.items()})
+        _HOST_SEMS.clear()
+        _ASYNC_SEMS.clear()
+
+def host_limit(host: str) -> int:
+    return _HOST_OVERRIDES.get((host or "").lower(), _host_default)
+
+def _host_sem(host: str) -> threading.BoundedSemaphore:
+    with _HOST_LOCK:
+        sem = _HOST_SEMS.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(host_limit(host))
+            _HOST_SEMS[host] = sem
+        return sem
+
+@contextmanager
+def host_slot(url: str) -> Iterator[None]:
+    """
+    Hold one of the per-host slots for the duration of a request to `url`.
+    The upstream's rate limit is paid first, so a throttled caller does not sit on a slot.
+    """
+    throttle(url)
+    host = _host_of(url)
+    if not host:
+        yield
+        return
+    sem = _host_sem(host)
+    sem.acquire()
+    try:
+        yield
+    finally:
+        sem.release()
+
+@asynccontextmanager
+async def async_host_slot(url: str) -> AsyncIterator[None]:
+    """asyncio twin of host_slot(); limits are shared, semaphores are per event loop."""
+    await throttle_async(url)
+    host = _host_of(url)
+    if not host:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    with _HOST_LOCK:
+        sems = _ASYNC_SEMS.setdefault(loop, {})
+        sem = sems.get(host)
+        if sem is None:
+            sem = sems[host] = asyncio.Semaphore(host_limit(host))
+    async with sem:
+        yield
+
+# ---------- Batch runner ----------
+class BatchStopped(Exception):
+    """resolve_rows() was told to stop before every row was handed out."""
+
+    def __init__(self, done: int, total: int):
+        super().__init__(f"stopped after {done} of {total} rows")
+        self.done, self.total = done, total
+
+def resolve_rows(
+    rows: List[Dict[str, Any]],
+    resolve_one: Callable[[Dict[str, Any]], Dict[str, Any]],
+    *,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Resolve `rows` through a bounded thread pool and return the per-row result
+    dicts in input order. `on_result(index, result)` and `on_progress(done, total)`
+    run on the calling thread as rows finish, so it is safe to drive `st.progress`
+    or persist partial results from them.
+    Rows are handed out as workers free up; once `should_stop()` is true no new row
+    starts, the rows in flight still finish through the callbacks, and BatchStopped
+    is raised if any row was left out.
+    """
+    total = len(rows)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    if not total:
+        return []
+    width = max(1, min(int(max_workers or 1), total))
+    pending = iter(enumerate(rows))
+    futs: Dict[Any, int] = {}
+    done = 0
+    pool = ThreadPoolExecutor(max_workers=width, thread_name_prefix="resolve")
+    try:
+        def submit_next():
+            if should_stop and should_stop(): return
+            nxt = next(pending, None)
+            if nxt is not None:
+                futs[pool.submit(resolve_one, nxt[1])] = nxt[0]
+        for _ in range(width): submit_next()
+        while futs:
+            finished, _ = wait(list(futs), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                i = futs.pop(fut)
+                results[i] = fut.result()
+                if on_result:
+                    on_result(i, results[i])
+                done += 1
+                if on_progress:
+                    on_progress(done, total)
+                submit_next()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    if done < total:
+        raise BatchStopped(done, total)
+    return [r for r in results if r is not None]
+
+# ---------- Ranked fan-out ----------
+Match = Tuple[Optional[str], Optional[str]]
+
+def _pick(results: Dict[int, Match], rank: int, strong: str) -> Tuple[Optional[Match], int]:
+    """Winner so far (if any) and the first rank whose result is still unknown."""
+    strong_hits = [i for i, (v, k) in results.items() if v and k == strong]
+    if strong_hits:
+        return results[min(strong_hits)], rank
+    while rank in results:
+        if results[rank][0]:
+            return results[rank], rank
+        rank += 1
+    return None, rank
+
+# The stop events of the fan-outs a check runs under (nested fan-outs stack up), so the
+# fetch helpers can hang up once the row no longer needs the check's result.
+_stops: "contextvars.ContextVar[Tuple[threading.Event, ...]]" = contextvars.ContextVar("aa_fanout_stops", default=())
+
+def stopped() -> bool:
+    """True inside a first_ranked_match() check whose result is no longer needed."""
+    return any(e.is_set() for e in _stops.get())
+
+def _safe(check: Callable[[Any], Match], item: Any, stop: Optional[threading.Event] = None) -> Match:
+    if stop is not None:
+        # runs in a copied context: the stop event stays local to this check
+        _stops.set(_stops.get() + (stop,))
+    try:
+        if stopped(): return None, None
+        return check(item)
+    except Exception:
+        return None, None
+
+def first_ranked_match(items: Sequence[Any], check: Callable[[Any], Match], *,
+                       fan_out: int = CONFIRM_FAN_OUT, strong: str = "mls_match") -> Match:
+    """
+    Run `check(item) -> (value, kind)` over ranked `items` with at most `fan_out` in flight.
+    A `strong` kind wins as soon as it shows up; any other hit wins once every
+    higher-ranked item finished without one. Once a winner is known nothing new starts
+    and the checks still running see stopped(), so their page reads hang up early.
+    Returns (None, None) when no item matched.
+    """
+    items = list(items)
+    width = max(1, min(int(fan_out or 1), len(items)))
+    if width == 1:
+        for it in items:
+            v, k = _safe(check, it)
+            if v: return v, k
+        return None, None
+    results: Dict[int, Match] = {}
+    pending = iter(enumerate(items))
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=width, thread_name_prefix="confirm")
+    try:
+        futs = {}
+        def submit_next():
+            nxt = next(pending, None)
+            if nxt is not None:
+                # copy the caller's context so the row deadline reaches the worker
+                futs[pool.submit(contextvars.copy_context().run, _safe, check, nxt[1], stop)] = nxt[0]
+        for _ in range(width): submit_next()
+        rank = 0
+        while futs:
+            done, _ = wait(list(futs), return_when=FIRST_COMPLETED)
+            for f in done:
+                results[futs.pop(f)] = f.result()
+            win, rank = _pick(results, rank, strong)
+            if win: return win
+            for _ in done: submit_next()
+        return None, None
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def first_ranked_match_async(items: Sequence[Any], check: Callable[[Any], Awaitable[Match]], *,
+                                   fan_out: int = CONFIRM_FAN_OUT, strong: str = "mls_match") -> Match:
+    """asyncio twin of first_ranked_match(); checks still running when a winner is known are cancelled."""
+    async def _asafe(it):
+        try:
+            return await check(it)
+        except Exception:
+            return None, None
+    items = list(items)
+    width = max(1, min(int(fan_out or 1), len(items)))
+    results: Dict[int, Match] = {}
+    pending = iter(enumerate(items))
+    tasks: Dict[asyncio.Task, int] = {}
+    def submit_next():
+        nxt = next(pending, None)
+        if nxt is not None:
+            tasks[asyncio.ensure_future(_asafe(nxt[1]))] = nxt[0]
+    try:
+        for _ in range(width): submit_next()
+        rank = 0
+        while tasks:
+            done, _ = await asyncio.wait(list(tasks), return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                results[tasks.pop(t)] = t.result()
+            win, rank = _pick(results, rank, strong)
+            if win: return win
+            for _ in done: submit_next()
+        return None, None
+    finally:
+        for t in tasks: t.cancel()
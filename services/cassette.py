@@ -0,0 +1,223 @@
+# services/cassette.py
+# Record/replay of HTTP traffic at the transport layer. In record mode every request
+# made through services/transport.py (resolver, enrichment, images, ShowingTime) is
+# appended to a JSONL cassette; in replay mode the same requests are answered from it
+# with optional injected latency, so a real batch can be rerun offline and timed.
+#
+#   HTTP_CASSETTE=batch.jsonl HTTP_CASSETTE_MODE=record  streamlit run app.py
+#   HTTP_CASSETTE=batch.jsonl HTTP_CASSETTE_MODE=replay HTTP_CASSETTE_LATENCY_SCALE=1 python resolve_cli.py ...
+#
+# Replay only sees what reaches the network: point AA_CACHE_DIR at an empty directory
+# (or run with caching off) so the disk caches don't answer first.
+#
+# The same hooks can reroute upstream hosts (HTTP_ROUTES="api.bing.microsoft.com=http://127.0.0.1:8765,...")
+# to a local stub server, as bench/bench_pipeline.py does. Rate limits and per-host
+# slots still see the original URL.
+
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+RECORD, REPLAY = "record", "replay"
+
+HTTP_CASSETTE              = os.getenv("HTTP_CASSETTE", "")
+HTTP_CASSETTE_MODE         = os.getenv("HTTP_CASSETTE_MODE", REPLAY).lower()
+HTTP_CASSETTE_LATENCY      = float(os.getenv("HTTP_CASSETTE_LATENCY", "0"))        # seconds added to every replayed call
+HTTP_CASSETTE_LATENCY_SCALE = float(os.getenv("HTTP_CASSETTE_LATENCY_SCALE", "0"))  # x recorded upstream time
+
+HTTP_ROUTES = os.getenv("HTTP_ROUTES", "")
+
+# The body is stored decoded, so these no longer describe it.
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+class CassetteMiss(Exception):
+    """A replayed request that was never recorded."""
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    digest = hashlib.sha1(body or b"").hexdigest()[:12]
+    return f"{method.upper()} {url} {digest}"
+
+class Cassette:
+    """
+    Recorded exchanges grouped by request key. A key recorded several times replays
+    its responses in order (then the last one again), so retries and repeated
+    searches see the same sequence as in production.
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY, *, latency: float = 0.0, latency_scale: float = 0.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"cassette mode must be {RECORD!r} or {REPLAY!r}, not {mode!r}")
+        self.path, self.mode = path, mode
+        self.latency, self.latency_scale = latency, latency_scale
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.calls = 0
+        self.misses = 0
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                self._entries[e["key"]].append(e)
+
+    # ---- record
+    def record(self, method: str, url: str, body: Optional[bytes], status: int,
+               headers: Dict[str, str], content: bytes, final_url: str, elapsed: float) -> None:
+        try:
+            text, enc = content.decode("utf-8"), "text"
+        except UnicodeDecodeError:
+            text, enc = base64.b64encode(content).decode("ascii"), "b64"
+        e = {
+            "key": request_key(method, url, body), "method": method.upper(), "url": url, "final_url": final_url,
+            "status": status, "headers": {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS},
+            "body": text, "encoding": enc, "elapsed": round(elapsed, 4), "recorded_at": time.time(),
+        }
+        line = json.dumps(e, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.calls += 1
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # ---- replay
+    def take(self, method: str, url: str, body: Optional[bytes]) -> Tuple[Dict[str, Any], bytes, float]:
+        """The next recorded response for this request, its body and the delay to inject."""
+        key = request_key(method, url, body)
+        with self._lock:
+            self.calls += 1
+            seq = self._entries.get(key)
+            if not seq:
+                self.misses += 1
+                raise CassetteMiss(key)
+            n = self._cursor[key]
+            self._cursor[key] = n + 1
+            e = seq[min(n, len(seq) - 1)]
+        content = base64.b64decode(e["body"]) if e.get("encoding") == "b64" else e["body"].encode("utf-8")
+        return e, content, self.latency + self.latency_scale * float(e.get("elapsed") or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, "calls": self.calls, "misses": self.misses,
+                    "recorded_keys": len(self._entries)}
+
+_active: Optional[Cassette] = None
+if HTTP_CASSETTE:
+    _active = Cassette(HTTP_CASSETTE, HTTP_CASSETTE_MODE,
+                       latency=HTTP_CASSETTE_LATENCY, latency_scale=HTTP_CASSETTE_LATENCY_SCALE)
+
+def active() -> Optional[Cassette]:
+    return _active
+
+def use(path: Optional[str], mode: str = REPLAY, *, latency: float = 0.0, latency_scale: float = 0.0) -> Optional[Cassette]:
+    """Switch the process to a cassette (or back to the network with path=None)."""
+    global _active
+    _active = Cassette(path, mode, latency=latency, latency_scale=latency_scale) if path else None
+    return _active
+
+# ---------- Host routing ----------
+_routes: Dict[str, str] = {}
+
+def route_hosts(mapping: Optional[Dict[str, str]]) -> None:
+    """Send requests for each host to another base URL (scheme://host:port); None clears."""
+    _routes.clear()
+    _routes.update({h.lower(): base.rstrip("/") for h, base in (mapping or {}).items()})
+
+def routed(url: str) -> str:
+    if not _routes: return url
+    parts = urlsplit(url)
+    base = _routes.get((parts.hostname or "").lower())
+    if not base: return url
+    b = urlsplit(base)
+    return urlunsplit((b.scheme, b.netloc, parts.path, parts.query, parts.fragment))
+
+if HTTP_ROUTES:
+    route_hosts(dict(pair.split("=", 1) for pair in HTTP_ROUTES.split(",") if "=" in pair))
+
+# ---------- requests (sync) ----------
+class CassetteAdapter(HTTPAdapter):
+    """HTTPAdapter that records or replays through the active cassette, else goes to the network."""
+
+    def send(self, request, **kw):
+        if _routes: request.url = routed(request.url)
+        c = _active
+        if c is None:
+            return super().send(request, **kw)
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        if c.mode == REPLAY:
+            try:
+                e, content, delay = c.take(request.method, request.url, body)
+            except CassetteMiss as ex:
+                raise requests.ConnectionError(f"not in cassette: {ex}", request=request)
+            if delay > 0: time.sleep(delay)
+            resp = requests.Response()
+            resp.status_code = int(e["status"])
+            resp.headers = CaseInsensitiveDict(e.get("headers") or {})
+            resp._content = content
+            resp._content_consumed = True   # iter_content(), as streamed fetches use, then slices _content
+            resp.url = request.url
+            resp.request = request
+            resp.reason = ""
+            resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+            resp.connection = self
+            return resp
+        t0 = time.monotonic()
+        resp = super().send(request, **kw)
+        content = resp.content
+        c.record(request.method, request.url, body, resp.status_code, dict(resp.headers), content, resp.url, time.monotonic() - t0)
+        return resp
+
+# ---------- httpx (async) ----------
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Wraps the real async transport; records or replays while a cassette is active."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if _routes:
+            url = routed(str(request.url))
+            if url != str(request.url):
+                request.url = httpx.URL(url)
+                request.headers["Host"] = request.url.netloc.decode("ascii")
+        c = _active
+        if c is None:
+            return await self.inner.handle_async_request(request)
+        body = await request.aread()
+        url = str(request.url)
+        if c.mode == REPLAY:
+            try:
+                e, content, delay = c.take(request.method, url, body)
+            except CassetteMiss as ex:
+                raise httpx.ConnectError(f"not in cassette: {ex}", request=request)
+            if delay > 0: await asyncio.sleep(delay)
+            return httpx.Response(int(e["status"]), headers=e.get("headers") or {}, content=content, request=request)
+        t0 = time.monotonic()
+        resp = await self.inner.handle_async_request(request)
+        try:
+            content = await resp.aread()
+        finally:
+            await resp.aclose()
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_HEADERS}
+        c.record(request.method, url, body, resp.status_code, headers, content, url, time.monotonic() - t0)
+        return httpx.Response(resp.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
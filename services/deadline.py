@@ -0,0 +1,83 @@
+# services/deadline.py
+# Time budgets for a row and for a whole run. The active Deadline travels in a
+# contextvar, so every stage (searches, page fetches, confirmation) sees it without
+# extra arguments: HTTP timeouts are clamped to what is left, and stage boundaries
+# raise BudgetExhausted once it is spent so the row can degrade immediately.
+
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+ROW_DEADLINE   = float(os.getenv("ROW_DEADLINE", "45"))
+BATCH_DEADLINE = float(os.getenv("BATCH_DEADLINE", "0"))   # 0 = no run-wide limit
+
+BUDGET_EXHAUSTED = "budget_exhausted"
+
+class BudgetExhausted(Exception):
+    """Raised at a stage boundary once the active deadline has passed."""
+
+class Deadline:
+    """
+    Absolute expiry (monotonic clock), optionally nested in a parent budget: a row
+    deadline inside a batch deadline ends at whichever comes first. `best` holds the
+    best unconfirmed candidate seen so far, returned if the budget runs out.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None):
+        self.expires_at = time.monotonic() + float(seconds) if seconds and seconds > 0 else None
+        self.parent = parent
+        self.best: Optional[str] = None
+
+    def remaining(self) -> float:
+        own = self.expires_at - time.monotonic() if self.expires_at is not None else float("inf")
+        return min(own, self.parent.remaining()) if self.parent is not None else own
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> None:
+        if self.expired():
+            raise BudgetExhausted()
+
+    def offer(self, url: str) -> None:
+        if url and self.best is None:
+            self.best = url
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("aa_deadline", default=None)
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+def row_deadline(seconds: Union[float, Deadline, None] = None) -> Deadline:
+    """A Deadline for one row, nested in the active (batch) deadline if there is one."""
+    if isinstance(seconds, Deadline):
+        return seconds
+    return Deadline(ROW_DEADLINE if seconds is None else seconds, parent=current())
+
+@contextmanager
+def scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+def check() -> None:
+    d = current()
+    if d is not None: d.check()
+
+def expired() -> bool:
+    d = current()
+    return d is not None and d.expired()
+
+def offer(url: str) -> None:
+    d = current()
+    if d is not None: d.offer(url)
+
+def clamp(timeout: float) -> float:
+    """`timeout` cut down to the time left in the active deadline (never below 50 ms)."""
+    d = current()
+    if d is None: return timeout
+    return max(0.05, min(float(timeout), d.remaining()))
@@ -0,0 +1,394 @@
+# services/html_scan.py
+# One scan per listing page instead of ~20 case-insensitive regex searches over it.
+# The page is lower-cased once, a chunk at a time; each family of anchors (embedded
+# JSON keys, "MLS" mentions, <meta>/<img>/<title> tags, Zillow photo URLs) is located
+# with a literal-anchored pass over those chunks, and the extractors' patterns are
+# applied only at those offsets in the original text. Families are searched lazily
+# and only as far as needed, so a field near the top never walks the whole page and
+# confirming an MLS id never pays for the image lookup.
+#
+# Listing facts (price, status, beds/baths/sqft, description, MLS id, address) are
+# read by path from the page's embedded listing JSON when there is one (Zillow's
+# __NEXT_DATA__ / hdpApolloPreloadedData blobs), decoded on first use. The regexes
+# are the fallback: they take the first match anywhere on the page, which on Zillow
+# is often a nearby-homes card rather than the listing itself.
+#
+# services/resolver.py, services/enrich.py and services/listing.py delegate here.
+
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ---------- Anchors ----------
+JSON_KEYS = (
+    "mlsid", "mls", "listingid",
+    "streetaddress", "addresslocality", "addressregion", "postalcode",
+    "price", "unformattedprice", "pricezestimate", "homestatus", "statustext",
+    "bedrooms", "beds", "bathrooms", "baths", "livingarea", "livingareavalue", "area",
+    "description", "homedescription", "marketingdescription", "image",
+)
+RE_JSON_KEY = re.compile(r'"(' + "|".join(sorted(JSON_KEYS, key=len, reverse=True)) + r')"')
+RE_TAG      = re.compile(r'<(meta|img|title>)')
+FP_PREFIX   = "https://photos.zillowstatic.com/fp/"
+
+# Keeps offsets aligned when str.lower() would change the length (e.g. "İ").
+_ASCII_LOWER = {c: c + 32 for c in range(ord("A"), ord("Z") + 1)}
+
+# ---------- Patterns applied at the anchors ----------
+RE_MLS_ID     = re.compile(r'"mlsId"\s*:\s*"([A-Za-z0-9\-]{5,})"', re.I)
+RE_MLS        = re.compile(r'"mls"\s*:\s*"([A-Za-z0-9\-]{5,})"', re.I)
+RE_LISTING_ID = re.compile(r'"listingId"\s*:\s*"([A-Za-z0-9\-]{5,})"', re.I)
+RE_MLS_TEXT   = re.compile(r'\bMLS[^A-Za-z0-9]{0,5}#?\s*([A-Za-z0-9\-]{5,})\b', re.I)
+
+RE_STREET = re.compile(r'"streetAddress"\s*:\s*"([^"]+)"', re.I)
+RE_CITY   = re.compile(r'"addressLocality"\s*:\s*"([^"]+)"', re.I)
+RE_STATE  = re.compile(r'"addressRegion"\s*:\s*"([A-Za-z]{2})"', re.I)
+RE_ZIP    = re.compile(r'"postalCode"\s*:\s*"(\d{5}(?:-\d{4})?)"', re.I)
+
+RE_PRICE  = re.compile(r'"(?:price|unformattedPrice|priceZestimate)"\s*:\s*"?\$?([\d,]+)"?', re.I)
+RE_STATUS = re.compile(r'"(?:homeStatus|statusText)"\s*:\s*"([^"]+)"', re.I)
+RE_BEDS   = re.compile(r'"(?:bedrooms|beds)"\s*:\s*(\d+)', re.I)
+RE_BATHS  = re.compile(r'"(?:bathrooms|baths)"\s*:\s*([0-9.]+)', re.I)
+RE_SQFT   = re.compile(r'"(?:livingArea|livingAreaValue|area)"\s*:\s*([0-9,]+)', re.I)
+RE_DESC   = re.compile(r'"(?:description|homeDescription|marketingDescription)"\s*:\s*"([^"]+)"', re.I)
+
+RE_IMAGE      = re.compile(r"\"image\"\s*:\s*\"(https?://[^\"]+)\"", re.I)
+RE_IMAGE_LIST = re.compile(r"\"image\"\s*:\s*\[\s*\"(https?://[^\"]+)\"", re.I)
+
+# pattern -> the JSON keys it can start with
+FIELD_KEYS = {
+    RE_MLS_ID: ("mlsid",), RE_MLS: ("mls",), RE_LISTING_ID: ("listingid",),
+    RE_STREET: ("streetaddress",), RE_CITY: ("addresslocality",), RE_STATE: ("addressregion",), RE_ZIP: ("postalcode",),
+    RE_PRICE: ("price", "unformattedprice", "pricezestimate"), RE_STATUS: ("homestatus", "statustext"),
+    RE_BEDS: ("bedrooms", "beds"), RE_BATHS: ("bathrooms", "baths"),
+    RE_SQFT: ("livingarea", "livingareavalue", "area"),
+    RE_DESC: ("description", "homedescription", "marketingdescription"),
+    RE_IMAGE: ("image",), RE_IMAGE_LIST: ("image",),
+}
+
+RE_OG_TITLE  = re.compile(r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]", re.I)
+RE_OG_IMAGE  = re.compile(r"<meta[^>]+property=['\"]og:image['\"][^>]+content=['\"]([^'\"]+)['\"]", re.I)
+RE_OG_SECURE = re.compile(r"<meta[^>]+property=['\"]og:image:secure_url['\"][^>]+content=['\"]([^'\"]+)['\"]", re.I)
+RE_META_DESC = re.compile(r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]", re.I)
+RE_TITLE_ADDR = re.compile(r"<title>\s*([^<]+?)\s*</title>", re.I)
+RE_TITLE_TEXT = re.compile(r"<title>\s*([^<]+)</title>", re.I)
+
+HERO_WIDTHS = ("960", "1152", "768", "1536")
+RE_IMG_SRC = {w: re.compile(rf"<img[^>]+src=['\"](https://photos\.zillowstatic\.com/fp/[^'\" ]+-cc_ft_{w}\.(?:jpg|webp))['\"]", re.I)
+              for w in HERO_WIDTHS}
+RE_SRCSET      = re.compile(r"srcset=['\"]([^'\"]*photos\.zillowstatic\.com[^'\"]+)['\"]", re.I)
+RE_SRCSET_PART = re.compile(r"(https://photos\.zillowstatic\.com/\S+)\s+(\d+)w", re.I)
+RE_ANY_FP      = re.compile(r"(https://photos\.zillowstatic\.com/fp/\S+-cc_ft_\d+\.(jpg|webp))", re.I)
+
+# ---------- Embedded listing JSON ----------
+# <script id=...> blobs that carry the listing record, in the order they are tried
+DATA_SCRIPTS = ("__next_data__", "hdpapollopreloadeddata")
+# field -> paths into the listing record; the first non-empty value wins
+DATA_PATHS = {
+    "mls_id":      (("attributionInfo", "mlsId"), ("mlsid",), ("mlsId",)),
+    "street":      (("address", "streetAddress"),),
+    "city":        (("address", "city"),),
+    "state":       (("address", "state"),),
+    "zip":         (("address", "zipcode"),),
+    "price":       (("price",), ("unformattedPrice",)),
+    "status":      (("homeStatus",),),
+    "beds":        (("bedrooms",),),
+    "baths":       (("bathrooms",),),
+    "sqft":        (("livingArea",), ("livingAreaValue",)),
+    "description": (("description",),),
+}
+RECORD_KEYS = ("zpid", "homeStatus")   # a dict with both is taken for the listing record
+RECORD_SEARCH_DEPTH = 6
+
+def _decode(blob: Any) -> Any:
+    if isinstance(blob, str):
+        try:
+            return json.loads(blob)
+        except ValueError:
+            return None
+    return blob
+
+def _find_record(data: Any) -> Optional[Dict[str, Any]]:
+    """The listing record in a decoded page blob, or None."""
+    if not isinstance(data, dict): return None
+    # Zillow keeps the record in a JSON-encoded cache: {"<query>": {"property": {...}}}
+    pp = (data.get("props") or {}).get("pageProps") or {}
+    for cache in ((pp.get("componentProps") or {}).get("gdpClientCache"), pp.get("gdpClientCache"), data.get("apiCache")):
+        cache = _decode(cache)
+        if isinstance(cache, dict):
+            # several queries can be cached; the full-render one carries the most fields
+            props = [v["property"] for v in cache.values() if isinstance(v, dict) and isinstance(v.get("property"), dict)]
+            if props: return max(props, key=len)
+    # otherwise the shallowest dict that looks like a listing (nearby-home cards sit deeper)
+    level = [data]
+    for _ in range(RECORD_SEARCH_DEPTH):
+        nxt = []
+        for node in level:
+            if isinstance(node, dict):
+                if all(k in node for k in RECORD_KEYS): return node
+                nxt.extend(v for v in node.values() if isinstance(v, (dict, list)))
+            else:
+                nxt.extend(v for v in node if isinstance(v, (dict, list)))
+        level = nxt
+    return None
+
+def _text(v: Any) -> Optional[str]:
+    """JSON scalar -> the string the regex extractors would have captured."""
+    if v is None or isinstance(v, (bool, dict, list)): return None
+    if isinstance(v, float) and v.is_integer(): v = int(v)
+    v = str(v).strip()
+    return v or None
+
+def mls_patterns(mls_id: str) -> List[str]:
+    """The ways a page can mention an MLS id (see services/resolver.page_contains_mls)."""
+    mid = re.escape(mls_id)
+    return [
+        rf'\bMLS[^A-Za-z0-9]{{0,5}}#?\s*{mid}\b',
+        rf'\bMLS\s*#?\s*{mid}\b',
+        rf'"mls"\s*:\s*"{mid}"',
+        rf'"mlsId"\s*:\s*"{mid}"',
+        rf'"mlsId"\s*:\s*{mid}',
+    ]
+
+SCAN_CHUNK = int(os.getenv("HTML_SCAN_CHUNK", str(16 * 1024)))
+_OVERLAP = 64   # longer than any anchor literal, so one straddling a chunk edge is still seen
+
+def _find_all(low: str, needle: str) -> List[int]:
+    out, i = [], low.find(needle)
+    while i != -1:
+        out.append(i)
+        i = low.find(needle, i + 1)
+    return out
+
+_UNSET = object()
+
+class ListingScan:
+    """
+    Anchor offsets and extracted fields for one page. Get one through scan(html) so
+    the extractors called on the same page share it.
+
+    The page is lower-cased and searched a chunk at a time, only as far as a caller
+    needs: a field near the top costs one chunk, a miss walks the page once per family.
+    """
+
+    def __init__(self, html: str, start: int = 0):
+        self.html = html or ""
+        self.start = start   # anchors before this offset are ignored (see watch())
+        self._low: Dict[int, str] = {}                          # chunk index -> lower-cased chunk (+ overlap)
+        self._anchors: Dict[str, List[Tuple[int, str]]] = {}   # family -> [(offset, anchor)]
+        self._scanned: Dict[str, int] = {}                      # family -> chunks searched so far
+        self._record: Any = _UNSET
+        self._lock = threading.Lock()
+
+    def _lowered(self, i: int) -> str:
+        low = self._low.get(i)
+        if low is None:
+            a = self.start + i * SCAN_CHUNK
+            raw = self.html[a:a + SCAN_CHUNK + _OVERLAP]
+            low = raw.lower()
+            # str.lower() can change the length (e.g. "İ"); offsets must stay aligned
+            if len(low) != len(raw): low = raw.translate(_ASCII_LOWER)
+            self._low[i] = low
+        return low
+
+    def _more(self, family: str) -> bool:
+        """Search the next chunk for `family`; False once the page is exhausted."""
+        with self._lock:
+            i = self._scanned.get(family, 0)
+            base = self.start + i * SCAN_CHUNK
+            if base >= len(self.html): return False
+            low = self._lowered(i)
+            if family == "json":   found = [(m.start(), m.group(1)) for m in RE_JSON_KEY.finditer(low)]
+            elif family == "tags": found = [(m.start(), m.group(1)) for m in RE_TAG.finditer(low)]
+            else:                  found = [(p, family) for p in _find_all(low, family[len("text:"):])]
+            self._anchors.setdefault(family, []).extend((base + p, a) for p, a in found if p < SCAN_CHUNK)
+            self._scanned[family] = i + 1
+            return True
+
+    def anchors(self, family: str, keys: Tuple[str, ...] = ()) -> Iterator[int]:
+        """
+        Offsets of `family` anchors in document order, found lazily. Families are "json"
+        (quoted JSON keys from JSON_KEYS), "tags" (meta / img / title>) or "text:<literal>"
+        for a lower-case literal; `keys` narrows json/tags to some of their anchors.
+        """
+        n = 0
+        while True:
+            got = self._anchors.get(family, ())
+            while n < len(got):
+                p, a = got[n]; n += 1
+                if not keys or a in keys: yield p
+            if not self._more(family): return
+
+    def first(self, pattern: "re.Pattern", positions: Iterable[int], group: int = 1) -> Optional[str]:
+        """First match of `pattern` starting at one of `positions`, i.e. pattern.search() on the page."""
+        for p in positions:
+            m = pattern.match(self.html, p)
+            if m: return m.group(group)
+        return None
+
+    def field(self, pattern: "re.Pattern") -> Optional[str]:
+        return self.first(pattern, self.anchors("json", FIELD_KEYS[pattern]))
+
+    def meta(self, pattern: "re.Pattern") -> Optional[str]:
+        return self.first(pattern, self.anchors("tags", ("meta",)))
+
+    def title(self, pattern: "re.Pattern") -> Optional[str]:
+        return self.first(pattern, self.anchors("tags", ("title>",)))
+
+    # ---- embedded listing JSON
+    def _script_bodies(self, name: str) -> Iterator[str]:
+        """Bodies of <script> elements whose opening tag mentions `name` (e.g. id="__NEXT_DATA__")."""
+        html = self.html
+        for p in self.anchors("text:" + name):
+            lt, gt = html.rfind("<", 0, p), html.find(">", p)
+            if lt == -1 or gt == -1 or html[lt:lt + 7].lower() != "<script" or ">" in html[lt:p]: continue
+            end = next((e for e in self.anchors("text:</script") if e > gt), None)
+            if end is None: return
+            yield html[gt + 1:end]
+
+    @property
+    def record(self) -> Optional[Dict[str, Any]]:
+        """The listing record from the page's embedded JSON (decoded once), or None."""
+        if self._record is _UNSET:
+            rec = None
+            for name in DATA_SCRIPTS:
+                rec = next(filter(None, (_find_record(_decode(b)) for b in self._script_bodies(name))), None)
+                if rec: break
+            self._record = rec
+        return self._record
+
+    def data(self, field: str) -> Optional[str]:
+        rec = self.record
+        if not rec: return None
+        for path in DATA_PATHS[field]:
+            v: Any = rec
+            for k in path:
+                v = v.get(k) if isinstance(v, dict) else None
+            v = _text(v)
+            if v: return v
+        return None
+
+    # ---- extractors
+    def mls_id(self) -> Optional[str]:
+        v = self.data("mls_id")
+        if v: return v
+        for pat in (RE_MLS_ID, RE_MLS, RE_LISTING_ID):
+            v = self.field(pat)
+            if v: return v
+        return self.first(RE_MLS_TEXT, self.anchors("text:mls"))
+
+    def address(self) -> Dict[str, str]:
+        # JSON-LD near the top of the page is the listing's own address; the embedded
+        # record (usually at the very end) only fills what it lacks
+        out = {"street": self.field(RE_STREET) or "", "city": self.field(RE_CITY) or "",
+               "state": self.field(RE_STATE) or "", "zip": self.field(RE_ZIP) or ""}
+        if not all(out.values()):
+            for k in out:
+                out[k] = out[k] or self.data(k) or ""
+        if not out["street"]:
+            for title in (self.meta(RE_OG_TITLE), self.title(RE_TITLE_ADDR)):
+                if title and re.search(r"\b[A-Za-z]{2}\b", title) and re.search(r"\d{5}", title):
+                    out["street"] = title
+                    break
+        return out
+
+    def title_or_desc(self) -> str:
+        v = self.meta(RE_OG_TITLE) or self.title(RE_TITLE_TEXT) or self.meta(RE_META_DESC)
+        return re.sub(r'\s+', ' ', v).strip() if v else ""
+
+    def listing_fields(self) -> Dict[str, Optional[str]]:
+        """Price, status, beds, baths, sqft and remarks as enrich.parse_listing_meta reports them."""
+        return {
+            "price":   self.data("price") or self.field(RE_PRICE),
+            "status":  self.data("status") or self.field(RE_STATUS),
+            "beds":    self.data("beds") or self.field(RE_BEDS),
+            "baths":   self.data("baths") or self.field(RE_BATHS),
+            "sqft":    self.data("sqft") or self.field(RE_SQFT),
+            "remarks": self.data("description") or self.field(RE_DESC) or self.meta(RE_META_DESC),
+        }
+
+    def og_image(self) -> Optional[str]:
+        return (self.meta(RE_OG_IMAGE) or self.meta(RE_OG_SECURE)
+                or self.field(RE_IMAGE) or self.field(RE_IMAGE_LIST))
+
+    def contains_mls(self, mls_id: str) -> bool:
+        pats = [re.compile(p, re.I) for p in mls_patterns(mls_id)]
+        text, quoted = pats[:2], pats[2:]   # "MLS # id" mentions; "mls"/"mlsId" JSON keys start one char earlier
+        html = self.html
+        for p in self.anchors("text:mls"):
+            if any(rx.match(html, p) for rx in text): return True
+            if p and html[p - 1] == '"' and any(rx.match(html, p - 1) for rx in quoted): return True
+        return False
+
+    def contains_city_state(self, city: Optional[str] = None, state: Optional[str] = None) -> bool:
+        if city:
+            if city.isascii() and len(city) <= _OVERLAP:
+                if next(self.anchors("text:" + city.lower()), None) is not None: return True
+            elif re.search(re.escape(city), self.html, re.I): return True
+        if state:
+            rx = re.compile(rf'\b{re.escape(state)}\b', re.I)
+            if state.isascii() and len(state) <= _OVERLAP:
+                if any(rx.match(self.html, p) for p in self.anchors("text:" + state.lower())): return True
+            elif rx.search(self.html): return True
+        return False
+
+    def hero_image(self) -> Optional[str]:
+        for w in HERO_WIDTHS:
+            v = self.first(RE_IMG_SRC[w], self.anchors("tags", ("img",)))
+            if v: return v
+        srcset = self.first(RE_SRCSET, self.anchors("text:srcset="))
+        if srcset:
+            cand = []
+            for part in srcset.split(","):
+                m = RE_SRCSET_PART.match(part.strip())
+                if m: cand.append((int(m.group(2)), m.group(1)))
+            if cand:
+                up = [(w, u) for (w, u) in cand if w <= 1152]
+                return sorted(up or cand, key=lambda x: x[0])[-1][1]
+        return self.first(RE_ANY_FP, self.anchors("text:" + FP_PREFIX))
+
+# ---------- Pages that are still arriving ----------
+# Longest confirming match that can straddle two reads ("MLS #: <id>", a city name).
+WATCH_OVERLAP = 256
+
+def watch(mls_id: Optional[str] = None, city: Optional[str] = None, state: Optional[str] = None):
+    """
+    `until` predicate for page_cache.fetch_page_until(): True once the text read so far
+    mentions `mls_id` or, without one, the city/state -- the same checks
+    resolver.confirm_or_resolve_on_page() makes. Each call only scans the new text.
+    """
+    def until(text: str, start: int) -> bool:
+        s = ListingScan(text, start=max(0, start - WATCH_OVERLAP))
+        return s.contains_mls(mls_id) if mls_id else s.contains_city_state(city, state)
+    return until
+
+def empty_address() -> Dict[str, str]:
+    """What address() reports for a page without one."""
+    return {"street": "", "city": "", "state": "", "zip": ""}
+
+# ---------- Shared scans ----------
+# The extractors take raw html; remembering the last few scans (by identity, holding a
+# reference so the id can't be reused) lets calls on the same page share one.
+SCAN_MEMO = int(os.getenv("HTML_SCAN_MEMO", "8"))
+_memo: "OrderedDict[int, ListingScan]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+def scan(html: str) -> ListingScan:
+    with _memo_lock:
+        s = _memo.get(id(html))
+        if s is not None and s.html is html:
+            _memo.move_to_end(id(html))
+            return s
+    s = ListingScan(html)
+    with _memo_lock:
+        _memo[id(html)] = s
+        while len(_memo) > SCAN_MEMO:
+            _memo.popitem(last=False)
+    return s
+
+def clear_memo() -> None:
+    with _memo_lock:
+        _memo.clear()
@@ -1,9 +1,9 @@
 # services/images.py
-import os, re, requests
+import os, httpx
 from typing import Optional, Tuple, Dict, Any
 
-import streamlit as st
-from services.enrich import extract_zillow_first_image
+from core.cache import cache_data
+from services import listing
 
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "12"))
 
@@ -17,27 +17,33 @@ UA_HEADERS = {
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 
 def picture_for_result_with_log(query_address: str, zurl: str, csv_photo_url: Optional[str] = None):
-    log = {"url": zurl, "csv_provided": bool(csv_photo_url), "stage": None, "status_code": None, "html_len": None, "selected": None, "errors": []}
-    def _ok(u:str)->bool: return isinstance(u,str) and (u.startswith("http://") or u.startswith("https://") or u.startswith("data:"))
+    log = _new_log(zurl, csv_photo_url)
     if csv_photo_url and _ok(csv_photo_url):
         log["stage"]="csv_photo"; log["selected"]=csv_photo_url; return csv_photo_url, log
     if zurl and "/homedetails/" in zurl:
         try:
-            r = requests.get(zurl, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT); log["status_code"]=r.status_code
-            if r.ok:
-                html=r.text; log["html_len"]=len(html)
-                zfirst=extract_zillow_first_image(html)
-                if zfirst: log["stage"]="zillow_hero"; log["selected"]=zfirst; return zfirst, log
-                for pat in [
-                    r"<meta[^>]+property=['\"]og:image['\"][^>]+content=['\"]([^'\"]+)['\"]",
-                    r"<meta[^>]+property=['\"]og:image:secure_url['\"][^>]+content=['\"]([^'\"]+)['\"]",
-                    r"\"image\"\s*:\s*\"(https?://[^\"]+)\"",
-                    r"\"image\"\s*:\s*\[\s*\"(https?://[^\"]+)\"",
-                ]:
-                    m = re.search(pat, html, re.I)
-                    if m: log["stage"]="og_image"; log["selected"]=m.group(1); return m.group(1), log
+            doc = listing.get_listing_document(zurl)
+            log["status_code"] = doc.status
+            if doc:
+                img = _image_from_doc(doc, log)
+                if img: return img, log
         except Exception as e:
             log["errors"].append(f"fetch_err:{e!r}")
+    return _street_view(query_address, log)
+
+def _new_log(zurl: str, csv_photo_url: Optional[str]) -> Dict[str, Any]:
+    return {"url": zurl, "csv_provided": bool(csv_photo_url), "stage": None, "status_code": None, "html_len": None, "selected": None, "errors": []}
+
+def _ok(u: str) -> bool:
+    return isinstance(u,str) and (u.startswith("http://") or u.startswith("https://") or u.startswith("data:"))
+
+def _image_from_doc(doc: "listing.ListingDocument", log: Dict[str, Any]) -> Optional[str]:
+    log["html_len"]=len(doc.html)
+    if doc.hero_image: log["stage"]="zillow_hero"; log["selected"]=doc.hero_image; return doc.hero_image
+    if doc.og_image: log["stage"]="og_image"; log["selected"]=doc.og_image; return doc.og_image
+    return None
+
+def _street_view(query_address: str, log: Dict[str, Any]):
     try:
         key = GOOGLE_MAPS_API_KEY
         if key and query_address:
@@ -51,6 +57,27 @@ def picture_for_result_with_log(query_address: str, zurl: str, csv_photo_url: Op
         log["errors"].append(f"sv_err:{e!r}")
     log["stage"]="none"; return None, log
 
-@st.cache_data(ttl=900, show_spinner=False)
+async def picture_for_result_async(query_address: str, zurl: str, csv_photo_url: Optional[str] = None,
+                                   client: Optional[httpx.AsyncClient] = None, doc: Optional["listing.ListingDocument"] = None):
+    """
+    Async twin of picture_for_result_with_log on the shared client.
+    Pass `doc` when the homedetails page was already fetched to skip the download.
+    """
+    log = _new_log(zurl, csv_photo_url)
+    if csv_photo_url and _ok(csv_photo_url):
+        log["stage"]="csv_photo"; log["selected"]=csv_photo_url; return csv_photo_url, log
+    if zurl and "/homedetails/" in zurl:
+        try:
+            if doc is None:
+                doc = await listing.get_listing_document_async(zurl, client=client)
+            log["status_code"] = doc.status
+            if doc:
+                img = _image_from_doc(doc, log)
+                if img: return img, log
+        except Exception as e:
+            log["errors"].append(f"fetch_err:{e!r}")
+    return _street_view(query_address, log)
+
+@cache_data(ttl=900, show_spinner=False)
 def get_thumbnail_and_log(query_address: str, zurl: str, csv_photo_url: Optional[str]):
     return picture_for_result_with_log(query_address, zurl, csv_photo_url)
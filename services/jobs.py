@@ -0,0 +1,142 @@
+# services/jobs.py
+# Background resolution jobs. The Run tab hands its parsed rows to a small pool held in
+# cache_resource, so a rerun, refresh or widget click no longer throws the batch
+# away. Job state and each finished row are written to the cache DB as they land; the
+# tab polls status() and renders progress until the job is done.
+
+import os
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+from core.cache import cache_resource
+from core.kvstore import KVStore
+from services.batch import BatchStopped
+from services.resolver import resolve_batch
+from services.journal import Journal
+
+JOBS_MAX_CONCURRENT = int(os.getenv("JOBS_MAX_CONCURRENT", "2"))
+JOB_TTL = float(os.getenv("JOB_TTL", str(3 * 86400)))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, INTERRUPTED = "queued", "running", "done", "failed", "cancelled", "interrupted"
+FINISHED = {DONE, FAILED, CANCELLED, INTERRUPTED}
+
+JOBS = KVStore("jobs", max_entries=500)
+JOB_ROWS = KVStore("job_rows", max_entries=200_000)
+
+class JobCancelled(Exception):
+    pass
+
+class _Runner:
+    """Process-wide pool plus the ids it is working on (anything else 'running' was orphaned by a restart)."""
+
+    def __init__(self, workers: int):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.active: Set[str] = set()
+        self.cancelled: Set[str] = set()
+
+@cache_resource(show_spinner=False)
+def _shared_runner() -> _Runner:
+    return _Runner(JOBS_MAX_CONCURRENT)
+
+_runner: Optional[_Runner] = None
+_runner_lock = threading.Lock()
+
+def runner() -> _Runner:
+    # Same pattern as ratelimit.buckets(): resolve the cache_resource once per process.
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = _shared_runner()
+    return _runner
+
+def _save(job: Dict[str, Any]) -> Dict[str, Any]:
+    job["updated_at"] = time.time()
+    JOBS.set(job["id"], job, JOB_TTL)
+    return job
+
+def _run(job: Dict[str, Any], rows: List[Dict[str, Any]], settings: Dict[str, Any]) -> None:
+    r = runner()
+    jid = job["id"]
+    job["started_at"] = time.time()
+    _save({**job, "status": RUNNING})
+
+    def on_result(i: int, result: Dict[str, Any]) -> None:
+        JOB_ROWS.set(f"{jid}:{i}", result, JOB_TTL)
+
+    def on_progress(done: int, total: int) -> None:
+        job["done"] = done
+        _save({**job, "status": RUNNING})
+
+    try:
+        if jid in r.cancelled: raise JobCancelled()
+        # a resubmitted input picks up where an interrupted job stopped
+        journal = Journal(rows, settings)
+        job["resumed"] = journal.resumed
+        resolve_batch(rows, on_progress=on_progress, on_result=on_result, journal=journal,
+                      should_stop=lambda: jid in r.cancelled, **settings)
+        job["status"] = DONE
+    except (JobCancelled, BatchStopped):
+        job["status"] = CANCELLED
+    except Exception as e:
+        job["status"] = FAILED
+        job["error"] = f"{type(e).__name__}: {e}"
+        job["traceback"] = traceback.format_exc()[-4000:]
+    finally:
+        job["finished_at"] = time.time()
+        _save(job)
+        with r.lock:
+            r.active.discard(jid); r.cancelled.discard(jid)
+
+def submit(rows: List[Dict[str, Any]], *, meta: Optional[Dict[str, Any]] = None, **settings) -> str:
+    """
+    Queue `rows` for resolution and return the job id. `settings` are passed to
+    services.resolver.resolve_batch (defaults, use_cache, max_workers, budgets, row options);
+    `meta` is kept on the job record for whoever finishes the run (e.g. after a refresh).
+    """
+    jid = uuid.uuid4().hex[:12]
+    job = _save({
+        "id": jid, "status": QUEUED, "total": len(rows), "done": 0,
+        "created_at": time.time(), "error": "", "meta": dict(meta or {}),
+    })
+    r = runner()
+    with r.lock:
+        r.active.add(jid)
+    r.pool.submit(_run, job, list(rows), dict(settings))
+    return jid
+
+def status(job_id: str) -> Optional[Dict[str, Any]]:
+    job = JOBS.get(job_id or "", count=False) if job_id else None
+    if not job: return None
+    if job.get("status") not in FINISHED and job_id not in runner().active:
+        # the process that owned it went away; keep what it finished
+        job = _save({**job, "status": INTERRUPTED})
+    return job
+
+def results(job_id: str) -> List[Dict[str, Any]]:
+    """Finished rows in input order (partial while the job runs)."""
+    job = JOBS.get(job_id or "", count=False) if job_id else None
+    if not job: return []
+    out = []
+    for i in range(int(job.get("total") or 0)):
+        row = JOB_ROWS.get(f"{job_id}:{i}", count=False)
+        if row is not None: out.append(row)
+    return out
+
+def cancel(job_id: str) -> None:
+    """Stop handing out rows; rows already in flight still finish and are kept."""
+    r = runner()
+    with r.lock:
+        if job_id in r.active: r.cancelled.add(job_id)
+
+def forget(job_id: str) -> None:
+    job = JOBS.get(job_id or "", count=False) if job_id else None
+    if not job: return
+    for i in range(int(job.get("total") or 0)):
+        JOB_ROWS.delete(f"{job_id}:{i}")
+    JOBS.delete(job_id)
@@ -0,0 +1,169 @@
+# services/journal.py
+# Checkpoint journal for batch runs. Each finished row is appended to a JSONL file
+# named after a hash of the input rows and the settings that shape the results, so a
+# run of the same input after a crash or restart skips the rows already done. The
+# journal is removed once the run completes.
+#
+# A live run holds its journal locked; a second run of the same input started meanwhile
+# (another job, another tab) keeps a separate journal of its own instead of sharing it.
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+try:
+    import fcntl
+except ImportError:   # Windows: runs in this process still exclude each other
+    fcntl = None
+
+from core.kvstore import CACHE_DIR
+from services.deadline import BUDGET_EXHAUSTED
+
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", os.path.join(CACHE_DIR, "journals"))
+JOURNAL_TTL = float(os.getenv("JOURNAL_TTL", str(7 * 86400)))
+
+# Rows that ran out of time are retried on resume rather than kept.
+RETRY_STATUSES = {BUDGET_EXHAUSTED}
+# Settings that change how fast a run goes, not what it produces; left out of the key.
+RUNTIME_KEYS = {"max_workers", "concurrency", "row_budget", "batch_budget", "budget", "use_cache", "delay", "full_pages"}
+
+def _digest(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def row_hash(row: Dict[str, Any]) -> str:
+    return _digest(row)[:16]
+
+_held: Set[str] = set()
+_held_lock = threading.Lock()
+
+def _claim(path: str) -> Optional[TextIO]:
+    """`path` opened for appending and locked to this run; None while another live run holds it."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fh = open(path, "a", encoding="utf-8")
+    except OSError:
+        return None
+    with _held_lock:
+        try:
+            if path in _held: raise OSError("journal in use")
+            if fcntl is not None: fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return None
+        _held.add(path)
+    return fh
+
+class Journal:
+    """
+    Append-only record of finished rows for one input. `done` maps row index to the
+    stored result; an entry only counts if the row at that index still hashes the same.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], settings: Optional[Dict[str, Any]] = None, *,
+                 resume: bool = True, directory: Optional[str] = None):
+        self.hashes = [row_hash(r) for r in rows]
+        shaping = {k: v for k, v in (settings or {}).items() if k not in RUNTIME_KEYS}
+        self.key = _digest({"rows": self.hashes, "settings": shaping})[:24]
+        self.dir = directory or JOURNAL_DIR
+        self._lock = threading.Lock()
+        self._fh = _claim(os.path.join(self.dir, f"{self.key}.jsonl"))
+        if self._fh is None:
+            # the same input is running right now: journal this run on its own, from scratch
+            self.key, resume = f"{self.key}-{uuid.uuid4().hex[:8]}", False
+        self.path = os.path.join(self.dir, f"{self.key}.jsonl")
+        if self._fh is not None and (not resume or self._stale()):
+            self._fh.truncate(0)
+        self.done: Dict[int, Dict[str, Any]] = self._load() if resume else {}
+        self.resumed = len(self.done)
+
+    def _stale(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.path) > JOURNAL_TTL
+        except OSError:
+            return False
+
+    def _load(self) -> Dict[int, Dict[str, Any]]:
+        done: Dict[int, Dict[str, Any]] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        continue   # torn last line from a crash
+                    i = e.get("i")
+                    if isinstance(i, int) and 0 <= i < len(self.hashes) and e.get("h") == self.hashes[i]:
+                        done[i] = e.get("r") or {}
+        except OSError:
+            pass
+        return done
+
+    def pending(self) -> List[int]:
+        return [i for i in range(len(self.hashes)) if i not in self.done]
+
+    def record(self, i: int, result: Dict[str, Any]) -> None:
+        if (result or {}).get("status") in RETRY_STATUSES: return
+        line = json.dumps({"i": i, "h": self.hashes[i], "r": result}, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.done[i] = result
+            try:
+                if self._fh is None:
+                    os.makedirs(self.dir, exist_ok=True)
+                    self._fh = open(self.path, "a", encoding="utf-8")
+                self._fh.write(line)
+                self._fh.flush()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Stop writing and release the journal; it stays on disk for the next run to resume."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close(); self._fh = None
+            with _held_lock:
+                _held.discard(self.path)
+
+    def complete(self) -> None:
+        """The run finished: drop the journal so the next run of this input starts fresh."""
+        try:
+            os.remove(self.path)   # before close(): nobody can claim the old file in between
+        except OSError:
+            pass
+        self.close()
+
+@contextmanager
+def held(journal: Optional[Journal]) -> Iterator[Optional[Journal]]:
+    """Around a run: complete() the journal when it finishes, release it however it stops."""
+    try:
+        yield journal
+    except BaseException:
+        if journal is not None: journal.close()
+        raise
+    if journal is not None: journal.complete()
+
+def split(journal: Optional[Journal], rows: List[Dict[str, Any]]) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """Indices and rows still to resolve (all of them without a journal)."""
+    idx = journal.pending() if journal is not None else list(range(len(rows)))
+    return idx, [rows[i] for i in idx]
+
+def replay(journal: Optional[Journal], on_result=None, on_progress=None, total: int = 0) -> Dict[int, Dict[str, Any]]:
+    """Hand the journaled rows to the run's callbacks as if they had just finished."""
+    done = dict(journal.done) if journal is not None else {}
+    for n, i in enumerate(sorted(done), 1):
+        if on_result: on_result(i, done[i])
+        if on_progress: on_progress(n, total)
+    return done
+
+def clear() -> None:
+    """Drop every journal but those of runs still going in this process."""
+    try:
+        for name in os.listdir(JOURNAL_DIR):
+            path = os.path.join(JOURNAL_DIR, name)
+            if name.endswith(".jsonl") and path not in _held: os.remove(path)
+    except OSError:
+        pass
@@ -1,5 +1,9 @@
-import re, requests
+import re
 from core.config import BITLY_TOKEN
+from services.ratelimit import throttle
+from services.transport import http_post
+
+BITLY_SHORTEN = "https://api-ssl.bitly.com/v4/shorten"
 
 def make_trackable_url(url: str, client_tag: str, campaign_tag: str) -> str:
     client_tag = re.sub(r'[^a-z0-9\-]+','', (client_tag or "").lower().replace(" ","-"))
@@ -10,9 +14,10 @@ def make_trackable_url(url: str, client_tag: str, campaign_tag: str) -> str:
 def bitly_shorten(long_url: str) -> str | None:
     if not BITLY_TOKEN: return None
     try:
-        r = requests.post("https://api-ssl.bitly.com/v4/shorten",
-                          headers={"Authorization": f"Bearer {BITLY_TOKEN}", "Content-Type":"application/json"},
-                          json={"long_url": long_url}, timeout=10)
+        throttle(BITLY_SHORTEN)
+        r = http_post(BITLY_SHORTEN,
+                      headers={"Authorization": f"Bearer {BITLY_TOKEN}", "Content-Type":"application/json"},
+                      json={"long_url": long_url}, timeout=10)
         if r.ok: return r.json().get("link")
     except Exception:
         return None
@@ -0,0 +1,174 @@
+# services/listing.py
+# One parsed view of a listing page. The page is fetched once (through the page cache)
+# and every consumer -- MLS / city-state confirmation, enrichment, thumbnails -- reads
+# the same object, so each extractor runs at most once per page.
+
+import os
+import re
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from services import enrich as _enrich, html_scan
+from services.page_cache import (fetch_page, fetch_page_async, fetch_page_until, fetch_page_until_async, Until,
+                                 PAGE_FRESH_SECONDS, UA_HEADERS, REQUEST_TIMEOUT)
+
+LISTING_DOC_MAX = int(os.getenv("LISTING_DOC_MAX", "64"))
+
+RE_HOMEDETAILS_HREF = re.compile(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"')
+
+_MISSING = object()
+
+class ListingDocument:
+    """
+    A fetched page plus lazily computed, memoized extractions.
+    `html` is "" when the page did not load; every accessor then returns an empty value.
+    `complete` is False when the fetch stopped early (get_listing_document(until=...)):
+    only the caller that asked for that should read it.
+    """
+
+    def __init__(self, url: str, html: str, final_url: Optional[str] = None, status: int = 200, complete: bool = True):
+        self.url = url
+        self.final_url = final_url or url
+        self.html = html or ""
+        self.status = status
+        self.complete = complete
+        self.fetched_at = time.time()
+        self._memo: Dict[Any, Any] = {}
+
+    def _once(self, key, fn):
+        v = self._memo.get(key, _MISSING)
+        if v is _MISSING:
+            v = self._memo[key] = fn() if self.html else None
+        return v
+
+    def __bool__(self) -> bool:
+        return bool(self.html)
+
+    @property
+    def scan(self) -> html_scan.ListingScan:
+        # not kept on the document: the scan holds a lower-cased copy of the page, so only
+        # the last few pages keep theirs (html_scan.SCAN_MEMO); every result below is memoized
+        return html_scan.scan(self.html)
+
+    @property
+    def is_homedetails(self) -> bool:
+        return "/homedetails/" in self.url or "/homedetails/" in self.final_url
+
+    # ---- confirmation
+    def contains_mls(self, mls_id: str) -> bool:
+        if not mls_id: return False
+        return bool(self._once(("mls", mls_id), lambda: self.scan.contains_mls(mls_id)))
+
+    def matches_city_state(self, city: str = None, state: str = None) -> bool:
+        return bool(self._once(("city_state", city, state), lambda: self.scan.contains_city_state(city, state)))
+
+    @property
+    def homedetails_links(self) -> List[str]:
+        return self._once("homedetails_links", lambda: RE_HOMEDETAILS_HREF.findall(self.html)) or []
+
+    # ---- extraction
+    @property
+    def mls_id(self) -> Optional[str]:
+        return self._once("mls_id", lambda: self.scan.mls_id())
+
+    @property
+    def address(self) -> Dict[str, str]:
+        return self._once("address", lambda: self.scan.address()) or html_scan.empty_address()
+
+    @property
+    def title(self) -> str:
+        return self._once("title", lambda: self.scan.title_or_desc()) or ""
+
+    @property
+    def hero_image(self) -> Optional[str]:
+        return self._once("hero_image", lambda: self.scan.hero_image())
+
+    @property
+    def og_image(self) -> Optional[str]:
+        return self._once("og_image", lambda: self.scan.og_image())
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self._once("meta", lambda: _enrich.parse_listing_meta(self.html, image_url=self.hero_image)) or {}
+
+# ---------- Per-process registry ----------
+# Small LRU so a page confirmed during resolution is reused by enrichment and the
+# thumbnail in the same run. Bodies stay on disk in the page cache after eviction.
+_docs: "OrderedDict[str, ListingDocument]" = OrderedDict()
+_docs_lock = threading.Lock()
+
+def _lookup(url: str) -> Optional[ListingDocument]:
+    with _docs_lock:
+        doc = _docs.get(url)
+        if doc is None: return None
+        if time.time() - doc.fetched_at >= PAGE_FRESH_SECONDS:
+            _docs.pop(url, None); return None
+        _docs.move_to_end(url)
+        return doc
+
+def _register(doc: ListingDocument) -> ListingDocument:
+    if not doc.html: return doc
+    with _docs_lock:
+        for k in {doc.url, doc.final_url}:
+            _docs[k] = doc; _docs.move_to_end(k)
+        while len(_docs) > LISTING_DOC_MAX:
+            _docs.popitem(last=False)
+    return doc
+
+# Set while the pages fetched will be read in full anyway (enrichment, thumbnails):
+# stopping at confirmation would only mean a second, full GET of the same page.
+_full_pages: "contextvars.ContextVar[bool]" = contextvars.ContextVar("listing_full_pages", default=False)
+
+@contextmanager
+def full_pages(on: bool = True) -> Iterator[None]:
+    """Within this scope get_listing_document(until=...) reads and caches whole pages."""
+    token = _full_pages.set(bool(on))
+    try:
+        yield
+    finally:
+        _full_pages.reset(token)
+
+def _usable(doc: Optional[ListingDocument], until: Optional[Until]) -> bool:
+    if doc is None: return False
+    return doc.complete or (until is not None and until(doc.html, 0))
+
+def get_listing_document(url: str, until: Optional[Until] = None) -> ListingDocument:
+    """
+    The page at `url`, fetched at most once per freshness window. With `until` (see
+    html_scan.watch) the body is streamed and the read stops once it is satisfied; the
+    document may then be partial, and later callers without `until` fetch it in full.
+    Inside full_pages() `until` is ignored.
+    """
+    if not url: return ListingDocument("", "", status=0)
+    if _full_pages.get(): until = None
+    doc = _lookup(url)
+    if _usable(doc, until): return doc
+    if until is None:
+        final_url, html, status = fetch_page(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+        return _register(ListingDocument(url, html, final_url, status))
+    final_url, html, status, complete = fetch_page_until(url, until, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+    return _register(ListingDocument(url, html, final_url, status, complete=complete))
+
+async def get_listing_document_async(url: str, client: Optional[httpx.AsyncClient] = None,
+                                     until: Optional[Until] = None) -> ListingDocument:
+    """asyncio twin of get_listing_document(); shares the same registry."""
+    if not url: return ListingDocument("", "", status=0)
+    if _full_pages.get(): until = None
+    doc = _lookup(url)
+    if _usable(doc, until): return doc
+    if until is None:
+        final_url, html, status = await fetch_page_async(url, client=client, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+        return _register(ListingDocument(url, html, final_url, status))
+    final_url, html, status, complete = await fetch_page_until_async(url, until, client=client, headers=UA_HEADERS,
+                                                                     timeout=REQUEST_TIMEOUT)
+    return _register(ListingDocument(url, html, final_url, status, complete=complete))
+
+def clear() -> None:
+    with _docs_lock:
+        _docs.clear()
@@ -0,0 +1,52 @@
+# services/negative_cache.py
+# Rows that ran every search stage and confirmed nothing ("deeplink_fallback"), keyed
+# by normalized query address + state-scoped MLS id. A re-run of the same list within the TTL goes
+# straight to the constructed deeplink instead of paying for every stage again --
+# unless a stage that was not available last time is available now, or the caller
+# forces a fresh search.
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from core.kvstore import KVStore
+from services.resolution_cache import normalize_address, mls_key
+
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", str(6 * 3600)))
+
+STORE = KVStore("negative", max_entries=int(os.getenv("NEGATIVE_CACHE_MAX", "20000")))
+
+def _key(query_address: str, mls_id: str = "", state: str = "") -> Optional[str]:
+    a = normalize_address(query_address)
+    m = mls_key(mls_id, state)
+    return f"{a}|{m}" if (a or m) else None
+
+def record(query_address: str, mls_id: str, stages: List[str], tried: List[str], state: str = "") -> None:
+    """
+    `stages`: what the row could run; `tried`: what it actually ran before falling back.
+    Only a row that ran all of them is a miss -- one whose stages the adaptive plan
+    skipped has not really been searched.
+    """
+    k = _key(query_address, mls_id, state)
+    if not k or not set(stages) <= set(tried): return
+    STORE.set(k, {"tried": sorted(set(tried)), "at": time.time()}, NEGATIVE_CACHE_TTL)
+
+def lookup(query_address: str, mls_id: str = "", stages: Optional[List[str]] = None, *, state: str = "",
+           count: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    The recorded miss for this row, or None. A miss that did not try every one of
+    `stages` (e.g. recorded before an Azure index or the MLS id was there) does not count.
+    """
+    k = _key(query_address, mls_id, state)
+    if not k: return None
+    hit = STORE.get(k, count=False, touch=count)
+    if hit and not set(stages or ()) <= set(hit.get("tried") or ()):
+        hit = None
+    if count: STORE.record(hit=bool(hit))
+    return hit
+
+def stats() -> Dict[str, int]:
+    return STORE.stats()
+
+def clear() -> None:
+    STORE.clear()
@@ -0,0 +1,223 @@
+# services/page_cache.py
+# One on-disk HTTP page cache for every HTML fetch helper (resolver, enrichment,
+# images, homedetails upgrade). Entries are served as-is while fresh, then
+# revalidated with If-None-Match / If-Modified-Since; a 304 reuses the stored body.
+# The store is bounded in bytes and evicts least recently used pages.
+#
+# fetch_page_until() streams a page instead and hangs up as soon as the caller's
+# predicate is satisfied (or a byte cap is hit); only bodies read to the end are cached.
+
+import os
+import time
+import codecs
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from core.kvstore import KVStore
+from services.batch import host_slot, async_host_slot, stopped
+from services import deadline
+from services.transport import get_async_client, http_get
+
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "12"))
+
+UA_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Cache-Control": "no-cache",
+}
+
+# Served without contacting the origin for this long; revalidated after that until the entry expires.
+PAGE_FRESH_SECONDS = float(os.getenv("PAGE_CACHE_FRESH", "900"))
+PAGE_CACHE_TTL     = float(os.getenv("PAGE_CACHE_TTL", str(7 * 86400)))
+PAGE_CACHE_MAX_MB  = int(os.getenv("PAGE_CACHE_MAX_MB", "500"))
+
+# Streamed fetches: read this much per step and never more than the cap in total.
+PAGE_STREAM_CHUNK_KB = int(os.getenv("PAGE_STREAM_CHUNK_KB", "64"))
+PAGE_STREAM_MAX_KB   = int(os.getenv("PAGE_STREAM_MAX_KB", "4096"))
+
+# until(text_so_far, start_of_new_text) -> True to stop reading
+Until = Callable[[str, int], bool]
+
+STORE = KVStore("pages", max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024, evict_every=25)
+
+def _entry(url: str) -> Optional[Dict[str, Any]]:
+    return STORE.get(url)
+
+def _is_fresh(entry: Dict[str, Any]) -> bool:
+    return time.time() - float(entry.get("fetched_at") or 0) < PAGE_FRESH_SECONDS
+
+def _conditional_headers(entry: Optional[Dict[str, Any]], headers: Dict[str, str]) -> Dict[str, str]:
+    h = dict(headers)
+    if entry:
+        if entry.get("etag"): h["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"): h["If-Modified-Since"] = entry["last_modified"]
+    return h
+
+def _save(url: str, final_url: str, text: str, resp_headers) -> None:
+    entry = {
+        "final_url": final_url,
+        "text": text,
+        "etag": resp_headers.get("ETag") or resp_headers.get("etag") or "",
+        "last_modified": resp_headers.get("Last-Modified") or resp_headers.get("last-modified") or "",
+        "fetched_at": time.time(),
+    }
+    STORE.set(url, entry, PAGE_CACHE_TTL)
+    if final_url and final_url != url:
+        STORE.set(final_url, entry, PAGE_CACHE_TTL)
+
+def _touch(url: str, entry: Dict[str, Any]) -> None:
+    entry = dict(entry, fetched_at=time.time())
+    STORE.set(url, entry, PAGE_CACHE_TTL)
+
+def fetch_page(url: str, *, headers: Optional[Dict[str, str]] = None, timeout: float = REQUEST_TIMEOUT) -> Tuple[str, str, int]:
+    """
+    GET `url` (following redirects) through the page cache.
+    Returns (final_url, html, status_code); html is "" unless the page loaded (200 or 304).
+    Once the active deadline (services/deadline.py) has passed, only cached bodies are served.
+    """
+    entry = _entry(url)
+    if entry and (_is_fresh(entry) or deadline.expired()):
+        return entry["final_url"] or url, entry["text"], 200
+    if deadline.expired():
+        return url, "", 0
+    try:
+        with host_slot(url):
+            r = http_get(url, headers=_conditional_headers(entry, headers or UA_HEADERS), timeout=deadline.clamp(timeout), allow_redirects=True)
+    except Exception:
+        return url, "", 0
+    if r.status_code == 304 and entry:
+        _touch(url, entry)
+        return entry["final_url"] or r.url, entry["text"], 200
+    if r.status_code == 200:
+        _save(url, r.url, r.text, r.headers)
+        return r.url, r.text, 200
+    return r.url, "", r.status_code
+
+async def fetch_page_async(url: str, *, client: Optional[httpx.AsyncClient] = None,
+                           headers: Optional[Dict[str, str]] = None, timeout: float = REQUEST_TIMEOUT) -> Tuple[str, str, int]:
+    """asyncio twin of fetch_page() on the shared client."""
+    entry = _entry(url)
+    if entry and (_is_fresh(entry) or deadline.expired()):
+        return entry["final_url"] or url, entry["text"], 200
+    if deadline.expired():
+        return url, "", 0
+    try:
+        client = client or get_async_client()
+        async with async_host_slot(url):
+            r = await client.get(url, headers=_conditional_headers(entry, headers or UA_HEADERS), timeout=deadline.clamp(timeout), follow_redirects=True)
+    except Exception:
+        return url, "", 0
+    if r.status_code == 304 and entry:
+        _touch(url, entry)
+        return entry["final_url"] or str(r.url), entry["text"], 200
+    if r.status_code == 200:
+        _save(url, str(r.url), r.text, r.headers)
+        return str(r.url), r.text, 200
+    return str(r.url), "", r.status_code
+
+# ---------- Streamed fetches ----------
+def _decoder(encoding: Optional[str]):
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+class _Reader:
+    """Accumulates decoded chunks and asks `until` after each one."""
+
+    def __init__(self, until: Until, encoding: Optional[str], max_bytes: int):
+        self.until, self.max_bytes = until, max_bytes
+        self.dec, self.text, self.nbytes = _decoder(encoding), "", 0
+        self.done = False   # predicate satisfied or cap reached
+
+    def feed(self, chunk: bytes) -> bool:
+        """False once reading should stop."""
+        self.nbytes += len(chunk)
+        start = len(self.text)
+        self.text += self.dec.decode(chunk)
+        if self.until(self.text, start) or self.nbytes >= self.max_bytes:
+            self.done = True
+        return not self.done
+
+    def finish(self) -> str:
+        if not self.done:
+            self.text += self.dec.decode(b"", final=True)
+        return self.text
+
+def fetch_page_until(url: str, until: Until, *, headers: Optional[Dict[str, str]] = None,
+                     timeout: float = REQUEST_TIMEOUT, max_bytes: int = PAGE_STREAM_MAX_KB * 1024) -> Tuple[str, str, int, bool]:
+    """
+    Like fetch_page(), but streams the body and stops reading once `until(text, start)`
+    returns True (`start` is where the newly arrived text begins) or `max_bytes` were read.
+    Returns (final_url, html, status_code, complete); a body cut short is not cached.
+    Inside a ranked fan-out (services.batch.stopped()) the read also ends once the
+    fan-out has its winner, leaving an incomplete body.
+    """
+    entry = _entry(url)
+    if entry and (_is_fresh(entry) or deadline.expired()):
+        return entry["final_url"] or url, entry["text"], 200, True
+    if deadline.expired():
+        return url, "", 0, True
+    if stopped():
+        return url, "", 0, False
+    try:
+        with host_slot(url):
+            if stopped(): return url, "", 0, False   # the winner landed while we waited for a slot
+            r = http_get(url, headers=_conditional_headers(entry, headers or UA_HEADERS), timeout=deadline.clamp(timeout),
+                         allow_redirects=True, stream=True)
+            try:
+                if r.status_code == 304 and entry:
+                    _touch(url, entry)
+                    return entry["final_url"] or r.url, entry["text"], 200, True
+                if r.status_code != 200:
+                    return r.url, "", r.status_code, True
+                reader = _Reader(until, r.encoding, max_bytes)
+                for chunk in r.iter_content(PAGE_STREAM_CHUNK_KB * 1024):
+                    if not reader.feed(chunk): break
+                    if stopped():
+                        reader.done = True; break
+            finally:
+                r.close()
+    except Exception:
+        return url, "", 0, True
+    text = reader.finish()
+    if not reader.done:
+        _save(url, r.url, text, r.headers)
+    return r.url, text, 200, not reader.done
+
+async def fetch_page_until_async(url: str, until: Until, *, client: Optional[httpx.AsyncClient] = None,
+                                 headers: Optional[Dict[str, str]] = None, timeout: float = REQUEST_TIMEOUT,
+                                 max_bytes: int = PAGE_STREAM_MAX_KB * 1024) -> Tuple[str, str, int, bool]:
+    """asyncio twin of fetch_page_until() on the shared client."""
+    entry = _entry(url)
+    if entry and (_is_fresh(entry) or deadline.expired()):
+        return entry["final_url"] or url, entry["text"], 200, True
+    if deadline.expired():
+        return url, "", 0, True
+    try:
+        client = client or get_async_client()
+        async with async_host_slot(url):
+            async with client.stream("GET", url, headers=_conditional_headers(entry, headers or UA_HEADERS),
+                                     timeout=deadline.clamp(timeout), follow_redirects=True) as r:
+                if r.status_code == 304 and entry:
+                    _touch(url, entry)
+                    return entry["final_url"] or str(r.url), entry["text"], 200, True
+                if r.status_code != 200:
+                    return str(r.url), "", r.status_code, True
+                reader = _Reader(until, r.encoding, max_bytes)
+                async for chunk in r.aiter_bytes(PAGE_STREAM_CHUNK_KB * 1024):
+                    if not reader.feed(chunk): break
+    except Exception:
+        return url, "", 0, True
+    text = reader.finish()
+    if not reader.done:
+        _save(url, str(r.url), text, r.headers)
+    return str(r.url), text, 200, not reader.done
+
+def stats() -> Dict[str, int]:
+    return STORE.stats()
+
+def clear() -> None:
+    STORE.clear()
@@ -0,0 +1,67 @@
+# services/query_plan.py
+# Builds the ordered Bing query list for one row before anything is sent: MLS
+# templates once (not once per address variant), exact-phrase address queries before
+# loose ones, land/lot keyword queries last, and semantic duplicates removed.
+
+import re
+from typing import List, Optional
+
+from utils.address import LOT_REGEX
+
+def mls_queries(mls_id: str, mls_name: Optional[str] = None) -> List[str]:
+    """Queries for the MLS-first stage, most specific first."""
+    if not mls_id: return []
+    base = [
+        f'"MLS# {mls_id}" site:zillow.com',
+        f'"{mls_id}" "MLS" site:zillow.com',
+        f'{mls_id} site:zillow.com/homedetails',
+    ]
+    named = [f'{q} "{mls_name}"' for q in base] if mls_name else []
+    return dedupe_queries(named + base)
+
+def address_queries(variants: List[str], mls_id: Optional[str] = None) -> List[str]:
+    """
+    Queries for the address-variant stage in expected-yield order:
+      1. MLS templates (only when `mls_id` is given -- pass None if the MLS stage already ran)
+      2. exact-phrase, then loose, queries for plain variants
+      3. the same for lot-number permutations
+      4. "land" / "lot" keyword queries
+    """
+    plain = [v for v in variants if not LOT_REGEX.search(v)]
+    lots  = [v for v in variants if LOT_REGEX.search(v)]
+    out: List[str] = []
+    if mls_id:
+        out += [
+            f'"MLS# {mls_id}" site:zillow.com/homedetails',
+            f'{mls_id} site:zillow.com/homedetails',
+            f'"{mls_id}" "MLS" site:zillow.com/homedetails',
+        ]
+    for group in (plain, lots):
+        for v in group:
+            out += [f'"{v}" site:zillow.com/homedetails', f'{v} site:zillow.com/homedetails']
+    for v in plain + lots:
+        out += [f'{v} land site:zillow.com/homedetails', f'{v} lot site:zillow.com/homedetails']
+    return dedupe_queries(out)
+
+def _semantic_key(q: str) -> str:
+    """
+    Quoted phrases keep their word order; loose terms are compared as a bag of words
+    (Bing ignores their order), case and punctuation-insensitive.
+    """
+    q = q.lower()
+    phrases = [re.sub(r"[^\w#]+", " ", p).strip() for p in re.findall(r'"([^"]*)"', q)]
+    loose = re.sub(r'"[^"]*"', " ", q)
+    site = " ".join(sorted(re.findall(r"site:\S+", loose)))
+    loose = re.sub(r"site:\S+", " ", loose)
+    words = sorted(w for w in re.split(r"[^\w#]+", loose) if w)
+    return "|".join(sorted(p for p in phrases if p)) + "||" + " ".join(words) + "||" + site
+
+def dedupe_queries(queries: List[str]) -> List[str]:
+    seen, out = set(), []
+    for q in queries:
+        q = re.sub(r"\s+", " ", (q or "").strip())
+        if not q: continue
+        k = _semantic_key(q)
+        if k in seen: continue
+        seen.add(k); out.append(q)
+    return out
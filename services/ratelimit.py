@@ -0,0 +1,120 @@
+# services/ratelimit.py
+# Token buckets per upstream API (Bing, Azure Search, zillow.com, Bitly). A request
+# only waits when its bucket is empty; the buckets live in cache_resource so every
+# session and worker thread in the process draws from the same budget.
+
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.cache import cache_resource
+from services import deadline
+from services.deadline import BudgetExhausted
+
+# upstream -> (requests per second, burst). A rate of 0 disables the bucket.
+RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "bing":   (float(os.getenv("RATE_BING",   "3")),  int(os.getenv("BURST_BING",   "3"))),
+    "azure":  (float(os.getenv("RATE_AZURE",  "10")), int(os.getenv("BURST_AZURE",  "20"))),
+    "zillow": (float(os.getenv("RATE_ZILLOW", "4")),  int(os.getenv("BURST_ZILLOW", "8"))),
+    "bitly":  (float(os.getenv("RATE_BITLY",  "5")),  int(os.getenv("BURST_BITLY",  "10"))),
+}
+
+class TokenBucket:
+    """
+    Classic token bucket. Tokens are reserved up front (the balance may go negative),
+    so concurrent callers queue in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate: float, burst: int) -> None:
+        with self._lock:
+            self.rate = max(0.0, float(rate))
+            self.burst = max(1, int(burst))
+            self.tokens = float(self.burst)
+            self.updated = time.monotonic()
+            self.waited = 0.0
+
+    def _reserve(self, limit: float = float("inf")) -> float:
+        """
+        Take one token and return how long the caller must wait for it. A wait longer
+        than `limit` raises BudgetExhausted and leaves the token in the bucket.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else 0.0
+            if wait > limit:
+                raise BudgetExhausted()
+            self.tokens -= 1.0
+            self.waited += wait
+            return wait
+
+    def acquire(self, limit: float = float("inf")) -> None:
+        wait = self._reserve(limit)
+        if wait > 0: time.sleep(wait)
+
+    async def acquire_async(self, limit: float = float("inf")) -> None:
+        wait = self._reserve(limit)
+        if wait > 0: await asyncio.sleep(wait)
+
+@cache_resource(show_spinner=False)
+def _shared_buckets() -> Dict[str, TokenBucket]:
+    return {name: TokenBucket(rate, burst) for name, (rate, burst) in RATE_LIMITS.items()}
+
+_buckets: Optional[Dict[str, TokenBucket]] = None
+_buckets_lock = threading.Lock()
+
+def buckets() -> Dict[str, TokenBucket]:
+    # Resolve the cache_resource once; worker threads have no script context to call it from.
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                _buckets = _shared_buckets()
+    return _buckets
+
+def upstream_for(url: str) -> Optional[str]:
+    try:
+        host = (urlparse(url or "").hostname or "").lower()
+    except Exception:
+        return None
+    if host.endswith("bing.microsoft.com"): return "bing"
+    if host.endswith(".search.windows.net"): return "azure"
+    if host == "zillow.com" or host.endswith(".zillow.com"): return "zillow"
+    if host.endswith("bitly.com"): return "bitly"
+    return None
+
+def configure_rate_limit(upstream: str, rate: float, burst: int) -> None:
+    b = buckets().get(upstream)
+    if b is None:
+        buckets()[upstream] = TokenBucket(rate, burst)
+    else:
+        b.configure(rate, burst)
+
+def _budget() -> float:
+    d = deadline.current()
+    return d.remaining() if d is not None else float("inf")
+
+def throttle(url: str) -> None:
+    """
+    Block until the upstream behind `url` has budget; unknown hosts pass through.
+    Raises BudgetExhausted, without spending a token, if the wait would outlast the active deadline.
+    """
+    b = buckets().get(upstream_for(url) or "")
+    if b is not None: b.acquire(_budget())
+
+async def throttle_async(url: str) -> None:
+    b = buckets().get(upstream_for(url) or "")
+    if b is not None: await b.acquire_async(_budget())
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {name: {"rate": b.rate, "burst": b.burst, "waited": round(b.waited, 2)} for name, b in buckets().items()}
@@ -0,0 +1,81 @@
+# services/resolution_cache.py
+# Persistent cache of final resolutions (zillow_url + status), keyed by MLS id
+# (scoped to the listing's state -- boards reuse ids), normalized query address and
+# source URL. Sits in front of process_single_row
+# and resolve_from_source_url so re-runs skip Bing/Azure entirely.
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from core.kvstore import KVStore
+
+DAY = 86400
+
+# Confident matches live long; fallbacks are retried soon in case the listing appears.
+TTL_BY_STATUS = {
+    "mls_match":         30 * DAY,
+    "azure_hit":         14 * DAY,
+    "city_state_match":   7 * DAY,
+    "deeplink_fallback":  6 * 3600,
+    "":                   3 * DAY,   # resolve_from_source_url results carry no status
+}
+DEFAULT_TTL = 1 * DAY
+
+STORE = KVStore("resolution", max_entries=int(os.getenv("RESOLUTION_CACHE_MAX", "50000")))
+
+def normalize_address(addr: str) -> str:
+    """Case/punctuation-insensitive form of a composed query address."""
+    s = (addr or "").lower()
+    s = re.sub(r"[^\w\s]", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+def mls_key(mls_id: str = "", state: str = "") -> str:
+    """"STATE:ID", or "" when either is unknown -- an id alone could belong to any board."""
+    m, st = (mls_id or "").strip().upper(), (state or "").strip().upper()
+    return f"{st}:{m}" if m and st else ""
+
+def _keys(query_address: str = "", mls_id: str = "", source_url: str = "", state: str = "") -> List[str]:
+    keys = []
+    m = mls_key(mls_id, state)
+    if m: keys.append("mls:" + m)
+    a = normalize_address(query_address)
+    if a: keys.append("addr:" + a)
+    if source_url and source_url.strip(): keys.append("url:" + source_url.strip())
+    return keys
+
+def lookup(query_address: str = "", mls_id: str = "", source_url: str = "", state: str = "") -> Optional[Dict[str, Any]]:
+    """Return the cached {"zillow_url","status","input_address"} for the first matching key."""
+    keys = _keys(query_address, mls_id, source_url, state)
+    for k in keys:
+        # count per lookup, not per probed key, so one row = one hit or one miss
+        hit = STORE.get(k, count=False)
+        if hit and hit.get("zillow_url"):
+            STORE.record(hit=True)
+            return hit
+    if keys:
+        STORE.record(hit=False)
+    return None
+
+def peek(query_address: str = "", mls_id: str = "", source_url: str = "", state: str = "") -> Optional[Dict[str, Any]]:
+    """lookup() without touching the hit/miss counters (for planning a run)."""
+    for k in _keys(query_address, mls_id, source_url, state):
+        hit = STORE.get(k, touch=False, count=False)
+        if hit and hit.get("zillow_url"):
+            return hit
+    return None
+
+def store(zillow_url: str, status: str, *, query_address: str = "", mls_id: str = "",
+          source_url: str = "", input_address: str = "", state: str = "") -> None:
+    if not zillow_url:
+        return
+    ttl = TTL_BY_STATUS.get(status or "", DEFAULT_TTL)
+    value = {"zillow_url": zillow_url, "status": status or "", "input_address": input_address or query_address or ""}
+    for k in _keys(query_address, mls_id, source_url, state):
+        STORE.set(k, value, ttl)
+
+def stats() -> Dict[str, int]:
+    return STORE.stats()
+
+def clear() -> None:
+    STORE.clear()
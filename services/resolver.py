@@ -1,5 +1,6 @@
 # services/resolver.py
-import os, re, time, json, requests
+import os, re, json, requests, contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional, Dict, Any, List
 
 from utils.address import (
@@ -7,7 +8,24 @@ from utils.address import (
     generate_address_variants,
     compose_query_address,
     clean_land_street,
+    get_first_by_keys,
+    is_probable_url,
+    PHOTO_KEYS,
+    URL_KEYS,
+    MLS_ID_KEYS,
 )
+from services.batch import host_slot, first_ranked_match, resolve_rows, DEFAULT_MAX_WORKERS
+from services import resolution_cache, negative_cache, search_cache, query_plan, stage_stats, deadline, journal as _journal
+from services.deadline import BudgetExhausted, BUDGET_EXHAUSTED, Deadline, ROW_DEADLINE, BATCH_DEADLINE
+from services.page_cache import fetch_page
+from services.transport import http_get, http_post
+from services import listing, html_scan, shortlinks
+
+# Robust address parser (IDX/Homespotter-safe)
+try:
+    from utils.address_parser import address_as_markdown_link
+except Exception:
+    address_as_markdown_link = None
 
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "12"))
 
@@ -26,65 +44,37 @@ BING_API_KEY          = os.getenv("BING_API_KEY", "")
 BING_CUSTOM_ID        = os.getenv("BING_CUSTOM_CONFIG_ID", "")
 
 # ---------- Basic fetch helpers ----------
+def _http_get(url: str, **kw) -> requests.Response:
+    kw["timeout"] = deadline.clamp(kw.get("timeout", REQUEST_TIMEOUT))
+    with host_slot(url):
+        return http_get(url, **kw)
+
+def _http_post(url: str, **kw) -> requests.Response:
+    kw["timeout"] = deadline.clamp(kw.get("timeout", REQUEST_TIMEOUT))
+    with host_slot(url):
+        return http_post(url, **kw)
+
 def expand_url_and_fetch_html(url: str) -> Tuple[str, str, int]:
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-        return r.url, (r.text if r.ok else ""), r.status_code
-    except Exception:
-        return url, "", 0
+    return fetch_page(shortlinks.expand(url), headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
 
 def upgrade_to_homedetails_if_needed(url: str) -> str:
-    if not url or "/homedetails/" in url:
-        return url
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        if not r.ok:
-            return url
-        m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', r.text)
-        return m.group(1) if m else url
-    except Exception:
+    """Upgrade a Zillow /homes/..._rb/ URL to its /homedetails/ page; other URLs pass through."""
+    if not url or "zillow.com" not in url or "/homedetails/" in url:
         return url
+    links = listing.get_listing_document(url).homedetails_links
+    return links[0] if links else url
 
 # ---------- HTML extractors ----------
 def extract_any_mls_id(html: str) -> Optional[str]:
     if not html: return None
-    for pat in [r'"mlsId"\s*:\s*"([A-Za-z0-9\-]{5,})"',
-                r'"mls"\s*:\s*"([A-Za-z0-9\-]{5,})"',
-                r'"listingId"\s*:\s*"([A-Za-z0-9\-]{5,})"']:
-        m = re.search(pat, html, re.I)
-        if m: return m.group(1)
-    m = re.search(r'\bMLS[^A-Za-z0-9]{0,5}#?\s*([A-Za-z0-9\-]{5,})\b', html, re.I)
-    return m.group(1) if m else None
+    return html_scan.scan(html).mls_id()
 
 def extract_address_from_html(html: str) -> Dict[str, str]:
-    out = {"street": "", "city": "", "state": "", "zip": ""}
-    if not html: return out
-    m = re.search(r'"streetAddress"\s*:\s*"([^"]+)"', html, re.I); out["street"] = m.group(1) if m else ""
-    m = re.search(r'"addressLocality"\s*:\s*"([^"]+)"', html, re.I); out["city"] = m.group(1) if m else ""
-    m = re.search(r'"addressRegion"\s*:\s*"([A-Za-z]{2})"', html, re.I); out["state"] = m.group(1) if m else ""
-    m = re.search(r'"postalCode"\s*:\s*"(\d{5}(?:-\d{4})?)"', html, re.I); out["zip"] = m.group(1) if m else ""
-    if not out["street"]:
-        for pat in [
-            r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
-            r"<title>\s*([^<]+?)\s*</title>",
-        ]:
-            m = re.search(pat, html, re.I)
-            if m:
-                title = m.group(1)
-                if re.search(r"\b[A-Za-z]{2}\b", title) and re.search(r"\d{5}", title):
-                    out["street"] = title
-                    break
-    return out
+    if not html: return html_scan.empty_address()
+    return html_scan.scan(html).address()
 
 def extract_title_or_desc(html: str) -> str:
-    for pat in [
-        r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
-        r"<title>\s*([^<]+)</title>",
-        r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]",
-    ]:
-        m = re.search(pat, html, re.I)
-        if m: return re.sub(r'\s+', ' ', m.group(1)).strip()
-    return ""
+    return html_scan.scan(html).title_or_desc()
 
 # ---------- Canonicalization ----------
 ZPID_RE = re.compile(r'(\d{6,})_zpid', re.I)
@@ -103,7 +93,51 @@ def make_preview_url(url: str) -> str:
     canon, _ = canonicalize_zillow(base)
     return canon if "/homedetails/" in canon else base
 
+# Zillow links that already name their listing (or at least its address), so a row
+# carrying one needs no fetch: /homedetails/<slug>/<zpid>_zpid/, /homedetails/<zpid>_zpid/,
+# /homes/<zpid>_zpid/; address only: /homedetails/<slug>/, /homes/<slug>_rb/.
+ZILLOW_LINK_RE = re.compile(r'^https?://(?:www\.|m\.)?zillow\.com(/[^?#]*)', re.I)
+ZILLOW_ZPID_PATH_RE = re.compile(r'^/(?:homedetails/(?:([^/]+)/)?|homes/)(\d{6,})_zpid/?$', re.I)
+ZILLOW_SLUG_PATH_RE = re.compile(r'^/(?:homedetails/([^/]+?)|homes/([^/]+?)_rb)/?$', re.I)
+
+def _slug_address(slug: str) -> str:
+    """'123-Main-St-Raleigh-NC-27601' -> '123 Main St Raleigh NC 27601'; '' unless it looks like an address."""
+    a = re.sub(r'\s+', ' ', re.sub(r'[-_,+]|%20|%2C', ' ', slug or '', flags=re.I)).strip()
+    return a if re.search(r'\d', a) and re.search(r'[A-Za-z]{2}', a) else ""
+
+def zillow_link(url: str) -> Tuple[str, str]:
+    """
+    (homedetails URL, address from its slug) for a Zillow link that already identifies
+    the listing; ("", address) for a Zillow link that only spells out an address;
+    ("", "") for anything else.
+    """
+    m = ZILLOW_LINK_RE.match((url or "").strip())
+    if not m: return "", ""
+    path = m.group(1)
+    z = ZILLOW_ZPID_PATH_RE.match(path)
+    if z:
+        slug = z.group(1) or ""
+        return f"https://www.zillow.com/homedetails/{slug + '/' if slug else ''}{z.group(2)}_zpid/", _slug_address(slug)
+    a = ZILLOW_SLUG_PATH_RE.match(path)
+    return "", (_slug_address(a.group(1) or a.group(2)) if a else "")
+
+def route_row(row: Dict[str, Any]) -> Tuple[str, Any]:
+    """
+    How a row resolves: ("zillow", (url, address)) for a Zillow link that needs no
+    network, ("link", url) for other links through resolve_from_source_url, else
+    ("address", row) for process_single_row -- Zillow links that only carry an address
+    become address rows.
+    """
+    url_in = get_first_by_keys(row, URL_KEYS) or row.get("source_url", "")
+    if not (url_in and is_probable_url(url_in)): return "address", row
+    zurl, addr = zillow_link(url_in)
+    if zurl: return "zillow", (zurl, addr)
+    if addr: return "address", {**row, "address": row.get("address") or addr}
+    return "link", url_in
+
 # ---------- Search helpers (Bing/Azure) ----------
+# `delay` arguments are kept for existing callers but no longer sleep: pacing comes
+# from the per-upstream token buckets in services/ratelimit.py.
 def _slug(text:str) -> str: return re.sub(r'[^a-z0-9]+', '-', (text or '').lower()).strip('-')
 
 def url_matches_city_state(url:str, city:str=None, state:str=None) -> bool:
@@ -120,104 +154,211 @@ def url_matches_city_state(url:str, city:str=None, state:str=None) -> bool:
 BING_WEB    = "https://api.bing.microsoft.com/v7.0/search"
 BING_CUSTOM = "https://api.bing.microsoft.com/v7.0/custom/search"
 
+def _bing_fetch(query):
+    """Raw Bing call; raises on HTTP errors so failures never reach the search cache."""
+    h = {"Ocp-Apim-Subscription-Key": BING_API_KEY}
+    if BING_CUSTOM_ID:
+        p = {"q": query, "customconfig": BING_CUSTOM_ID, "mkt": "en-US", "count": 15}
+        r = _http_get(BING_CUSTOM, headers=h, params=p, timeout=REQUEST_TIMEOUT)
+    else:
+        p = {"q": query, "mkt": "en-US", "count": 15, "responseFilter": "Webpages"}
+        r = _http_get(BING_WEB, headers=h, params=p, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    return data.get("webPages", {}).get("value") if "webPages" in data else data.get("items", []) or []
+
+# The owner's budget or its clamped timeout: a row sharing the search retries it itself.
+SEARCH_ROW_ERRORS = search_cache.ROW_ERRORS + (requests.Timeout,)
+
 def bing_search_items(query):
-    key = BING_API_KEY; custom = BING_CUSTOM_ID
-    if not key: return []
-    h = {"Ocp-Apim-Subscription-Key": key}
+    if not BING_API_KEY: return []
+    deadline.check()  # before joining/owning a shared in-flight search
     try:
-        if custom:
-            p = {"q": query, "customconfig": custom, "mkt": "en-US", "count": 15}
-            r = requests.get(BING_CUSTOM, headers=h, params=p, timeout=REQUEST_TIMEOUT)
-        else:
-            p = {"q": query, "mkt": "en-US", "count": 15, "responseFilter": "Webpages"}
-            r = requests.get(BING_WEB, headers=h, params=p, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        data = r.json()
-        return data.get("webPages", {}).get("value") if "webPages" in data else data.get("items", []) or []
-    except requests.RequestException:
+        return search_cache.cached_search(query, _bing_fetch, scope=BING_CUSTOM_ID, row_errors=SEARCH_ROW_ERRORS)
+    except (requests.RequestException, ValueError):
         return []
 
-MLS_HTML_PATTERNS = [
-    lambda mid: rf'\bMLS[^A-Za-z0-9]{{0,5}}#?\s*{re.escape(mid)}\b',
-    lambda mid: rf'\bMLS\s*#?\s*{re.escape(mid)}\b',
-    lambda mid: rf'"mls"\s*:\s*"{re.escape(mid)}"',
-    lambda mid: rf'"mlsId"\s*:\s*"{re.escape(mid)}"',
-    lambda mid: rf'"mlsId"\s*:\s*{re.escape(mid)}',
-]
 def page_contains_mls(html:str, mls_id:str) -> bool:
-    for mk in MLS_HTML_PATTERNS:
-        if re.search(mk(mls_id), html, re.I): return True
-    return False
+    return html_scan.scan(html).contains_mls(mls_id)
 
 def page_contains_city_state(html:str, city:str=None, state:str=None) -> bool:
-    ok = False
-    if city and re.search(re.escape(city), html, re.I): ok = True
-    if state and re.search(rf'\b{re.escape(state)}\b', html, re.I): ok = True
-    return ok
+    return html_scan.scan(html).contains_city_state(city, state)
+
+def confirm_until(url:str, mls_id:str=None, required_city:str=None, required_state:str=None):
+    """
+    Stop reading a homedetails page once it confirms; search pages are read in full
+    for their links.
+    """
+    if "/homedetails/" not in url: return None
+    return html_scan.watch(mls_id, required_city, required_state)
+
+def is_search_page(url: str) -> bool:
+    """A Zillow /homes/..._rb/ results page, whose homedetails links get confirmed instead."""
+    return url.endswith("_rb/") and "/homedetails/" not in url
+
+def page_verdict(doc, url: str, mls_id: str = None, required_city: str = None, required_state: str = None,
+                 *, homedetails_only: bool = True):
+    """(url, match type) when the fetched `doc` confirms the listing, else (None, None)."""
+    if not doc: return None, None
+    if doc.contains_mls(mls_id): return url, "mls_match"
+    if doc.matches_city_state(required_city, required_state) and (not homedetails_only or "/homedetails/" in url):
+        return url, "city_state_match"
+    return None, None
 
 def confirm_or_resolve_on_page(url:str, mls_id:str=None, required_city:str=None, required_state:str=None):
     try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT); r.raise_for_status()
-        html = r.text
-        if mls_id and page_contains_mls(html, mls_id): return url, "mls_match"
-        if page_contains_city_state(html, required_city, required_state) and "/homedetails/" in url:
-            return url, "city_state_match"
-        if url.endswith("_rb/") and "/homedetails/" not in url:
-            cand = re.findall(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', html)[:8]
-            for u in cand:
-                try:
-                    rr = requests.get(u, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT); rr.raise_for_status()
-                    h2 = rr.text
-                    if (mls_id and page_contains_mls(h2, mls_id)): return u, "mls_match"
-                    if page_contains_city_state(h2, required_city, required_state): return u, "city_state_match"
-                except Exception:
-                    continue
+        doc = listing.get_listing_document(url, until=confirm_until(url, mls_id, required_city, required_state))
+        ok, mtype = page_verdict(doc, url, mls_id, required_city, required_state)
+        if ok or not doc: return ok, mtype
+        if is_search_page(url):
+            def _check(u):
+                d2 = listing.get_listing_document(u, until=confirm_until(u, mls_id, required_city, required_state))
+                return page_verdict(d2, u, mls_id, required_city, required_state, homedetails_only=False)
+            return first_ranked_match(doc.homedetails_links[:8], _check)
     except Exception:
         return None, None
     return None, None
 
-def find_zillow_by_mls_with_confirmation(mls_id, required_state=None, required_city=None, mls_name=None, delay=0.35, require_match=False, max_candidates=20):
-    if not (BING_API_KEY and mls_id): return None, None
-    q_mls = [
-        f'"MLS# {mls_id}" site:zillow.com',
-        f'"{mls_id}" "MLS" site:zillow.com',
-        f'{mls_id} site:zillow.com/homedetails',
-    ]
-    if mls_name: q_mls = [f'{q} "{mls_name}"' for q in q_mls] + q_mls
-    seen, candidates = set(), []
-    for q in q_mls:
-        items = bing_search_items(q)
-        for it in items:
-            url = it.get("url") or it.get("link") or ""
-            if not url or "zillow.com" not in url: continue
-            if "/homedetails/" not in url and "/homes/" not in url: continue
-            if require_match and not url_matches_city_state(url, required_city, required_state): continue
-            if url in seen: continue
-            seen.add(url); candidates.append(url)
-            if len(candidates) >= max_candidates: break
-        if len(candidates) >= max_candidates: break
-    for u in candidates:
-        time.sleep(delay)
+def _collect_candidates(items, seen, candidates, required_city, required_state, require_match):
+    for it in items:
+        url = it.get("url") or it.get("link") or ""
+        if not url or "zillow.com" not in url: continue
+        if "/homedetails/" not in url and "/homes/" not in url: continue
+        if require_match and not url_matches_city_state(url, required_city, required_state): continue
+        if url in seen: continue
+        seen.add(url); candidates.append(url)
+
+def take_candidates(items, seen, n, *, required_city=None, required_state=None, require_match=False, max_candidates=None) -> List[str]:
+    """
+    The new Zillow candidates in one query's results (`n` taken so far), trimmed to
+    `max_candidates`; the first homedetails one becomes the row's fallback answer.
+    """
+    fresh = []
+    _collect_candidates(items, seen, fresh, required_city, required_state, require_match)
+    if max_candidates: fresh = fresh[:max_candidates - n]
+    for u in fresh:
+        if "/homedetails/" in u: deadline.offer(u); break
+    return fresh
+
+def _search_and_confirm(queries, *, mls_id=None, required_city=None, required_state=None,
+                        require_match=False, default_type="city_state_match", max_candidates=None):
+    """
+    Send planned queries in order and confirm each query's new candidates before
+    sending the next one, so nothing more is issued once a candidate is confirmed.
+    """
+    seen, n = set(), 0
+    def _check(u):
         ok, mtype = confirm_or_resolve_on_page(u, mls_id=mls_id, required_city=required_city, required_state=required_state)
-        if ok: return ok, mtype or "mls_match"
+        return ok, (mtype or default_type) if ok else None
+    for q in queries:
+        deadline.check()
+        fresh = take_candidates(bing_search_items(q), seen, n, required_city=required_city, required_state=required_state,
+                                require_match=require_match, max_candidates=max_candidates)
+        n += len(fresh)
+        if fresh:
+            ok, mtype = first_ranked_match(fresh, _check)
+            if ok: return ok, mtype
+        if max_candidates and n >= max_candidates: break
     return None, None
 
-def azure_search_first_zillow(query_address):
-    if not (AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY): return None
+def find_zillow_by_mls_with_confirmation(mls_id, required_state=None, required_city=None, mls_name=None, delay=0.35, require_match=False, max_candidates=20):
+    if not (BING_API_KEY and mls_id): return None, None
+    return _search_and_confirm(
+        query_plan.mls_queries(mls_id, mls_name), mls_id=mls_id, required_city=required_city, required_state=required_state,
+        require_match=require_match, default_type="mls_match", max_candidates=max_candidates,
+    )
+
+AZURE_BATCH_CONCURRENCY = int(os.getenv("AZURE_BATCH_CONCURRENCY", "8"))
+
+def _azure_scope() -> str:
+    return f"{AZURE_SEARCH_ENDPOINT}/{AZURE_SEARCH_INDEX}"
+
+def _azure_fetch(query_address):
+    """Raw Azure Search call returning [{"url": zillow_url}] or []; raises on HTTP errors."""
     url = f"{AZURE_SEARCH_ENDPOINT}/indexes/{AZURE_SEARCH_INDEX}/docs/search?api-version=2023-11-01"
     h = {"Content-Type":"application/json","api-key":AZURE_SEARCH_KEY}
+    r = _http_post(url, headers=h, data=json.dumps({"search": query_address, "top": 1}), timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    return _azure_items(r.json() or {})
+
+def _azure_items(data):
+    hits = data.get("value") or data.get("results") or []
+    if not hits: return []
+    doc = hits[0].get("document") or hits[0]
+    for k in ("zillow_url","zillowLink","zillow","url","link"):
+        v = doc.get(k) if isinstance(doc, dict) else None
+        if isinstance(v, str) and "zillow.com" in v: return [{"url": v}]
+    return []
+
+def azure_search_first_zillow(query_address):
+    if not (AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY): return None
+    deadline.check()
+    try:
+        items = search_cache.cached_search(query_address, _azure_fetch, scope=_azure_scope(), store=search_cache.AZURE_STORE,
+                                           row_errors=SEARCH_ROW_ERRORS)
+    except (requests.RequestException, ValueError):
+        return None
+    return items[0]["url"] if items else None
+
+def azure_cached(query_address):
+    """The cached Azure answer for `query_address`: a URL, "" for a cached miss, None if never asked."""
+    if not (AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY): return None
+    items = search_cache.peek(query_address, scope=_azure_scope(), store=search_cache.AZURE_STORE)
+    if items is None: return None
+    return items[0]["url"] if items else ""
+
+def azure_is_confident(zurl, required_city=None, required_state=None) -> bool:
+    """An Azure answer good enough to skip Bing: a homedetails page in the expected city/state."""
+    return bool(zurl) and "/homedetails/" in zurl and url_matches_city_state(zurl, required_city, required_state)
+
+def search_stages(mls_id: str, mls_first: bool = True) -> List[str]:
+    """The search stages a row can run with the configured keys, in order."""
+    stages = []
+    if mls_first and mls_id and BING_API_KEY: stages.append("mls")
+    if AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY: stages.append("azure")
+    if BING_API_KEY: stages.append("bing")
+    return stages
+
+def azure_queries_for_rows(rows, *, land_mode=True, defaults=None, use_cache=True, mls_first=True, force=False) -> List[str]:
+    """Query addresses worth prefetching: address rows (not links) without a cached resolution or recent miss."""
+    out = []
+    for row in rows:
+        kind, row = route_row(row)
+        if kind != "address": continue
+        comp, _, query_address = row_variants(row, land_mode=land_mode, defaults=defaults)
+        mls_id = (comp.get("mls_id") or "").strip()
+        state = comp["state"] or (defaults or {}).get("state", "")
+        if use_cache and resolution_cache.peek(query_address, mls_id, state=state): continue
+        if use_cache and not force and negative_cache.lookup(query_address, mls_id, search_stages(mls_id, mls_first), state=state, count=False): continue
+        out.append(query_address)
+    return out
+
+def short_links_for_rows(rows, *, use_cache=True) -> List[str]:
+    """Short links worth expanding up front: link rows without a cached resolution."""
+    out = []
+    for row in rows:
+        kind, url = route_row(row)
+        if kind != "link" or not shortlinks.is_short_link(url): continue
+        if use_cache and resolution_cache.peek(source_url=url): continue
+        out.append(url)
+    return out
+
+def prefetch_azure(query_addresses, *, max_workers=AZURE_BATCH_CONCURRENCY) -> Dict[str, Optional[str]]:
+    """
+    Look up every query address of a run up front (bounded concurrency, cached by query)
+    so process_single_row knows the Azure answer before any Bing work starts.
+    """
+    queries = [q for q in dict.fromkeys(query_addresses) if q]
+    if not (queries and AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY): return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers or 1), len(queries))), thread_name_prefix="azure") as pool:
+        futs = [pool.submit(contextvars.copy_context().run, _azure_or_none, q) for q in queries]
+        return dict(zip(queries, [f.result() for f in futs]))
+
+def _azure_or_none(query_address):
     try:
-        r = requests.post(url, headers=h, data=json.dumps({"search": query_address, "top": 1}), timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        data = r.json() or {}; hits = data.get("value") or data.get("results") or []
-        if not hits: return None
-        doc = hits[0].get("document") or hits[0]
-        for k in ("zillow_url","zillowLink","zillow","url","link"):
-            v = doc.get(k) if isinstance(doc, dict) else None
-            if isinstance(v, str) and "zillow.com" in v: return v
-    except requests.RequestException:
+        return azure_search_first_zillow(query_address)
+    except BudgetExhausted:
         return None
-    return None
 
 def construct_deeplink_from_parts(street, city, state, zipc, defaults):
     c = (city or defaults.get("city","")).strip()
@@ -232,65 +373,113 @@ def construct_deeplink_from_parts(street, city, state, zipc, defaults):
     a = slug.lower(); a = re.sub(r"[^\w\s,-]", "", a).replace(",", ""); a = re.sub(r"\s+", "-", a.strip())
     return f"https://www.zillow.com/homes/{a}_rb/"
 
-def resolve_homedetails_with_bing_variants(address_variants, required_state=None, required_city=None, mls_id=None, delay=0.3, require_match=False):
+def resolve_homedetails_with_bing_variants(address_variants, required_state=None, required_city=None, mls_id=None, delay=0.3, require_match=False, mls_queries=True):
+    """`mls_queries=False` leaves out the MLS templates (the MLS stage already sent them)."""
     if not BING_API_KEY: return None, None
-    candidates, seen = [], set()
-    for qaddr in address_variants:
-        queries = [
-            f'{qaddr} site:zillow.com/homedetails',
-            f'"{qaddr}" site:zillow.com/homedetails',
-            f'{qaddr} land site:zillow.com/homedetails',
-            f'{qaddr} lot site:zillow.com/homedetails',
-        ]
-        if mls_id:
-            queries = [
-                f'"MLS# {mls_id}" site:zillow.com/homedetails',
-                f'{mls_id} site:zillow.com/homedetails',
-                f'"{mls_id}" "MLS" site:zillow.com/homedetails',
-            ] + queries
-        for q in queries:
-            items = bing_search_items(q)
-            for it in items:
-                url = it.get("url") or it.get("link") or ""
-                if not url or "zillow.com" not in url: continue
-                if "/homedetails/" not in url and "/homes/" not in url: continue
-                if require_match and not url_matches_city_state(url, required_city, required_state): continue
-                if url in seen: continue
-                seen.add(url); candidates.append(url)
-            time.sleep(delay)
-    for u in candidates:
-        time.sleep(delay)
-        ok, mtype = confirm_or_resolve_on_page(u, mls_id=mls_id, required_city=required_city, required_state=required_state)
-        if ok: return ok, mtype or "city_state_match"
-    return None, None
+    return _search_and_confirm(
+        query_plan.address_queries(address_variants, mls_id if mls_queries else None), mls_id=mls_id,
+        required_city=required_city, required_state=required_state, require_match=require_match,
+    )
 
 # ---------- Public: resolve_from_source_url / process_single_row ----------
-def resolve_from_source_url(source_url: str, defaults: Dict[str,str]) -> Tuple[str, str]:
-    final_url, html, _ = expand_url_and_fetch_html(source_url)
-    mls_id = extract_any_mls_id(html)
+# The decisions live here once; resolver_async.py only swaps in the awaitable I/O.
+def source_url_cached(source_url: str, use_cache: bool = True) -> Optional[Tuple[str, str]]:
+    if not use_cache: return None
+    hit = resolution_cache.lookup(source_url=source_url)
+    return (hit["zillow_url"], hit.get("input_address", "")) if hit else None
+
+def source_url_done(source_url: str, zurl: str, used_addr: str, d: Deadline, use_cache: bool = True) -> Tuple[str, str]:
+    """Cache a finished resolution; one cut short by the budget is returned uncached."""
+    if d.expired() and "/homedetails/" not in zurl:
+        return zurl, used_addr
+    if use_cache and zurl:
+        status = "" if "/homedetails/" in zurl else "deeplink_fallback"
+        resolution_cache.store(zurl, status, source_url=source_url, input_address=used_addr)
+    return zurl, used_addr
+
+def source_mls_id(doc) -> str:
+    """The page's MLS id, else a trailing id in its URL (e.g. .../tmlspar/10116790)."""
+    if doc.mls_id: return doc.mls_id
+    m = re.search(r"/([A-Za-z0-9]{6,})/?$", doc.final_url)
+    return m.group(1) if m else ""
+
+def source_address(info: Optional[Dict[str, Any]], doc) -> Tuple[str, str, str, str]:
+    """(street, city, state, zip) from the robust parser's `info`, filled from the page when it found too little."""
+    info = info or {}
+    street = (info.get("streetAddress") or "").strip()
+    city   = (info.get("addressLocality") or "").strip()
+    state  = (info.get("addressRegion") or "").strip()
+    zipc   = (info.get("postalCode") or "").strip()
+    if not (street or (city and state)):
+        addr = doc.address
+        street = street or (addr.get("street","") or "")
+        city   = city   or (addr.get("city","") or "")
+        state  = state  or (addr.get("state","") or "")
+        zipc   = zipc   or (addr.get("zip","") or "")
+    return street, city, state, zipc
+
+def source_deeplink(parts: Tuple[str, str, str, str], defaults: Dict[str,str]) -> Optional[Tuple[str, str]]:
+    street, city, state, zipc = parts
+    if not (street or (city and state)): return None
+    used_addr = compose_query_address(street, city, state, zipc, defaults)
+    return construct_deeplink_from_parts(street or used_addr, city, state, zipc, defaults), used_addr
+
+def title_queries(title: str) -> List[str]:
+    return [f'"{title}" site:zillow.com/homedetails', f'{title} site:zillow.com'] if title else []
+
+def first_homedetails(items) -> str:
+    return next((u for u in ((it.get("url") or "") for it in items) if "/homedetails/" in u), "")
+
+def resolve_from_source_url(source_url: str, defaults: Dict[str,str], *, use_cache: bool = True, budget=None) -> Tuple[str, str]:
+    """
+    Resolve an arbitrary listing link to a Zillow URL.
+    Returns (zillow_url, used_address); ("", "") when nothing Zillow-shaped was found
+    so the caller can fall back to its own logic. `budget` is seconds or a Deadline;
+    when it runs out the best candidate so far (or "") comes back uncached.
+    """
+    hit = source_url_cached(source_url, use_cache)
+    if hit: return hit
+    d = deadline.row_deadline(budget)
+    try:
+        with deadline.scope(d):
+            zurl, used_addr = _resolve_from_source_url(source_url, defaults)
+    except BudgetExhausted:
+        return d.best or "", ""
+    return source_url_done(source_url, zurl, used_addr, d, use_cache)
+
+def _resolve_from_source_url(source_url: str, defaults: Dict[str,str]) -> Tuple[str, str]:
+    # short links are expanded without downloading; one that lands on a Zillow listing needs no page at all
+    target = shortlinks.expand(source_url)
+    zurl, slug_addr = zillow_link(target)
+    if zurl: return zurl, slug_addr
+    doc = listing.get_listing_document(target)
+
+    # 1) MLS -> Zillow
+    mls_id = source_mls_id(doc)
     if mls_id:
         z1, _ = find_zillow_by_mls_with_confirmation(mls_id)
         if z1: return z1, ""
-    addr = extract_address_from_html(html)
-    street = addr.get("street","") or ""
-    city, state, zipc = addr.get("city",""), addr.get("state",""), addr.get("zip","")
-    if street or (city and state):
-        variants = generate_address_variants(street or "", city, state, zipc, defaults)
-        z2, _ = resolve_homedetails_with_bing_variants(variants, required_state=state or None, required_city=city or None)
-        if z2: return z2, compose_query_address(street, city, state, zipc, defaults)
-    title = extract_title_or_desc(html)
-    if title:
-        for q in [f'"{title}" site:zillow.com/homedetails', f'{title} site:zillow.com']:
-            items = bing_search_items(q)
-            for it in items:
-                u = it.get("url") or ""
-                if "/homedetails/" in u: return u, title
-    if city or state or street:
-        return construct_deeplink_from_parts(street or title or "", city, state, zipc, defaults), compose_query_address(street or title or "", city, state, zipc, defaults)
-    return final_url, ""
 
-def process_single_row(row, *, delay=0.5, land_mode=True, defaults=None,
-                       require_state=True, mls_first=True, default_mls_name="", max_candidates=20):
+    # 2) Robust parser: pull the address from the page and build a Zillow deeplink
+    info = None
+    if address_as_markdown_link:
+        try:
+            _md, info = address_as_markdown_link(doc.final_url, parse_html=True, fetch=fetch_page)
+        except Exception:
+            pass
+    found = source_deeplink(source_address(info, doc), defaults)
+    if found: return found
+
+    # 3) Title/desc -> homedetails search
+    for q in title_queries(doc.title):
+        u = first_homedetails(bing_search_items(q))
+        if u: return u, doc.title
+
+    # 4) Give up -- never hand back a non-Zillow URL
+    return "", ""
+
+def row_variants(row, *, land_mode=True, defaults=None):
+    """(components, address variants, query address) for a row, exactly as process_single_row builds them."""
     defaults = defaults or {"city":"", "state":"", "zip":""}
     comp = extract_components(row)
     street_raw = comp["street_raw"]
@@ -299,28 +488,196 @@ def process_single_row(row, *, delay=0.5, land_mode=True, defaults=None,
     if land_mode:
         variants = list(dict.fromkeys(variants + generate_address_variants(street_clean, comp["city"], comp["state"], comp["zip"], defaults)))
     query_address = variants[0] if variants else compose_query_address(street_raw, comp["city"], comp["state"], comp["zip"], defaults)
-    deeplink = construct_deeplink_from_parts(street_raw, comp["city"], comp["state"], comp["zip"], defaults)
-    required_state_val = defaults.get("state") if require_state else None
-    required_city_val  = comp["city"] or defaults.get("city")
-    zurl, status = None, "fallback"
-    mls_id   = (comp.get("mls_id") or "").strip()
-    mls_name = (comp.get("mls_name") or default_mls_name or "").strip()
-    if mls_first and mls_id:
-        zurl, mtype = find_zillow_by_mls_with_confirmation(
-            mls_id, required_state=required_state_val, required_city=required_city_val,
-            mls_name=mls_name, delay=min(delay, 0.6), require_match=require_state, max_candidates=max_candidates
-        )
-        if zurl: status = "mls_match" if mtype == "mls_match" else "city_state_match"
-    if not zurl:
-        z = azure_search_first_zillow(query_address)
-        if z: zurl, status = z, "azure_hit"
-    if not zurl:
-        zurl, mtype = resolve_homedetails_with_bing_variants(
-            variants, required_state=required_state_val, required_city=required_city_val,
-            mls_id=mls_id or None, delay=min(delay, 0.6), require_match=require_state
+    return comp, variants, query_address
+
+class RowPlan:
+    """
+    What process_single_row decides for one address/MLS row without any I/O: its query
+    address and deeplink, the cached shortcuts (resolution cache, prefetched Azure
+    answer, recent miss), the search stages in order, and the bookkeeping once they ran.
+    The sync and async resolvers only differ in how they run each stage.
+    """
+
+    def __init__(self, row, *, land_mode=True, defaults=None, require_state=True, mls_first=True,
+                 default_mls_name="", use_cache=True, adaptive=True, force=False):
+        defaults = defaults or {"city":"", "state":"", "zip":""}
+        self.csv_photo = get_first_by_keys(row, PHOTO_KEYS)
+        comp, self.variants, self.query_address = row_variants(row, land_mode=land_mode, defaults=defaults)
+        self.deeplink = construct_deeplink_from_parts(comp["street_raw"], comp["city"], comp["state"], comp["zip"], defaults)
+        self.require_state = require_state
+        self.required_state = defaults.get("state") if require_state else None
+        self.required_city  = comp["city"] or defaults.get("city")
+        self.mls_id   = (comp.get("mls_id") or "").strip()
+        self.mls_name = (comp.get("mls_name") or default_mls_name or "").strip()
+        self.use_cache, self.adaptive, self.force = use_cache, adaptive, force
+        self.state = comp["state"] or defaults.get("state") or ""
+        self.shape = stage_stats.shape_key(bool(self.mls_id), land_mode, self.state)
+        self.stages = search_stages(self.mls_id, mls_first)
+        self.az = None
+
+    def result(self, zillow_url, status):
+        return {"input_address": self.query_address, "mls_id": self.mls_id, "zillow_url": zillow_url, "status": status, "csv_photo": self.csv_photo}
+
+    def shortcut(self):
+        """The row's result without searching, or None: cached, a confident prefetched Azure hit, or a recent miss."""
+        if self.use_cache:
+            hit = resolution_cache.lookup(self.query_address, self.mls_id, state=self.state)
+            if hit and not (self.force and hit["status"] == "deeplink_fallback"):
+                return self.result(hit["zillow_url"], hit["status"])
+        self.az = azure_cached(self.query_address)
+        if azure_is_confident(self.az, self.required_city, self.required_state):
+            # prefetched by prefetch_azure(): a confident hit skips Bing and page confirmation
+            stage_stats.record(self.shape, ["azure"], "azure")
+            if self.use_cache:
+                resolution_cache.store(self.az, "azure_hit", query_address=self.query_address, mls_id=self.mls_id, state=self.state)
+            return self.result(self.az, "azure_hit")
+        if self.use_cache and not self.force and self.stages and negative_cache.lookup(self.query_address, self.mls_id, self.stages, state=self.state):
+            return self.result(self.deeplink, "deeplink_fallback")
+        return None
+
+    def deadline(self, budget):
+        """`budget`: seconds or a Deadline; defaults to ROW_DEADLINE inside any active run deadline."""
+        d = deadline.row_deadline(budget)
+        if self.az: d.offer(self.az)
+        return d
+
+    def order(self) -> List[str]:
+        return stage_stats.plan(self.shape, self.stages) if self.adaptive else list(self.stages)
+
+    def mls_args(self, delay, max_candidates) -> Dict[str, Any]:
+        return dict(required_state=self.required_state, required_city=self.required_city, mls_name=self.mls_name,
+                    delay=min(delay, 0.6), require_match=self.require_state, max_candidates=max_candidates)
+
+    def bing_args(self, delay, tried) -> Dict[str, Any]:
+        return dict(required_state=self.required_state, required_city=self.required_city, mls_id=self.mls_id or None,
+                    delay=min(delay, 0.6), require_match=self.require_state, mls_queries="mls" not in tried)
+
+    @staticmethod
+    def status_for(stage, mtype) -> str:
+        if stage == "azure": return "azure_hit"
+        return "mls_match" if mtype == "mls_match" else "city_state_match"
+
+    def ran(self, tried, winner) -> None:
+        if self.stages: stage_stats.record(self.shape, tried, winner)
+
+    def exhausted(self, d):
+        # out of time: best unconfirmed candidate so far, else the deeplink; not cached
+        return self.result(d.best or self.deeplink, BUDGET_EXHAUSTED)
+
+    def finish(self, zurl, status, tried):
+        if not zurl:
+            if self.use_cache and self.stages:
+                negative_cache.record(self.query_address, self.mls_id, self.stages, tried, state=self.state)
+            return self.result(self.deeplink, "deeplink_fallback")
+        if self.use_cache:
+            resolution_cache.store(zurl, status, query_address=self.query_address, mls_id=self.mls_id, state=self.state)
+        return self.result(zurl, status)
+
+def _run_stage(plan, stage, tried, *, delay, max_candidates):
+    if stage == "mls":
+        return find_zillow_by_mls_with_confirmation(plan.mls_id, **plan.mls_args(delay, max_candidates))
+    if stage == "azure":
+        return azure_search_first_zillow(plan.query_address), None
+    if stage == "bing":
+        return resolve_homedetails_with_bing_variants(plan.variants, **plan.bing_args(delay, tried))
+    return None, None
+
+def process_single_row(row, *, delay=0.5, land_mode=True, defaults=None,
+                       require_state=True, mls_first=True, default_mls_name="", max_candidates=20, use_cache=True, adaptive=True, budget=None,
+                       force=False):
+    """
+    Resolve one address/MLS row: cached resolution, prefetched Azure answer, then the
+    search stages. A row that recently fell back to the deeplink after every available
+    stage goes straight to the deeplink again (services/negative_cache.py) unless `force`.
+    """
+    plan = RowPlan(row, land_mode=land_mode, defaults=defaults, require_state=require_state, mls_first=mls_first,
+                   default_mls_name=default_mls_name, use_cache=use_cache, adaptive=adaptive, force=force)
+    hit = plan.shortcut()
+    if hit: return hit
+    d = plan.deadline(budget)
+    zurl, status, tried = None, None, []
+    try:
+        with deadline.scope(d):
+            for stage in plan.order():
+                deadline.check()
+                tried.append(stage)
+                zurl, mtype = _run_stage(plan, stage, tried, delay=delay, max_candidates=max_candidates)
+                if zurl:
+                    status = plan.status_for(stage, mtype)
+                    break
+            if not zurl: d.check()  # stages may have given up quietly on an expired budget
+            plan.ran(tried, tried[-1] if zurl else None)
+    except BudgetExhausted:
+        return plan.exhausted(d)
+    return plan.finish(zurl, status, tried)
+
+# ---------- Rows and whole runs ----------
+def zillow_link_result(row, target):
+    zurl, used_addr = target
+    return {"input_address": used_addr or row.get("address", "") or "", "mls_id": get_first_by_keys(row, MLS_ID_KEYS),
+            "zillow_url": zurl, "status": "", "csv_photo": get_first_by_keys(row, PHOTO_KEYS)}
+
+def source_url_result(row, zurl, used_addr, d):
+    return {
+        "input_address": used_addr or row.get("address", "") or "",
+        "mls_id": get_first_by_keys(row, MLS_ID_KEYS),
+        "zillow_url": zurl,
+        "status": BUDGET_EXHAUSTED if d.expired() and "/homedetails/" not in zurl else "",
+        "csv_photo": get_first_by_keys(row, PHOTO_KEYS),
+    }
+
+def resolve_row(row, defaults, *, use_cache=True, budget=None, **row_kw):
+    """
+    Route a row like the Run tab does: Zillow links that name their listing as they are,
+    other links through resolve_from_source_url, the rest through process_single_row.
+    """
+    kind, target = route_row(row)
+    if kind == "zillow": return zillow_link_result(row, target)
+    d = deadline.row_deadline(budget)
+    if kind == "link":
+        zurl, used_addr = resolve_from_source_url(target, defaults, use_cache=use_cache, budget=d)
+        return source_url_result(row, zurl, used_addr, d)
+    return process_single_row(target, defaults=defaults, use_cache=use_cache, budget=d, **row_kw)
+
+def resolve_batch(rows, *, defaults=None, use_cache=True, max_workers=DEFAULT_MAX_WORKERS,
+                  row_budget=ROW_DEADLINE, batch_budget=BATCH_DEADLINE, on_progress=None, on_result=None,
+                  journal=None, full_pages=False, should_stop=None, **row_kw):
+    """
+    The resolution phase of a run: prefetch Azure answers and expand short links, then
+    resolve every row on the bounded pool under a per-row budget nested in the run budget.
+    `full_pages`: the caller enriches the results afterwards, so confirmation reads (and
+    caches) whole homedetails pages instead of stopping early (see listing.full_pages).
+    Results come back in input order; see services.batch.resolve_rows for the callbacks.
+    With a services.journal.Journal, rows it already holds are replayed instead of
+    resolved, each new row is checkpointed, and the journal is dropped on success
+    (and released, left for a later resume, if the run stops early).
+    `should_stop()` ends the run early: rows in flight still land (and are journaled)
+    before services.batch.BatchStopped is raised.
+    """
+    defaults = defaults or {"city":"", "state":"", "zip":""}
+    total = len(rows)
+    with _journal.held(journal):
+        results = _journal.replay(journal, on_result, on_progress, total)
+        idx, todo = _journal.split(journal, rows)
+        run = Deadline(batch_budget)
+        with deadline.scope(run):
+            prefetch_azure(
+                azure_queries_for_rows(todo, land_mode=row_kw.get("land_mode", True), defaults=defaults, use_cache=use_cache,
+                                       mls_first=row_kw.get("mls_first", True), force=row_kw.get("force", False)),
+                max_workers=max_workers,
+            )
+            shortlinks.expand_all(short_links_for_rows(todo, use_cache=use_cache), max_workers=max_workers)
+        def one(row):
+            # worker threads do not inherit the run's context, so nest explicitly
+            with listing.full_pages(full_pages):
+                return resolve_row(row, defaults, use_cache=use_cache, budget=Deadline(row_budget, parent=run), **row_kw)
+        def landed(k, res):
+            results[idx[k]] = res
+            if journal is not None: journal.record(idx[k], res)
+            if on_result: on_result(idx[k], res)
+        resumed = total - len(todo)
+        resolve_rows(
+            todo, one, max_workers=max_workers, on_result=landed, should_stop=should_stop,
+            on_progress=(lambda done, n: on_progress(resumed + done, total)) if on_progress else None,
         )
-        if zurl: status = "mls_match" if mtype == "mls_match" else "city_state_match"
-    if not zurl:
-        zurl, status = deeplink, "deeplink_fallback"
-    time.sleep(min(delay, 0.4))
-    return {"input_address": query_address, "mls_id": mls_id, "zillow_url": zurl, "status": status, "csv_photo": None}
+    return [results[i] for i in range(total) if i in results]
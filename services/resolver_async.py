@@ -0,0 +1,287 @@
+# services/resolver_async.py
+# asyncio versions of the services/resolver.py chain. Every call goes through the
+# loop's shared httpx.AsyncClient (services/transport.py), so a whole upload can be
+# resolved, enriched and given thumbnails inside one event loop.
+
+import json, asyncio
+from typing import Tuple, Optional, Dict, Any, List, Callable
+
+import httpx
+
+from services import resolver as _sync
+from services.resolver import (
+    UA_HEADERS,
+    REQUEST_TIMEOUT,
+    BING_WEB,
+    BING_CUSTOM,
+)
+from services.batch import async_host_slot, first_ranked_match_async
+from services import search_cache, query_plan, deadline, journal as _journal
+from services.deadline import BudgetExhausted
+from services.page_cache import fetch_page_async
+from services import listing, shortlinks
+from services.transport import get_async_client, async_client_scope
+from services.images import picture_for_result_async
+
+# ---------- Basic fetch helpers ----------
+async def _aget(url: str, **kw) -> httpx.Response:
+    kw["timeout"] = deadline.clamp(kw.get("timeout", REQUEST_TIMEOUT))
+    async with async_host_slot(url):
+        return await get_async_client().get(url, **kw)
+
+async def _apost(url: str, **kw) -> httpx.Response:
+    kw["timeout"] = deadline.clamp(kw.get("timeout", REQUEST_TIMEOUT))
+    async with async_host_slot(url):
+        return await get_async_client().post(url, **kw)
+
+async def expand_url_and_fetch_html_async(url: str) -> Tuple[str, str, int]:
+    return await fetch_page_async(await shortlinks.expand_async(url), headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+
+async def upgrade_to_homedetails_if_needed_async(url: str) -> str:
+    if not url or "zillow.com" not in url or "/homedetails/" in url:
+        return url
+    links = (await listing.get_listing_document_async(url)).homedetails_links
+    return links[0] if links else url
+
+# ---------- Search helpers (Bing/Azure) ----------
+SEARCH_ROW_ERRORS = search_cache.ROW_ERRORS + (httpx.TimeoutException,)   # see resolver.SEARCH_ROW_ERRORS
+
+async def _bing_fetch_async(query):
+    h = {"Ocp-Apim-Subscription-Key": _sync.BING_API_KEY}
+    if _sync.BING_CUSTOM_ID:
+        p = {"q": query, "customconfig": _sync.BING_CUSTOM_ID, "mkt": "en-US", "count": 15}
+        r = await _aget(BING_CUSTOM, headers=h, params=p, timeout=REQUEST_TIMEOUT)
+    else:
+        p = {"q": query, "mkt": "en-US", "count": 15, "responseFilter": "Webpages"}
+        r = await _aget(BING_WEB, headers=h, params=p, timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    return data.get("webPages", {}).get("value") if "webPages" in data else data.get("items", []) or []
+
+async def bing_search_items_async(query):
+    if not _sync.BING_API_KEY: return []
+    deadline.check()
+    try:
+        return await search_cache.cached_search_async(query, _bing_fetch_async, scope=_sync.BING_CUSTOM_ID,
+                                                       row_errors=SEARCH_ROW_ERRORS)
+    except (httpx.HTTPError, ValueError):
+        return []
+
+async def confirm_or_resolve_on_page_async(url:str, mls_id:str=None, required_city:str=None, required_state:str=None):
+    try:
+        doc = await listing.get_listing_document_async(url, until=_sync.confirm_until(url, mls_id, required_city, required_state))
+        ok, mtype = _sync.page_verdict(doc, url, mls_id, required_city, required_state)
+        if ok or not doc: return ok, mtype
+        if _sync.is_search_page(url):
+            async def _check(u):
+                d2 = await listing.get_listing_document_async(u, until=_sync.confirm_until(u, mls_id, required_city, required_state))
+                return _sync.page_verdict(d2, u, mls_id, required_city, required_state, homedetails_only=False)
+            return await first_ranked_match_async(doc.homedetails_links[:8], _check)
+    except Exception:
+        return None, None
+    return None, None
+
+async def _search_and_confirm_async(queries, *, mls_id=None, required_city=None, required_state=None,
+                                    require_match=False, default_type="city_state_match", max_candidates=None):
+    """asyncio twin of resolver._search_and_confirm()."""
+    seen, n = set(), 0
+    async def _check(u):
+        ok, mtype = await confirm_or_resolve_on_page_async(u, mls_id=mls_id, required_city=required_city, required_state=required_state)
+        return ok, (mtype or default_type) if ok else None
+    for q in queries:
+        deadline.check()
+        fresh = _sync.take_candidates(await bing_search_items_async(q), seen, n, required_city=required_city,
+                                      required_state=required_state, require_match=require_match, max_candidates=max_candidates)
+        n += len(fresh)
+        if fresh:
+            ok, mtype = await first_ranked_match_async(fresh, _check)
+            if ok: return ok, mtype
+        if max_candidates and n >= max_candidates: break
+    return None, None
+
+async def find_zillow_by_mls_with_confirmation_async(mls_id, required_state=None, required_city=None, mls_name=None, delay=0.35, require_match=False, max_candidates=20):
+    if not (_sync.BING_API_KEY and mls_id): return None, None
+    return await _search_and_confirm_async(
+        query_plan.mls_queries(mls_id, mls_name), mls_id=mls_id, required_city=required_city, required_state=required_state,
+        require_match=require_match, default_type="mls_match", max_candidates=max_candidates,
+    )
+
+async def _azure_fetch_async(query_address):
+    url = f"{_sync.AZURE_SEARCH_ENDPOINT}/indexes/{_sync.AZURE_SEARCH_INDEX}/docs/search?api-version=2023-11-01"
+    h = {"Content-Type":"application/json","api-key":_sync.AZURE_SEARCH_KEY}
+    r = await _apost(url, headers=h, content=json.dumps({"search": query_address, "top": 1}), timeout=REQUEST_TIMEOUT)
+    r.raise_for_status()
+    return _sync._azure_items(r.json() or {})
+
+async def azure_search_first_zillow_async(query_address):
+    if not (_sync.AZURE_SEARCH_ENDPOINT and _sync.AZURE_SEARCH_INDEX and _sync.AZURE_SEARCH_KEY): return None
+    deadline.check()
+    try:
+        items = await search_cache.cached_search_async(query_address, _azure_fetch_async, scope=_sync._azure_scope(),
+                                                       store=search_cache.AZURE_STORE, row_errors=SEARCH_ROW_ERRORS)
+    except (httpx.HTTPError, ValueError):
+        return None
+    return items[0]["url"] if items else None
+
+async def prefetch_azure_async(query_addresses, *, concurrency=_sync.AZURE_BATCH_CONCURRENCY) -> Dict[str, Optional[str]]:
+    """asyncio twin of resolver.prefetch_azure()."""
+    queries = [q for q in dict.fromkeys(query_addresses) if q]
+    if not (queries and _sync.AZURE_SEARCH_ENDPOINT and _sync.AZURE_SEARCH_INDEX and _sync.AZURE_SEARCH_KEY): return {}
+    sem = asyncio.Semaphore(max(1, int(concurrency or 1)))
+    async def one(q):
+        async with sem:
+            try:
+                return await azure_search_first_zillow_async(q)
+            except BudgetExhausted:
+                return None
+    return dict(zip(queries, await asyncio.gather(*(one(q) for q in queries))))
+
+async def resolve_homedetails_with_bing_variants_async(address_variants, required_state=None, required_city=None, mls_id=None, delay=0.3, require_match=False, mls_queries=True):
+    if not _sync.BING_API_KEY: return None, None
+    return await _search_and_confirm_async(
+        query_plan.address_queries(address_variants, mls_id if mls_queries else None), mls_id=mls_id,
+        required_city=required_city, required_state=required_state, require_match=require_match,
+    )
+
+# ---------- Public: resolve_from_source_url / process_single_row ----------
+# Same decisions as services/resolver.py (shared helpers there); only the I/O is awaited.
+async def resolve_from_source_url_async(source_url: str, defaults: Dict[str,str], *, use_cache: bool = True, budget=None) -> Tuple[str, str]:
+    hit = _sync.source_url_cached(source_url, use_cache)
+    if hit: return hit
+    d = deadline.row_deadline(budget)
+    try:
+        with deadline.scope(d):
+            zurl, used_addr = await _resolve_from_source_url_async(source_url, defaults)
+    except BudgetExhausted:
+        return d.best or "", ""
+    return _sync.source_url_done(source_url, zurl, used_addr, d, use_cache)
+
+async def _resolve_from_source_url_async(source_url: str, defaults: Dict[str,str]) -> Tuple[str, str]:
+    target = await shortlinks.expand_async(source_url)
+    zurl, slug_addr = _sync.zillow_link(target)
+    if zurl: return zurl, slug_addr
+    doc = await listing.get_listing_document_async(target)
+    mls_id = _sync.source_mls_id(doc)
+    if mls_id:
+        z1, _ = await find_zillow_by_mls_with_confirmation_async(mls_id)
+        if z1: return z1, ""
+    info = None
+    if _sync.address_as_markdown_link:
+        try:
+            # bs4-based parser is blocking; keep it off the event loop
+            _md, info = await asyncio.to_thread(_sync.address_as_markdown_link, doc.final_url, None, True, fetch=_sync.fetch_page)
+        except Exception:
+            pass
+    found = _sync.source_deeplink(_sync.source_address(info, doc), defaults)
+    if found: return found
+    for q in _sync.title_queries(doc.title):
+        u = _sync.first_homedetails(await bing_search_items_async(q))
+        if u: return u, doc.title
+    return "", ""
+
+async def _run_stage_async(plan, stage, tried, *, delay, max_candidates):
+    if stage == "mls":
+        return await find_zillow_by_mls_with_confirmation_async(plan.mls_id, **plan.mls_args(delay, max_candidates))
+    if stage == "azure":
+        return await azure_search_first_zillow_async(plan.query_address), None
+    if stage == "bing":
+        return await resolve_homedetails_with_bing_variants_async(plan.variants, **plan.bing_args(delay, tried))
+    return None, None
+
+async def process_single_row_async(row, *, delay=0.5, land_mode=True, defaults=None,
+                                   require_state=True, mls_first=True, default_mls_name="", max_candidates=20, use_cache=True, adaptive=True, budget=None,
+                                   force=False):
+    plan = _sync.RowPlan(row, land_mode=land_mode, defaults=defaults, require_state=require_state, mls_first=mls_first,
+                         default_mls_name=default_mls_name, use_cache=use_cache, adaptive=adaptive, force=force)
+    hit = plan.shortcut()
+    if hit: return hit
+    d = plan.deadline(budget)
+    zurl, status, tried = None, None, []
+    try:
+        with deadline.scope(d):
+            for stage in plan.order():
+                deadline.check()
+                tried.append(stage)
+                zurl, mtype = await _run_stage_async(plan, stage, tried, delay=delay, max_candidates=max_candidates)
+                if zurl:
+                    status = plan.status_for(stage, mtype)
+                    break
+            if not zurl: d.check()
+            plan.ran(tried, tried[-1] if zurl else None)
+    except BudgetExhausted:
+        return plan.exhausted(d)
+    return plan.finish(zurl, status, tried)
+
+# ---------- One-loop pipeline ----------
+async def resolve_row_async(row: Dict[str, Any], defaults: Dict[str, str], **row_kw) -> Dict[str, Any]:
+    """Route a row like the Run tab does (see services.resolver.resolve_row)."""
+    kind, target = _sync.route_row(row)
+    if kind == "zillow": return _sync.zillow_link_result(row, target)
+    if kind == "link":
+        d = deadline.row_deadline(row_kw.get("budget"))
+        zurl, used_addr = await resolve_from_source_url_async(target, defaults, use_cache=row_kw.get("use_cache", True), budget=d)
+        return _sync.source_url_result(row, zurl, used_addr, d)
+    return await process_single_row_async(target, defaults=defaults, **row_kw)
+
+async def resolve_enrich_rows_async(
+    rows: List[Dict[str, Any]],
+    *,
+    defaults: Optional[Dict[str, str]] = None,
+    enrich: bool = True,
+    thumbnails: bool = True,
+    concurrency: int = 8,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    batch_budget: Optional[float] = deadline.BATCH_DEADLINE,
+    journal: Optional["_journal.Journal"] = None,
+    **row_kw,
+) -> List[Dict[str, Any]]:
+    """
+    Resolve, upgrade, enrich and pick a thumbnail for every row in a single event loop.
+    Each homedetails page is fetched and parsed once (services/listing.py) and shared by
+    confirmation, enrichment and the thumbnail.
+    Results come back in input order; `on_result(index, result)` fires as each row
+    finishes. `batch_budget` (seconds) bounds the whole run; pass `budget=` for the
+    per-row limit. A `journal` works as in services.resolver.resolve_batch.
+    """
+    defaults = defaults or {"city":"", "state":"", "zip":""}
+    total = len(rows)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    with _journal.held(journal):
+        for i, res in _journal.replay(journal, on_result, on_progress, total).items():
+            results[i] = res
+        idx, todo = _journal.split(journal, rows)
+        # enrichment and thumbnails read each homedetails page in full: fetch it whole the first time
+        with deadline.scope(deadline.Deadline(batch_budget)), listing.full_pages(enrich or thumbnails):
+            async with async_client_scope():
+                await prefetch_azure_async(_sync.azure_queries_for_rows(
+                    todo, land_mode=row_kw.get("land_mode", True), defaults=defaults, use_cache=row_kw.get("use_cache", True),
+                    mls_first=row_kw.get("mls_first", True), force=row_kw.get("force", False),
+                ))
+                await shortlinks.expand_all_async(_sync.short_links_for_rows(todo, use_cache=row_kw.get("use_cache", True)),
+                                                  concurrency=concurrency)
+                sem = asyncio.Semaphore(max(1, int(concurrency or 1)))
+                async def task(i, row):
+                    async with sem:
+                        res = await resolve_row_async(row, defaults, **row_kw)
+                        zurl = res.get("zillow_url") or ""
+                        if zurl:
+                            zurl = res["zillow_url"] = await upgrade_to_homedetails_if_needed_async(zurl)
+                        doc = None
+                        if (enrich or thumbnails) and "/homedetails/" in zurl:
+                            doc = await listing.get_listing_document_async(zurl)
+                            if enrich and doc:
+                                res.update(doc.meta)
+                        if thumbnails and not res.get("image_url"):
+                            img, _log = await picture_for_result_async(res.get("input_address", ""), zurl, res.get("csv_photo"), doc=doc)
+                            if img: res["image_url"] = img
+                        return i, res
+                done = total - len(todo)
+                for fut in asyncio.as_completed([task(i, rows[i]) for i in idx]):
+                    i, res = await fut
+                    results[i] = res
+                    if journal is not None: journal.record(i, res)
+                    if on_result: on_result(i, res)
+                    done += 1
+                    if on_progress: on_progress(done, total)
+    return [r for r in results if r is not None]
@@ -3,7 +3,8 @@
 
 from typing import Tuple, Optional
 import re
-import requests
+
+from services.page_cache import fetch_page
 
 REQUEST_TIMEOUT = 12
 
@@ -46,12 +47,8 @@ def make_preview_url(url: str) -> str:
     return canon if "/homedetails/" in canon else base
 
 def expand_url_and_fetch_html(url: str) -> Tuple[str, str, int]:
-    """Follow redirects and fetch HTML; returns (final_url, html, status_code)."""
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-        return r.url, (r.text if r.ok else ""), r.status_code
-    except Exception:
-        return url, "", 0
+    """Follow redirects and fetch HTML (via the shared page cache); returns (final_url, html, status_code)."""
+    return fetch_page(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
 
 def upgrade_to_homedetails_if_needed(url: str) -> str:
     """
@@ -60,14 +57,9 @@ def upgrade_to_homedetails_if_needed(url: str) -> str:
     """
     if not url or "/homedetails/" in url:
         return url
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        if not r.ok:
-            return url
-        m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', r.text)
-        return m.group(1) if m else url
-    except Exception:
-        return url
+    _, html, _ = fetch_page(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+    m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', html) if html else None
+    return m.group(1) if m else url
 
 def resolve_from_source_url(source_url: str) -> Tuple[str, str]:
     """
@@ -0,0 +1,142 @@
+# services/search_cache.py
+# Content-keyed cache for Bing (and Azure Search) responses. Identical query strings
+# are collapsed while in flight (threads or asyncio tasks in one batch) and persisted
+# across runs with a TTL. Only url/name per item are kept.
+
+import os
+import re
+import asyncio
+import hashlib
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.kvstore import KVStore
+from services.deadline import BudgetExhausted
+
+SEARCH_CACHE_TTL       = float(os.getenv("BING_CACHE_TTL", str(3 * 86400)))
+SEARCH_CACHE_EMPTY_TTL = float(os.getenv("BING_CACHE_EMPTY_TTL", str(6 * 3600)))
+
+STORE = KVStore("bing", max_entries=int(os.getenv("BING_CACHE_MAX", "100000")))
+AZURE_STORE = KVStore("azure", max_entries=int(os.getenv("AZURE_CACHE_MAX", "100000")))
+
+_INFLIGHT_LOCK = threading.Lock()
+_INFLIGHT: Dict[Tuple[str, str], Future] = {}
+_INFLIGHT_ASYNC: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], asyncio.Future]]" = weakref.WeakKeyDictionary()
+
+# Failures that belong to the calling row (its budget ran out, or its clamped timeout
+# fired) rather than to the query: never handed to the rows waiting on the same call.
+ROW_ERRORS: Tuple[type, ...] = (BudgetExhausted,)
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", (query or "").strip()).lower()
+
+def cache_key(query: str, scope: str = "") -> str:
+    """`scope` separates endpoints/configs (e.g. the Bing custom config id)."""
+    return hashlib.sha1(f"{scope}|{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+def compact_items(items: Optional[List[Dict[str, Any]]]) -> List[Dict[str, str]]:
+    out = []
+    for it in items or []:
+        url = it.get("url") or it.get("link") or ""
+        if url:
+            out.append({"url": url, "name": it.get("name") or it.get("title") or ""})
+    return out
+
+def _store(store: KVStore, key: str, items: List[Dict[str, str]]) -> None:
+    store.set(key, items, SEARCH_CACHE_TTL if items else SEARCH_CACHE_EMPTY_TTL)
+
+def peek(query: str, *, scope: str = "", store: Optional[KVStore] = None) -> Optional[List[Dict[str, str]]]:
+    """Cached items for `query` without fetching; None when not cached."""
+    return (store or STORE).get(cache_key(query, scope), count=False)
+
+def _release(inflight: Dict[Tuple[str, str], Any], k: Tuple[str, str], fut: Any) -> None:
+    if inflight.get(k) is fut:
+        inflight.pop(k, None)
+
+def cached_search(query: str, fetch: Callable[[str], List[Dict[str, Any]]], *, scope: str = "",
+                  store: Optional[KVStore] = None, row_errors: Tuple[type, ...] = ROW_ERRORS) -> List[Dict[str, str]]:
+    """
+    Return compact items for `query`, calling `fetch(query)` only on a miss.
+    `fetch` should raise on transport/API errors so failures are not cached.
+    Concurrent callers asking for the same query share one upstream call.
+    `store` picks the namespace (Bing by default, AZURE_STORE for Azure Search).
+    When the shared call fails with one of `row_errors` (the owner's budget or timeout),
+    each waiter makes the call itself under its own deadline.
+    """
+    store = store or STORE
+    key = cache_key(query, scope)
+    hit = store.get(key)
+    if hit is not None:
+        return hit
+    k = (store.ns, key)
+    while True:
+        with _INFLIGHT_LOCK:
+            fut = _INFLIGHT.get(k)
+            if fut is None:
+                fut = _INFLIGHT[k] = Future()
+                break
+        try:
+            return fut.result()
+        except row_errors:
+            continue
+    try:
+        items = compact_items(fetch(query))
+        _store(store, key, items)
+        fut.set_result(items)
+        return items
+    except BaseException as e:
+        with _INFLIGHT_LOCK:
+            _release(_INFLIGHT, k, fut)   # before waking the waiters, so a retry does not find this call
+        fut.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _release(_INFLIGHT, k, fut)
+
+async def cached_search_async(query: str, fetch: Callable[[str], Awaitable[List[Dict[str, Any]]]], *, scope: str = "",
+                              store: Optional[KVStore] = None, row_errors: Tuple[type, ...] = ROW_ERRORS) -> List[Dict[str, str]]:
+    """
+    asyncio twin of cached_search(); in-flight dedupe is per event loop. If the task
+    that owns the upstream call is cancelled, its waiters make the call themselves.
+    """
+    store = store or STORE
+    key = cache_key(query, scope)
+    hit = store.get(key)
+    if hit is not None:
+        return hit
+    k = (store.ns, key)
+    inflight = _INFLIGHT_ASYNC.setdefault(asyncio.get_running_loop(), {})
+    while True:
+        fut = inflight.get(k)
+        if fut is None:
+            break
+        await asyncio.wait([fut])   # unlike awaiting it, never cancels the owner's future
+        if fut.cancelled() or isinstance(fut.exception(), row_errors):
+            continue
+        return fut.result()
+    fut = inflight[k] = asyncio.get_running_loop().create_future()
+    try:
+        items = compact_items(await fetch(query))
+        _store(store, key, items)
+        fut.set_result(items)
+        return items
+    except asyncio.CancelledError:
+        _release(inflight, k, fut)
+        fut.cancel()
+        raise
+    except BaseException as e:
+        _release(inflight, k, fut)
+        fut.set_exception(e)
+        fut.exception()  # mark retrieved when nobody else is waiting
+        raise
+    finally:
+        _release(inflight, k, fut)
+
+def stats() -> Dict[str, int]:
+    return STORE.stats()
+
+def clear() -> None:
+    STORE.clear()
+    AZURE_STORE.clear()
@@ -0,0 +1,157 @@
+# services/shortlinks.py
+# Short-link expansion (l.hms.pt, bit.ly, ...). Redirects are followed one hop at a
+# time with HEAD -- falling back to a one-byte ranged GET for hosts that refuse HEAD --
+# and only while the link is still on a shortener, so expanding a link never downloads
+# a page. The first URL off a shortener is kept in a persistent cache (short -> final);
+# the page itself is fetched later, and only if something needs to parse it.
+#
+# A failed or unfinished expansion returns the link unchanged (uncached), so callers
+# fall back to fetching it with redirects as before.
+
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from core.kvstore import KVStore
+from services import deadline
+from services.batch import host_slot, async_host_slot
+from services.page_cache import UA_HEADERS
+from services.transport import get_async_client, http_get, http_head
+
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "12"))
+
+SHORTLINK_HOSTS = frozenset(
+    ["l.hms.pt", "bit.ly", "bitly.com", "tinyurl.com", "t.co", "ow.ly", "buff.ly", "rebrand.ly",
+     "is.gd", "rb.gy", "cutt.ly", "shorturl.at", "tiny.cc", "lnkd.in", "goo.gl", "zillow.app.link"]
+    + [h.strip().lower() for h in os.getenv("SHORTLINK_HOSTS", "").split(",") if h.strip()]
+)
+SHORTLINK_CACHE_TTL   = float(os.getenv("SHORTLINK_CACHE_TTL", str(30 * 86400)))
+SHORTLINK_MAX_HOPS    = int(os.getenv("SHORTLINK_MAX_HOPS", "8"))
+SHORTLINK_CONCURRENCY = int(os.getenv("SHORTLINK_CONCURRENCY", "8"))
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# HEAD answered with one of these (or an error): ask again with a ranged GET
+HEAD_REFUSED = {0, 400, 403, 404, 405, 501}
+
+STORE = KVStore("shortlinks", max_entries=int(os.getenv("SHORTLINK_CACHE_MAX", "50000")))
+
+def is_short_link(url: str) -> bool:
+    try:
+        return (urlparse(url or "").hostname or "").lower() in SHORTLINK_HOSTS
+    except Exception:
+        return False
+
+def peek(url: str) -> Optional[str]:
+    """The cached expansion of `url`, without touching the network."""
+    hit = STORE.get(url, touch=False, count=False) if url else None
+    return hit["final_url"] if hit else None
+
+def _next(url: str, status: int, location: str) -> Tuple[Optional[str], bool]:
+    """(next url to ask, finished) after one hop; (None, False) when the chain broke."""
+    if status in REDIRECT_STATUSES and location:
+        return urljoin(url, location), False
+    if 200 <= status < 300:
+        return url, True   # a shortener that serves a page itself (meta/JS redirect): keep the link
+    return None, False
+
+def _finish(url: str, cur: str) -> str:
+    STORE.set(url, {"final_url": cur}, SHORTLINK_CACHE_TTL)
+    return cur
+
+# ---------- Sync ----------
+def _hop(url: str, timeout: float) -> Tuple[int, str]:
+    """(status, Location) for `url` without following redirects or reading a body."""
+    status, location = 0, ""
+    try:
+        with host_slot(url):
+            r = http_head(url, headers=UA_HEADERS, timeout=deadline.clamp(timeout), allow_redirects=False)
+            status, location = r.status_code, r.headers.get("Location", "")
+            r.close()
+    except Exception:
+        pass
+    if status not in HEAD_REFUSED: return status, location
+    try:
+        with host_slot(url):
+            r = http_get(url, headers=dict(UA_HEADERS, Range="bytes=0-0"), timeout=deadline.clamp(timeout),
+                         allow_redirects=False, stream=True)
+            status, location = r.status_code, r.headers.get("Location", "")
+            r.close()
+    except Exception:
+        return 0, ""
+    return status, location
+
+def expand(url: str, *, timeout: float = REQUEST_TIMEOUT) -> str:
+    """Where the short link `url` leads (the first URL off a shortener); other URLs come back as they are."""
+    if not is_short_link(url): return url
+    hit = STORE.get(url)
+    if hit: return hit["final_url"]
+    cur = url
+    for _ in range(SHORTLINK_MAX_HOPS):
+        if deadline.expired(): return url
+        nxt, done = _next(cur, *_hop(cur, timeout))
+        if nxt is None: return url
+        if done or not is_short_link(nxt): return _finish(url, nxt)
+        cur = nxt
+    return url
+
+def expand_all(urls: Iterable[str], *, max_workers: int = SHORTLINK_CONCURRENCY) -> Dict[str, str]:
+    """Expand every short link in `urls` concurrently (each at most once); url -> expansion."""
+    links = [u for u in dict.fromkeys(urls) if is_short_link(u)]
+    if not links: return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers or 1), len(links))), thread_name_prefix="shortlinks") as pool:
+        futs = [pool.submit(contextvars.copy_context().run, expand, u) for u in links]
+        return dict(zip(links, [f.result() for f in futs]))
+
+# ---------- Async ----------
+async def _hop_async(client: httpx.AsyncClient, url: str, timeout: float) -> Tuple[int, str]:
+    status, location = 0, ""
+    try:
+        async with async_host_slot(url):
+            r = await client.head(url, headers=UA_HEADERS, timeout=deadline.clamp(timeout), follow_redirects=False)
+            status, location = r.status_code, r.headers.get("Location", "")
+    except Exception:
+        pass
+    if status not in HEAD_REFUSED: return status, location
+    try:
+        async with async_host_slot(url):
+            async with client.stream("GET", url, headers=dict(UA_HEADERS, Range="bytes=0-0"),
+                                     timeout=deadline.clamp(timeout), follow_redirects=False) as r:
+                return r.status_code, r.headers.get("Location", "")
+    except Exception:
+        return 0, ""
+
+async def expand_async(url: str, *, client: Optional[httpx.AsyncClient] = None, timeout: float = REQUEST_TIMEOUT) -> str:
+    """asyncio twin of expand() on the shared client."""
+    if not is_short_link(url): return url
+    hit = STORE.get(url)
+    if hit: return hit["final_url"]
+    client = client or get_async_client()
+    cur = url
+    for _ in range(SHORTLINK_MAX_HOPS):
+        if deadline.expired(): return url
+        nxt, done = _next(cur, *await _hop_async(client, cur, timeout))
+        if nxt is None: return url
+        if done or not is_short_link(nxt): return _finish(url, nxt)
+        cur = nxt
+    return url
+
+async def expand_all_async(urls: Iterable[str], *, concurrency: int = SHORTLINK_CONCURRENCY) -> Dict[str, str]:
+    """asyncio twin of expand_all()."""
+    links = [u for u in dict.fromkeys(urls) if is_short_link(u)]
+    if not links: return {}
+    sem = asyncio.Semaphore(max(1, int(concurrency or 1)))
+    async def one(u):
+        async with sem:
+            return await expand_async(u)
+    return dict(zip(links, await asyncio.gather(*(one(u) for u in links))))
+
+def stats() -> Dict[str, int]:
+    return STORE.stats()
+
+def clear() -> None:
+    STORE.clear()
@@ -0,0 +1,84 @@
+# services/stage_stats.py
+# Which resolver stage (MLS search, Azure, Bing variants) produced the final URL,
+# counted per input shape (has MLS id, land mode, state). process_single_row uses the
+# counts to run the stage most likely to hit first and to skip stages that almost
+# never succeed for that shape.
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from core.kvstore import KVStore
+
+DEFAULT_ORDER = ["mls", "azure", "bing"]
+
+# A stage needs this many tries for its shape before it can be reordered or skipped.
+STAGE_MIN_TRIES  = int(os.getenv("STAGE_MIN_TRIES", "20"))
+STAGE_SKIP_BELOW = float(os.getenv("STAGE_SKIP_BELOW", "0.03"))
+# A skipped stage still runs on every Nth row so its rate can recover.
+STAGE_PROBE_EVERY = int(os.getenv("STAGE_PROBE_EVERY", "25"))
+
+STORE = KVStore("stage_stats", max_entries=1000)
+_TTL = 90 * 86400
+
+_lock = threading.Lock()
+_mem: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+def shape_key(has_mls: bool, land_mode: bool, state: Optional[str]) -> str:
+    return f"mls={int(bool(has_mls))}|land={int(bool(land_mode))}|st={(state or '').strip().upper() or '-'}"
+
+def _counts(shape: str) -> Dict[str, Dict[str, int]]:
+    c = _mem.get(shape)
+    if c is None:
+        c = _mem[shape] = STORE.get(shape, count=False) or {}
+    return c
+
+def win_rate(c: Dict[str, int]) -> float:
+    # Laplace-smoothed so a fresh stage starts at 0.5 instead of 0 or 1
+    return (c.get("wins", 0) + 1) / (c.get("tries", 0) + 2)
+
+def plan(shape: str, stages: List[str]) -> List[str]:
+    """
+    Order `stages` for a row of this shape. Stages without enough history keep their
+    default position; proven ones sort by win rate; proven losers are dropped except
+    on probe rows, where they run first.
+    """
+    with _lock:
+        counts = _counts(shape)
+        keep, probe = [], []
+        for s in stages:
+            c = counts.setdefault(s, {})
+            if c.get("tries", 0) >= STAGE_MIN_TRIES and c.get("wins", 0) / c["tries"] < STAGE_SKIP_BELOW:
+                c["skipped"] = c.get("skipped", 0) + 1
+                if c["skipped"] % max(1, STAGE_PROBE_EVERY) == 0: probe.append(s)
+                continue
+            keep.append(s)
+        def rank(s):
+            c = counts.get(s, {})
+            proven = c.get("tries", 0) >= STAGE_MIN_TRIES
+            return (-win_rate(c) if proven else -0.5, DEFAULT_ORDER.index(s) if s in DEFAULT_ORDER else len(DEFAULT_ORDER))
+        # a probed stage goes first, otherwise the stage that usually wins would end the row before it
+        return probe + sorted(keep, key=rank)
+
+def record(shape: str, tried: List[str], winner: Optional[str]) -> None:
+    """`winner` is the stage that produced the URL, or None when the row fell back to a deeplink."""
+    with _lock:
+        counts = _counts(shape)
+        for s in tried:
+            c = counts.setdefault(s, {})
+            c["tries"] = c.get("tries", 0) + 1
+            if s == winner: c["wins"] = c.get("wins", 0) + 1
+        if winner is None:
+            counts.setdefault("deeplink", {})
+            counts["deeplink"]["wins"] = counts["deeplink"].get("wins", 0) + 1
+        snapshot = {k: dict(v) for k, v in counts.items()}
+    STORE.set(shape, snapshot, _TTL)
+
+def stats() -> Dict[str, Dict[str, Dict[str, int]]]:
+    with _lock:
+        return {k: {s: dict(c) for s, c in v.items()} for k, v in _mem.items()}
+
+def clear() -> None:
+    with _lock:
+        _mem.clear()
+    STORE.clear()
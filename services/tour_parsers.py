@@ -169,8 +169,8 @@ def parse_showingtime_print_html(src: str, *, is_url: bool = True, timeout: int
     We strip tags to plain text and feed into the same line parser.
     """
     if is_url:
-        import requests
-        r = requests.get(src, timeout=timeout)
+        from services.transport import http_get
+        r = http_get(src, timeout=timeout)
         r.raise_for_status()
         html = r.text
     else:
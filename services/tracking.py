@@ -1,8 +1,12 @@
 # services/tracking.py
-import os, re, requests
+import os, re
 from typing import Optional
 
+from services.ratelimit import throttle
+from services.transport import http_post
+
 BITLY_TOKEN = os.getenv("BITLY_TOKEN", "")
+BITLY_SHORTEN = "https://api-ssl.bitly.com/v4/shorten"
 
 def make_trackable_url(url: str, client_tag: str, campaign_tag: str) -> str:
     client_tag = re.sub(r'[^a-z0-9\-]+','', (client_tag or "").lower().replace(" ","-"))
@@ -14,8 +18,9 @@ def bitly_shorten(long_url: str) -> Optional[str]:
     token = BITLY_TOKEN
     if not token: return None
     try:
-        r = requests.post(
-            "https://api-ssl.bitly.com/v4/shorten",
+        throttle(BITLY_SHORTEN)
+        r = http_post(
+            BITLY_SHORTEN,
             headers={"Authorization": f"Bearer {token}", "Content-Type":"application/json"},
             json={"long_url": long_url},
             timeout=10
@@ -0,0 +1,145 @@
+# services/transport.py
+# Shared HTTP clients. Process-wide pooled requests.Sessions, one per upstream (Bing,
+# Azure Search, zillow.com, Bitly, everything else), with retries and keep-alive, plus
+# one pooled httpx.AsyncClient per event loop (HTTP/2 + keep-alive), so resolution,
+# enrichment and thumbnails reuse connections instead of handshaking per call.
+# Both go through services/cassette.py, which can record or replay the traffic.
+
+import os
+import atexit
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+import requests
+from urllib3.util.retry import Retry
+
+from services.ratelimit import upstream_for
+from services.cassette import CassetteAdapter, CassetteTransport
+
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "12"))
+
+ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+ASYNC_MAX_KEEPALIVE   = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY      = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+    HTTP2_ENABLED = os.getenv("HTTP2_DISABLED", "") == ""
+except Exception:
+    HTTP2_ENABLED = False
+
+# ---------- Pooled sync sessions ----------
+# upstream -> max pooled connections (per host behind that upstream)
+POOL_SIZES: Dict[str, int] = {
+    "bing":    int(os.getenv("HTTP_POOL_BING",    "8")),
+    "azure":   int(os.getenv("HTTP_POOL_AZURE",   "8")),
+    "zillow":  int(os.getenv("HTTP_POOL_ZILLOW",  "16")),
+    "bitly":   int(os.getenv("HTTP_POOL_BITLY",   "4")),
+    "default": int(os.getenv("HTTP_POOL_DEFAULT", "16")),
+}
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))
+
+_SESSIONS: Dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+def _new_session(pool_size: int) -> requests.Session:
+    # Retries cover connect errors and throttling/5xx on idempotent methods only
+    retry = Retry(
+        total=HTTP_RETRIES, connect=HTTP_RETRIES, read=0, status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF, status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}), respect_retry_after_header=True, raise_on_status=False,
+    )
+    adapter = CassetteAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=retry)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def get_session(url: str = "") -> requests.Session:
+    """The pooled session for the upstream behind `url` (created on first use)."""
+    name = upstream_for(url) or "default"
+    with _SESSIONS_LOCK:
+        sess = _SESSIONS.get(name)
+        if sess is None:
+            sess = _SESSIONS[name] = _new_session(POOL_SIZES.get(name, POOL_SIZES["default"]))
+        return sess
+
+def http_get(url: str, **kw) -> requests.Response:
+    kw.setdefault("timeout", REQUEST_TIMEOUT)
+    return get_session(url).get(url, **kw)
+
+def http_head(url: str, **kw) -> requests.Response:
+    kw.setdefault("timeout", REQUEST_TIMEOUT)
+    return get_session(url).head(url, **kw)
+
+def http_post(url: str, **kw) -> requests.Response:
+    kw.setdefault("timeout", REQUEST_TIMEOUT)
+    return get_session(url).post(url, **kw)
+
+def close_sessions() -> None:
+    """Close every pooled session (the next request opens a new one)."""
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for sess in sessions:
+        sess.close()
+
+# On shutdown of the app or the CLI; not on a cache clear, which may race a background job's requests.
+atexit.register(close_sessions)
+
+# ---------- Async client ----------
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _new_async_client() -> httpx.AsyncClient:
+    inner = httpx.AsyncHTTPTransport(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=ASYNC_MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.AsyncClient(
+        transport=CassetteTransport(inner),
+        follow_redirects=True,
+        timeout=REQUEST_TIMEOUT,
+    )
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the pooled client bound to the running event loop (created on first use)."""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = _new_async_client()
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+async def close_async_client() -> None:
+    client = _ASYNC_CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+@asynccontextmanager
+async def async_client_scope(client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yield the loop's shared client. The outermost scope on a loop owns the client
+    and closes it on exit; nested scopes (or an explicit `client`) just reuse it.
+    """
+    if client is not None:
+        yield client
+        return
+    loop = asyncio.get_running_loop()
+    existing = _ASYNC_CLIENTS.get(loop)
+    if existing is not None and not existing.is_closed:
+        yield existing
+        return
+    client = get_async_client()
+    try:
+        yield client
+    finally:
+        await close_async_client()
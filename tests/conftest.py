@@ -0,0 +1,27 @@
+# tests/conftest.py
+# Every cache namespace and journal lives in a throwaway directory: set before any
+# service module is imported, since core/kvstore.py and services/journal.py read it then.
+
+import os
+import sys
+import types
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+_CACHE_DIR = tempfile.mkdtemp(prefix="aa-tests-")
+os.environ["AA_CACHE_DIR"] = _CACHE_DIR
+os.environ["JOURNAL_DIR"] = os.path.join(_CACHE_DIR, "journals")
+
+import pytest
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock seen by the KV store, moved by hand: `clock.advance(seconds)`."""
+    from core import kvstore
+    state = {"now": 1_700_000_000.0}
+    def advance(seconds: float) -> None:
+        state["now"] += seconds
+    monkeypatch.setattr(kvstore, "time", types.SimpleNamespace(time=lambda: state["now"]))
+    return types.SimpleNamespace(advance=advance)
@@ -0,0 +1,117 @@
+# tests/legacy_extractors.py
+# The regex extractors as they were before services/html_scan.py replaced them,
+# copied unchanged: the reference the single-scan versions are checked against.
+
+import re
+from typing import Any, Dict, Optional
+
+from services.enrich import summarize_remarks, extract_highlights
+
+def extract_any_mls_id(html: str) -> Optional[str]:
+    if not html: return None
+    for pat in [r'"mlsId"\s*:\s*"([A-Za-z0-9\-]{5,})"',
+                r'"mls"\s*:\s*"([A-Za-z0-9\-]{5,})"',
+                r'"listingId"\s*:\s*"([A-Za-z0-9\-]{5,})"']:
+        m = re.search(pat, html, re.I)
+        if m: return m.group(1)
+    m = re.search(r'\bMLS[^A-Za-z0-9]{0,5}#?\s*([A-Za-z0-9\-]{5,})\b', html, re.I)
+    return m.group(1) if m else None
+
+def extract_address_from_html(html: str) -> Dict[str, str]:
+    out = {"street": "", "city": "", "state": "", "zip": ""}
+    if not html: return out
+    m = re.search(r'"streetAddress"\s*:\s*"([^"]+)"', html, re.I); out["street"] = m.group(1) if m else ""
+    m = re.search(r'"addressLocality"\s*:\s*"([^"]+)"', html, re.I); out["city"] = m.group(1) if m else ""
+    m = re.search(r'"addressRegion"\s*:\s*"([A-Za-z]{2})"', html, re.I); out["state"] = m.group(1) if m else ""
+    m = re.search(r'"postalCode"\s*:\s*"(\d{5}(?:-\d{4})?)"', html, re.I); out["zip"] = m.group(1) if m else ""
+    if not out["street"]:
+        for pat in [
+            r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
+            r"<title>\s*([^<]+?)\s*</title>",
+        ]:
+            m = re.search(pat, html, re.I)
+            if m:
+                title = m.group(1)
+                if re.search(r"\b[A-Za-z]{2}\b", title) and re.search(r"\d{5}", title):
+                    out["street"] = title
+                    break
+    return out
+
+def extract_title_or_desc(html: str) -> str:
+    for pat in [
+        r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
+        r"<title>\s*([^<]+)</title>",
+        r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]",
+    ]:
+        m = re.search(pat, html, re.I)
+        if m: return re.sub(r'\s+', ' ', m.group(1)).strip()
+    return ""
+
+MLS_HTML_PATTERNS = [
+    lambda mid: rf'\bMLS[^A-Za-z0-9]{{0,5}}#?\s*{re.escape(mid)}\b',
+    lambda mid: rf'\bMLS\s*#?\s*{re.escape(mid)}\b',
+    lambda mid: rf'"mls"\s*:\s*"{re.escape(mid)}"',
+    lambda mid: rf'"mlsId"\s*:\s*"{re.escape(mid)}"',
+    lambda mid: rf'"mlsId"\s*:\s*{re.escape(mid)}',
+]
+def page_contains_mls(html:str, mls_id:str) -> bool:
+    for mk in MLS_HTML_PATTERNS:
+        if re.search(mk(mls_id), html, re.I): return True
+    return False
+
+def page_contains_city_state(html:str, city:str=None, state:str=None) -> bool:
+    ok = False
+    if city and re.search(re.escape(city), html, re.I): ok = True
+    if state and re.search(rf'\b{re.escape(state)}\b', html, re.I): ok = True
+    return ok
+
+RE_PRICE  = re.compile(r'"(?:price|unformattedPrice|priceZestimate)"\s*:\s*"?\$?([\d,]+)"?', re.I)
+RE_STATUS = re.compile(r'"(?:homeStatus|statusText)"\s*:\s*"([^"]+)"', re.I)
+RE_BEDS   = re.compile(r'"(?:bedrooms|beds)"\s*:\s*(\d+)', re.I)
+RE_BATHS  = re.compile(r'"(?:bathrooms|baths)"\s*:\s*([0-9.]+)', re.I)
+RE_SQFT   = re.compile(r'"(?:livingArea|livingAreaValue|area)"\s*:\s*([0-9,]+)', re.I)
+RE_DESC   = re.compile(r'"(?:description|homeDescription|marketingDescription)"\s*:\s*"([^"]+)"', re.I)
+
+def extract_zillow_first_image(html: str) -> Optional[str]:
+    if not html: return None
+    for target_w in ("960","1152","768","1536"):
+        m = re.search(
+            rf"<img[^>]+src=['\"](https://photos\.zillowstatic\.com/fp/[^'\" ]+-cc_ft_{target_w}\.(?:jpg|webp))['\"]",
+            html, re.I
+        )
+        if m: return m.group(1)
+    m = re.search(r"srcset=['\"]([^'\"]*photos\.zillowstatic\.com[^'\"]+)['\"]", html, re.I)
+    if m:
+        cand=[]
+        for part in m.group(1).split(","):
+            part=part.strip(); m2=re.match(r"(https://photos\.zillowstatic\.com/\S+)\s+(\d+)w", part, re.I)
+            if m2: cand.append((int(m2.group(2)), m2.group(1)))
+        if cand:
+            up=[u for (w,u) in cand if w<=1152]
+            return (sorted(((w,u) for (w,u) in cand if w<=1152), key=lambda x:x[0])[-1][1] if up
+                    else sorted(cand, key=lambda x:x[0])[-1][1])
+    m = re.search(r"(https://photos\.zillowstatic\.com/fp/\S+-cc_ft_\d+\.(jpg|webp))", html, re.I)
+    return m.group(1) if m else None
+
+def parse_listing_meta(html: str, image_url: Optional[str] = None) -> Dict[str, Any]:
+    """`image_url` short-circuits the hero-image scan when the caller already has it."""
+    meta = {}
+    if not html: return meta
+    m = RE_PRICE.search(html);   meta["price"]  = m.group(1) if m else None
+    m = RE_STATUS.search(html);  meta["status"] = m.group(1) if m else None
+    m = RE_BEDS.search(html);    meta["beds"]   = m.group(1) if m else None
+    m = RE_BATHS.search(html);   meta["baths"]  = m.group(1) if m else None
+    m = RE_SQFT.search(html);    meta["sqft"]   = m.group(1) if m else None
+    m = RE_DESC.search(html);    remark = m.group(1) if m else None
+    if not remark:
+        m2 = re.search(r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]", html, re.I)
+        if m2: remark = m2.group(1)
+    meta["remarks"] = remark
+    img = image_url or extract_zillow_first_image(html)
+    if not img:
+        m3 = re.search(r"<meta[^>]+property=['\"]og:image['\"][^>]+content=['\"]([^'\"]+)['\"]", html, re.I)
+        if m3: img = m3.group(1)
+    meta["image_url"] = img
+    meta["summary"] = summarize_remarks(remark or "")
+    meta["highlights"] = extract_highlights(remark or "")
+    return meta
@@ -0,0 +1,70 @@
+# tests/test_batch.py
+import time
+import threading
+
+import pytest
+
+from services import batch
+from services.batch import BatchStopped
+
+def test_resolve_rows_returns_results_in_input_order():
+    rows = [{"n": n} for n in range(6)]
+    progress = []
+    out = batch.resolve_rows(rows, lambda r: {"n": r["n"] * 2}, max_workers=3,
+                             on_progress=lambda done, total: progress.append((done, total)))
+    assert [r["n"] for r in out] == [0, 2, 4, 6, 8, 10]
+    assert progress[-1] == (6, 6)
+
+def test_stopping_keeps_the_rows_in_flight_and_starts_no_more():
+    rows = [{"n": n} for n in range(6)]
+    started, landed = [], []
+    release = threading.Event()
+    stop = threading.Event()
+    def resolve_one(row):
+        started.append(row["n"])
+        if row["n"]: release.wait(5)
+        return {"n": row["n"]}
+    def on_result(i, res):
+        landed.append(i)
+        if i == 0:
+            stop.set()        # cancelled while rows 1 and 2 are still running
+            release.set()
+    with pytest.raises(BatchStopped) as e:
+        batch.resolve_rows(rows, resolve_one, max_workers=3, on_result=on_result, should_stop=stop.is_set)
+    assert sorted(started) == [0, 1, 2]
+    assert sorted(landed) == [0, 1, 2]
+    assert (e.value.done, e.value.total) == (3, 6)
+
+HIT, WEAK = "mls_match", "city_state_match"
+
+@pytest.mark.parametrize("results, rank, expected", [
+    ({}, 0, (None, 0)),
+    ({0: (None, None), 1: ("b", WEAK)}, 0, (("b", WEAK), 1)),         # rank 0 missed: the next hit wins
+    ({1: ("b", WEAK)}, 0, (None, 0)),                                  # a weak hit waits for every higher rank
+    ({0: (None, None), 2: ("c", WEAK)}, 0, (None, 1)),
+    ({2: ("c", HIT)}, 0, (("c", HIT), 0)),                             # a strong hit wins out of order
+    ({1: ("b", HIT), 3: ("d", HIT)}, 0, (("b", HIT), 0)),              # the best-ranked strong hit
+    ({0: ("a", WEAK), 1: ("b", HIT)}, 0, (("b", HIT), 0)),             # strong beats a better-ranked weak hit
+    ({0: (None, None), 1: (None, None)}, 0, (None, 2)),
+])
+def test_pick_ranks_the_results_so_far(results, rank, expected):
+    assert batch._pick(results, rank, HIT) == expected
+
+def test_first_ranked_match_stops_the_checks_still_running():
+    running, stopped_early = threading.Event(), []
+    def check(item):
+        if item == "slow":
+            running.set()
+            for _ in range(500):
+                if batch.stopped():
+                    stopped_early.append(item); break
+                time.sleep(0.01)
+            return None, None
+        running.wait(5)
+        return item, HIT
+    assert batch.first_ranked_match(["slow", "hit"], check, fan_out=2) == ("hit", HIT)
+    for _ in range(200):
+        if stopped_early: break
+        time.sleep(0.01)
+    assert stopped_early == ["slow"]
+    assert not batch.stopped()
@@ -0,0 +1,94 @@
+# tests/test_deadline.py
+import types
+import asyncio
+
+import pytest
+
+from services import deadline
+from services.deadline import Deadline, BudgetExhausted
+
+@pytest.fixture
+def mono(monkeypatch):
+    """Monotonic clock seen by services.deadline, moved by hand: `mono.advance(seconds)`."""
+    state = {"now": 1000.0}
+    monkeypatch.setattr(deadline, "time", types.SimpleNamespace(monotonic=lambda: state["now"]))
+    return types.SimpleNamespace(advance=lambda s: state.__setitem__("now", state["now"] + s))
+
+def test_no_budget_never_expires(mono):
+    for d in (Deadline(), Deadline(0), Deadline(-5)):
+        mono.advance(10 ** 6)
+        assert d.remaining() == float("inf")
+        assert not d.expired()
+        d.check()
+
+def test_expires_after_its_seconds(mono):
+    d = Deadline(5)
+    mono.advance(4)
+    assert d.remaining() == pytest.approx(1)
+    d.check()
+    mono.advance(1)
+    assert d.expired()
+    with pytest.raises(BudgetExhausted):
+        d.check()
+
+def test_nested_deadline_ends_with_whichever_comes_first(mono):
+    run = Deadline(10)
+    row = Deadline(30, parent=run)
+    assert row.remaining() == pytest.approx(10)
+    mono.advance(10)
+    assert row.expired()
+    short = Deadline(2, parent=Deadline(10))
+    mono.advance(2)
+    assert short.expired()
+    assert not Deadline(None, parent=Deadline(5)).expired()
+
+def test_offer_keeps_the_first_candidate():
+    d = Deadline(5)
+    d.offer("")
+    d.offer("https://www.zillow.com/homedetails/1_zpid/")
+    d.offer("https://www.zillow.com/homedetails/2_zpid/")
+    assert d.best == "https://www.zillow.com/homedetails/1_zpid/"
+
+def test_module_helpers_follow_the_active_scope(mono):
+    assert deadline.current() is None
+    deadline.check()
+    assert not deadline.expired()
+    assert deadline.clamp(12) == 12
+    deadline.offer("ignored")   # no active deadline: nothing to offer to
+    d = Deadline(3)
+    with deadline.scope(d):
+        assert deadline.current() is d
+        assert deadline.clamp(12) == pytest.approx(3)
+        deadline.offer("https://www.zillow.com/homedetails/1_zpid/")
+        mono.advance(5)
+        assert deadline.expired()
+        assert deadline.clamp(12) == 0.05
+        with pytest.raises(BudgetExhausted):
+            deadline.check()
+    assert deadline.current() is None
+    assert d.best.endswith("/1_zpid/")
+
+def test_row_deadline_nests_in_the_active_run(mono):
+    run = Deadline(4)
+    with deadline.scope(run):
+        row = deadline.row_deadline(30)
+        assert row.parent is run
+        assert row.remaining() == pytest.approx(4)
+        assert deadline.row_deadline(None).expires_at == pytest.approx(1000.0 + deadline.ROW_DEADLINE)
+    given = Deadline(1)
+    assert deadline.row_deadline(given) is given
+    assert deadline.row_deadline(5).parent is None
+
+def test_rate_limit_waits_never_outlast_the_deadline(monkeypatch):
+    from services import ratelimit
+    bucket = ratelimit.TokenBucket(rate=0.1, burst=1)   # one token, then 10 s per token
+    monkeypatch.setattr(ratelimit, "buckets", lambda: {"bing": bucket})
+    url = "https://api.bing.microsoft.com/v7.0/search"
+    ratelimit.throttle(url)
+    with deadline.scope(Deadline(2)):
+        with pytest.raises(BudgetExhausted):
+            ratelimit.throttle(url)
+        with pytest.raises(BudgetExhausted):
+            asyncio.run(ratelimit.throttle_async(url))
+    assert bucket.tokens == pytest.approx(0, abs=0.01)   # the refused waits did not take a token
+    assert bucket.waited == 0
@@ -0,0 +1,93 @@
+# tests/test_html_scan.py
+# ListingScan must report what the regex extractors it replaced did (tests/legacy_extractors.py),
+# on the sample pages in tests/pages/ and whatever the chunk size. Pages with an embedded
+# Zillow listing record are the one intended difference: the record wins over the first match.
+
+import os
+import json
+
+import pytest
+
+from bench.stub_server import listing_page, mls_for, STREET, CITY, STATE, ZIP
+from services import html_scan, enrich
+from services.html_scan import ListingScan
+from tests import legacy_extractors as legacy
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+PAGES = sorted(n for n in os.listdir(PAGES_DIR) if n.endswith(".html"))
+
+def _page(name: str) -> str:
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+def _probes(html: str):
+    """MLS ids and city/state pairs worth asking the page about."""
+    ids = [i for i in (legacy.extract_any_mls_id(html), "10116790", "TM-2291457", "FO-48812", "2590113") if i] + ["ZZ9999999"]
+    places = [("Smithfield", "NC"), ("Garner", None), (None, "SC"), ("Four Oaks", None), (None, None)]
+    return list(dict.fromkeys(ids)), places
+
+@pytest.fixture(params=[html_scan.SCAN_CHUNK, 97, 16], ids=lambda n: f"chunk{n}")
+def chunk(request, monkeypatch):
+    monkeypatch.setattr(html_scan, "SCAN_CHUNK", request.param)
+    html_scan.clear_memo()
+    yield request.param
+    html_scan.clear_memo()
+
+@pytest.mark.parametrize("name", PAGES)
+def test_scan_matches_the_legacy_extractors(name, chunk):
+    html = _page(name)
+    s = ListingScan(html)
+    assert s.mls_id() == legacy.extract_any_mls_id(html)
+    assert s.address() == legacy.extract_address_from_html(html)
+    assert s.title_or_desc() == legacy.extract_title_or_desc(html)
+    assert s.hero_image() == legacy.extract_zillow_first_image(html)
+    ids, places = _probes(html)
+    for mid in ids:
+        assert s.contains_mls(mid) == legacy.page_contains_mls(html, mid), mid
+    for city, state in places:
+        assert s.contains_city_state(city, state) == legacy.page_contains_city_state(html, city, state), (city, state)
+
+@pytest.mark.parametrize("name", PAGES)
+def test_listing_meta_matches_the_legacy_parser(name):
+    html = _page(name)
+    html_scan.clear_memo()
+    assert enrich.parse_listing_meta(html) == legacy.parse_listing_meta(html)
+
+def test_the_sample_pages_exercise_each_extractor():
+    # guards the equivalence tests against comparing None with None everywhere
+    found = {name: legacy.parse_listing_meta(_page(name)) for name in PAGES}
+    assert legacy.extract_any_mls_id(_page("idx_homespotter.html")) == "10116790"
+    assert legacy.extract_address_from_html(_page("zillow_srcset.html"))["street"] == "88 Pine Needle Ln, Clayton, NC 27520"
+    assert found["zillow_inline_json.html"]["image_url"].endswith("-cc_ft_960.jpg")
+    assert found["zillow_srcset.html"]["image_url"].endswith("-cc_ft_1152.webp")
+    assert found["agent_site_plain.html"]["status"] == "Coming soon"
+    assert found["no_listing.html"]["price"] is None
+
+def test_offsets_survive_text_whose_lowercase_is_longer():
+    # "İ".lower() is two characters; anchors found in the lowered text must still line up
+    html = "İ" * 50 + '<div>"mlsId": "AB12345"</div>' + "İ" * 50 + " MLS # CD67890"
+    s = ListingScan(html)
+    assert s.mls_id() == legacy.extract_any_mls_id(html) == "AB12345"
+    assert s.contains_mls("CD67890") and legacy.page_contains_mls(html, "CD67890")
+
+def test_embedded_listing_record_wins_over_the_first_match():
+    html = listing_page(7, 64)
+    s = ListingScan(html)
+    fields = s.listing_fields()
+    # the regexes take the nearby-homes card that comes first on the page (trailing comma and all)
+    assert legacy.parse_listing_meta(html)["price"] == "199001,"
+    assert fields["price"] == str(250000 + 7 * 100)
+    assert fields["status"] == "FOR_SALE"
+    assert s.mls_id() == mls_for(7)
+    assert s.address() == {"street": f"7 {STREET} St", "city": CITY, "state": STATE, "zip": ZIP}
+
+def test_watch_only_scans_new_text():
+    until = html_scan.watch("X12345")
+    head = "<html>" + "a" * 100
+    assert not until(head, 0)
+    assert until(head + " MLS# X12345", len(head))
+
+def test_empty_pages():
+    assert ListingScan("").mls_id() is None
+    assert ListingScan("").address() == html_scan.empty_address()
+    assert json.dumps(enrich.parse_listing_meta("")) == "{}"
@@ -0,0 +1,152 @@
+# tests/test_journal.py
+import os
+import json
+
+import pytest
+
+from services import journal as jr
+from services.journal import Journal
+
+ROWS = [{"address": f"{n} Main St, Raleigh, NC"} for n in range(1, 4)]
+
+def _result(n, status="city_state_match"):
+    return {"zillow_url": f"https://www.zillow.com/homedetails/{n}_zpid/", "status": status}
+
+@pytest.fixture(autouse=True)
+def _fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(jr, "JOURNAL_DIR", str(tmp_path))
+    yield
+    assert not jr._held, "a test left a journal claimed"
+
+def test_a_new_run_of_the_same_input_resumes():
+    j = Journal(ROWS, {"land_mode": True})
+    j.record(0, _result(1))
+    j.record(2, _result(3))
+    j.close()
+    again = Journal(ROWS, {"land_mode": True})
+    assert again.key == j.key
+    assert again.resumed == 2
+    assert again.pending() == [1]
+    assert again.done[2] == _result(3)
+    again.complete()
+    assert not os.path.exists(again.path)
+
+def test_runtime_settings_do_not_change_the_key_but_shaping_ones_do():
+    a = Journal(ROWS, {"land_mode": True, "max_workers": 4, "row_budget": 30, "full_pages": False}); a.close()
+    b = Journal(ROWS, {"land_mode": True, "max_workers": 16, "full_pages": True}); b.close()
+    c = Journal(ROWS, {"land_mode": False}); c.close()
+    assert a.key == b.key != c.key
+
+def test_an_edited_input_starts_fresh():
+    j = Journal(ROWS, {})
+    j.record(0, _result(1)); j.record(1, _result(2))
+    j.close()
+    edited = [ROWS[0], {"address": "99 Other Rd"}, ROWS[2]]
+    again = Journal(edited, {})
+    assert again.key != j.key
+    assert again.resumed == 0
+    again.close()
+
+def test_rows_out_of_time_are_not_kept():
+    j = Journal(ROWS, {})
+    j.record(0, _result(1, status=jr.BUDGET_EXHAUSTED))
+    j.record(1, _result(2))
+    j.close()
+    again = Journal(ROWS, {})
+    assert again.pending() == [0, 2]
+    again.close()
+
+def test_a_torn_last_line_is_ignored():
+    j = Journal(ROWS, {})
+    j.record(0, _result(1))
+    j.close()
+    with open(j.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"i": 1, "h": j.hashes[1], "r": _result(2)})[:20])
+    again = Journal(ROWS, {})
+    assert sorted(again.done) == [0]
+    again.close()
+
+def test_resume_false_starts_over():
+    j = Journal(ROWS, {}); j.record(0, _result(1)); j.close()
+    again = Journal(ROWS, {}, resume=False)
+    assert again.resumed == 0
+    again.close()
+    third = Journal(ROWS, {})
+    assert third.resumed == 0
+    third.close()
+
+def test_stale_journals_are_not_resumed():
+    j = Journal(ROWS, {}); j.record(0, _result(1)); j.close()
+    old = os.path.getmtime(j.path) - jr.JOURNAL_TTL - 10
+    os.utime(j.path, (old, old))
+    again = Journal(ROWS, {})
+    assert again.resumed == 0
+    again.close()
+
+def test_concurrent_runs_of_one_input_keep_separate_journals():
+    first = Journal(ROWS, {})
+    first.record(0, _result(1))
+    second = Journal(ROWS, {})
+    assert second.key.startswith(first.key + "-")
+    assert second.resumed == 0
+    second.record(1, _result(2))
+    second.complete()
+    first.close()
+    again = Journal(ROWS, {})
+    assert sorted(again.done) == [0]
+    again.close()
+
+def test_held_completes_on_success_and_keeps_the_journal_on_failure():
+    j = Journal(ROWS, {})
+    with pytest.raises(KeyError):
+        with jr.held(j):
+            j.record(0, _result(1))
+            raise KeyError("cancelled")
+    assert os.path.exists(j.path)
+    again = Journal(ROWS, {})
+    with jr.held(again):
+        assert again.resumed == 1
+    assert not os.path.exists(again.path)
+
+def test_clear_spares_journals_in_use():
+    idle = Journal(ROWS[:1], {}); idle.record(0, _result(1)); idle.close()
+    live = Journal(ROWS, {}); live.record(0, _result(1))
+    jr.clear()
+    assert not os.path.exists(idle.path)
+    assert os.path.exists(live.path)
+    live.close()
+
+def test_replay_and_split():
+    j = Journal(ROWS, {}); j.record(1, _result(2))
+    seen, progress = [], []
+    done = jr.replay(j, on_result=lambda i, r: seen.append(i), on_progress=lambda n, t: progress.append((n, t)), total=3)
+    assert done == {1: _result(2)} and seen == [1] and progress == [(1, 3)]
+    assert jr.split(j, ROWS) == ([0, 2], [ROWS[0], ROWS[2]])
+    assert jr.split(None, ROWS) == ([0, 1, 2], ROWS)
+    j.close()
+
+def test_resolve_batch_resumes_from_the_journal(monkeypatch):
+    from services import resolver
+    rows = [{"source_url": f"https://www.zillow.com/homedetails/{n}_zpid/"} for n in range(1, 5)]
+    resolved = []
+    def resolve_row(row, defaults, **kw):
+        resolved.append(row["source_url"])
+        return {"zillow_url": row["source_url"], "status": ""}
+    monkeypatch.setattr(resolver, "resolve_row", resolve_row)
+    class Stop(Exception):
+        pass
+    def stop_after_two(i, res):
+        if len(landed) == 2: raise Stop()
+        landed.append(i)
+    landed = []
+    with pytest.raises(Stop):
+        resolver.resolve_batch(rows, max_workers=1, journal=Journal(rows, {}), on_result=stop_after_two)
+    resumed = Journal(rows, {})
+    assert resumed.resumed >= 2
+    resolved.clear()
+    replayed = []
+    out = resolver.resolve_batch(rows, max_workers=1, journal=resumed, on_result=lambda i, r: replayed.append(i))
+    assert [r["zillow_url"] for r in out] == [r["source_url"] for r in rows]
+    assert sorted(replayed) == [0, 1, 2, 3]
+    assert len(resolved) == 4 - resumed.resumed
+    assert not os.path.exists(resumed.path)
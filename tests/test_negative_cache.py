@@ -0,0 +1,54 @@
+# tests/test_negative_cache.py
+import pytest
+
+from services import negative_cache as nc
+
+ALL = ["mls", "azure", "bing"]
+
+@pytest.fixture(autouse=True)
+def _empty():
+    nc.clear()
+    yield
+    nc.clear()
+
+def test_key_combines_address_and_state_scoped_mls_id():
+    assert nc._key("1 Main St, Raleigh", "x12345", "nc") == "1 main st raleigh|NC:X12345"
+    assert nc._key("1 Main St, Raleigh", "x12345") == "1 main st raleigh|"
+    assert nc._key("", "x12345") is None
+    assert nc._key("", "") is None
+
+def test_a_row_that_ran_every_stage_is_a_miss():
+    nc.record("1 Main St", "X12345", ALL, ["bing", "mls", "azure"], state="NC")
+    hit = nc.lookup("1 Main St", "X12345", ALL, state="NC")
+    assert hit["tried"] == ["azure", "bing", "mls"]
+
+def test_a_row_whose_stages_were_skipped_is_not_recorded():
+    nc.record("1 Main St", "X12345", ALL, ["mls", "bing"], state="NC")
+    assert nc.lookup("1 Main St", "X12345", ["mls", "bing"], state="NC") is None
+    assert nc.stats()["entries"] == 0
+
+def test_a_stage_that_is_available_now_reopens_the_row():
+    nc.record("1 Main St", "", ["bing"], ["bing"])
+    assert nc.lookup("1 Main St", "", ["bing"])
+    assert nc.lookup("1 Main St", "", ["azure", "bing"]) is None
+
+def test_misses_are_scoped_to_the_state():
+    nc.record("", "X12345", ["mls"], ["mls"], state="NC")
+    assert nc.lookup("", "X12345", ["mls"], state="NC")
+    assert nc.lookup("", "X12345", ["mls"], state="SC") is None
+
+def test_lookup_without_count_leaves_the_counters_alone():
+    nc.record("1 Main St", "", ["bing"], ["bing"])
+    nc.lookup("1 Main St", "", ["bing"], count=False)
+    nc.lookup("2 Main St", "", ["bing"], count=False)
+    assert (nc.stats()["hits"], nc.stats()["misses"]) == (0, 0)
+    nc.lookup("1 Main St", "", ["bing"])
+    nc.lookup("2 Main St", "", ["bing"])
+    assert (nc.stats()["hits"], nc.stats()["misses"]) == (1, 1)
+
+def test_misses_expire(clock):
+    nc.record("1 Main St", "", ["bing"], ["bing"])
+    clock.advance(nc.NEGATIVE_CACHE_TTL - 1)
+    assert nc.lookup("1 Main St", "", ["bing"])
+    clock.advance(2)
+    assert nc.lookup("1 Main St", "", ["bing"]) is None
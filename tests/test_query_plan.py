@@ -0,0 +1,42 @@
+# tests/test_query_plan.py
+from services import query_plan as qp
+
+HD = "site:zillow.com/homedetails"
+
+def test_mls_queries_come_first_then_exact_then_loose_then_land_and_lot():
+    qs = qp.address_queries(["Lot 5 Oak Rd, Cary, NC", "123 Main St, Raleigh, NC"], mls_id="X123")
+    assert qs == [
+        f'"MLS# X123" {HD}', f'X123 {HD}', f'"X123" "MLS" {HD}',
+        f'"123 Main St, Raleigh, NC" {HD}', f'123 Main St, Raleigh, NC {HD}',
+        f'"Lot 5 Oak Rd, Cary, NC" {HD}', f'Lot 5 Oak Rd, Cary, NC {HD}',
+        f'123 Main St, Raleigh, NC land {HD}', f'123 Main St, Raleigh, NC lot {HD}',
+        f'Lot 5 Oak Rd, Cary, NC land {HD}', f'Lot 5 Oak Rd, Cary, NC lot {HD}',
+    ]
+
+def test_no_mls_templates_without_an_mls_id():
+    qs = qp.address_queries(["123 Main St"])
+    assert qs[0] == f'"123 Main St" {HD}'
+    assert not any("MLS" in q for q in qs)
+
+def test_near_duplicate_variants_collapse_to_the_first():
+    qs = qp.address_queries(["123 Main St, Raleigh, NC", "123 main st raleigh nc", "Raleigh NC 123 Main St"])
+    assert qs == [
+        f'"123 Main St, Raleigh, NC" {HD}', f'123 Main St, Raleigh, NC {HD}',
+        f'"Raleigh NC 123 Main St" {HD}',   # a phrase keeps its word order
+        f'123 Main St, Raleigh, NC land {HD}', f'123 Main St, Raleigh, NC lot {HD}',
+    ]
+
+def test_semantic_key_compares_loose_terms_as_a_bag_of_words():
+    assert qp._semantic_key(f"Main St 123 {HD}") == qp._semantic_key(f"123  main, st {HD}")
+    assert qp._semantic_key('"Main St" 123') != qp._semantic_key('"St Main" 123')
+    assert qp._semantic_key('"Main St" 123') != qp._semantic_key("Main St 123")
+    assert qp._semantic_key("123 Main St site:zillow.com") != qp._semantic_key(f"123 Main St {HD}")
+
+def test_dedupe_queries_drops_blanks_and_normalizes_whitespace():
+    assert qp.dedupe_queries(["", "  a   b ", "B A", None]) == ["a b"]
+
+def test_mls_queries_put_the_named_ones_first():
+    qs = qp.mls_queries("X1", "Triangle MLS")
+    assert qs[:3] == [f'{q} "Triangle MLS"' for q in qp.mls_queries("X1")]
+    assert len(qs) == 6
+    assert qp.mls_queries("") == []
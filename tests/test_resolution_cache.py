@@ -0,0 +1,72 @@
+# tests/test_resolution_cache.py
+import pytest
+
+from services import resolution_cache as rc
+
+DAY = rc.DAY
+
+@pytest.fixture(autouse=True)
+def _empty():
+    rc.clear()
+    yield
+    rc.clear()
+
+def test_normalize_address_ignores_case_punctuation_and_spacing():
+    assert rc.normalize_address(" 407 E. Woodall St,  Smithfield, NC ") == "407 e woodall st smithfield nc"
+    assert rc.normalize_address("") == ""
+
+def test_mls_key_needs_both_state_and_id():
+    assert rc.mls_key(" tm-10116790 ", "nc") == "NC:TM-10116790"
+    assert rc.mls_key("10116790", "") == ""
+    assert rc.mls_key("", "NC") == ""
+
+def test_keys_scope_the_mls_id_to_the_state():
+    assert rc._keys("1 Main St, Raleigh, NC", "abc123", state="nc") == ["mls:NC:ABC123", "addr:1 main st raleigh nc"]
+    assert rc._keys(source_url=" https://l.hms.pt/x ") == ["url:https://l.hms.pt/x"]
+
+def test_without_a_state_the_row_is_keyed_by_address_only():
+    assert rc._keys("1 Main St, Raleigh, NC", "abc123") == ["addr:1 main st raleigh nc"]
+    assert rc._keys("", "abc123") == []
+
+def test_same_mls_id_on_another_board_is_not_a_hit():
+    rc.store("https://www.zillow.com/homedetails/1_zpid/", "mls_match", query_address="1 Main St", mls_id="10116790", state="NC")
+    assert rc.lookup("2 Other Rd", "10116790", state="NC")["zillow_url"].endswith("/1_zpid/")
+    assert rc.lookup("2 Other Rd", "10116790", state="SC") is None
+    assert rc.lookup("2 Other Rd", "10116790") is None
+
+def test_lookup_counts_one_hit_or_miss_per_row():
+    rc.store("https://www.zillow.com/homedetails/1_zpid/", "azure_hit", query_address="1 Main St", mls_id="X12345", state="NC")
+    rc.lookup("1 Main St", "X12345", state="NC")
+    rc.lookup("9 Nowhere Ln", "Y99999", state="NC")
+    s = rc.stats()
+    assert (s["hits"], s["misses"]) == (1, 1)
+
+def test_peek_does_not_count():
+    rc.store("https://www.zillow.com/homedetails/1_zpid/", "azure_hit", query_address="1 Main St")
+    assert rc.peek("1 Main St")
+    assert rc.peek("2 Main St") is None
+    assert (rc.stats()["hits"], rc.stats()["misses"]) == (0, 0)
+
+def test_store_ignores_empty_urls():
+    rc.store("", "mls_match", query_address="1 Main St")
+    assert rc.stats()["entries"] == 0
+
+@pytest.mark.parametrize("status, ttl", [
+    ("mls_match", 30 * DAY),
+    ("azure_hit", 14 * DAY),
+    ("city_state_match", 7 * DAY),
+    ("deeplink_fallback", 6 * 3600),
+    ("", 3 * DAY),
+    ("something_new", rc.DEFAULT_TTL),
+])
+def test_entries_live_as_long_as_their_status_allows(clock, status, ttl):
+    rc.store("https://www.zillow.com/homedetails/1_zpid/", status, query_address="1 Main St")
+    clock.advance(ttl - 1)
+    assert rc.lookup("1 Main St")["status"] == status
+    clock.advance(2)
+    assert rc.lookup("1 Main St") is None
+
+def test_source_url_results_keep_the_address_they_used():
+    rc.store("https://www.zillow.com/homedetails/1_zpid/", "", source_url="https://idx.example.com/l/1", input_address="1 Main St")
+    hit = rc.lookup(source_url="https://idx.example.com/l/1")
+    assert hit["input_address"] == "1 Main St"
@@ -0,0 +1,102 @@
+# tests/test_search_cache.py
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from services import deadline, search_cache as sc
+from services.deadline import Deadline, BudgetExhausted
+
+ITEMS = [{"url": "https://www.zillow.com/homedetails/1_zpid/", "name": "1 Main St"}]
+
+@pytest.fixture(autouse=True)
+def _empty():
+    sc.clear()
+    yield
+    sc.clear()
+
+def test_concurrent_async_callers_share_one_fetch():
+    calls = []
+    async def fetch(q):
+        calls.append(q)
+        await asyncio.sleep(0.01)
+        return ITEMS
+    async def main():
+        return await asyncio.gather(*(sc.cached_search_async("1 Main St", fetch) for _ in range(3)))
+    assert asyncio.run(main()) == [ITEMS] * 3
+    assert calls == ["1 Main St"]
+
+def test_a_cancelled_owner_does_not_cancel_its_waiters():
+    calls = []
+    async def fetch(q):
+        calls.append(q)
+        await asyncio.sleep(0.05)
+        return ITEMS
+    async def main():
+        owner = asyncio.ensure_future(sc.cached_search_async("1 Main St", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(sc.cached_search_async("1 Main St", fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+    assert asyncio.run(main()) == ITEMS
+    assert len(calls) == 2
+
+def _expired():
+    d = Deadline(60)
+    d.expires_at -= 120
+    return d
+
+def test_an_owner_out_of_budget_does_not_fail_its_waiters():
+    gate = asyncio.Event()
+    calls = []
+    async def fetch(q):
+        calls.append(deadline.current())
+        await gate.wait()
+        deadline.check()
+        return ITEMS
+    async def row(d):
+        with deadline.scope(d):
+            return await sc.cached_search_async("1 Main St", fetch)
+    async def main():
+        owner = asyncio.ensure_future(row(_expired()))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(row(Deadline(60)))
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(BudgetExhausted):
+            await owner
+        return await waiter
+    assert asyncio.run(main()) == ITEMS
+    assert len(calls) == 2 and not calls[1].expired()   # the waiter searched under its own deadline
+
+def test_an_owner_out_of_budget_does_not_fail_its_waiters_across_threads(monkeypatch):
+    owner_in, joined = threading.Event(), threading.Event()
+    class Shared(Future):
+        def result(self, timeout=None):
+            joined.set()
+            return super().result(timeout)
+    monkeypatch.setattr(sc, "Future", Shared)
+    out = {}
+    def fetch(q):
+        if not owner_in.is_set():
+            owner_in.set()
+            joined.wait(5)   # hold the call until the waiter shares it
+        deadline.check()
+        return ITEMS
+    def row(name, d):
+        with deadline.scope(d):
+            try:
+                out[name] = sc.cached_search("1 Main St", fetch)
+            except BudgetExhausted:
+                out[name] = "BudgetExhausted"
+    owner = threading.Thread(target=row, args=("owner", _expired()))
+    owner.start(); owner_in.wait(5)
+    waiter = threading.Thread(target=row, args=("waiter", Deadline(60)))
+    waiter.start()
+    owner.join(5); waiter.join(5)
+    assert out == {"owner": "BudgetExhausted", "waiter": ITEMS}
+    assert sc.peek("1 Main St") == ITEMS
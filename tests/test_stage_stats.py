@@ -0,0 +1,59 @@
+# tests/test_stage_stats.py
+import pytest
+
+from core.kvstore import KVStore
+from services import stage_stats as ss
+
+SHAPE = ss.shape_key(True, True, "nc")
+ALL = ["mls", "azure", "bing"]
+
+@pytest.fixture(autouse=True)
+def _store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ss, "STORE", KVStore("stage_stats", path=str(tmp_path / "stats.sqlite3")))
+    monkeypatch.setattr(ss, "_mem", {})
+
+def _history(stage, tries, wins):
+    for n in range(tries):
+        ss.record(SHAPE, [stage], stage if n < wins else None)
+
+def test_shape_key():
+    assert SHAPE == "mls=1|land=1|st=NC"
+    assert ss.shape_key(False, False, " ") == "mls=0|land=0|st=-"
+
+def test_win_rate_is_smoothed():
+    assert ss.win_rate({}) == 0.5
+    assert ss.win_rate({"tries": 2, "wins": 2}) == 0.75
+    assert ss.win_rate({"tries": 2, "wins": 0}) == 0.25
+    assert ss.win_rate({"tries": 98, "wins": 49}) == 0.5
+
+def test_a_fresh_shape_keeps_the_default_order():
+    assert ss.plan(SHAPE, ALL) == ALL
+
+def test_proven_stages_sort_by_win_rate_and_unproven_ones_keep_their_place():
+    _history("bing", ss.STAGE_MIN_TRIES, 15)
+    _history("mls", ss.STAGE_MIN_TRIES, 2)
+    assert ss.plan(SHAPE, ALL) == ["bing", "azure", "mls"]
+
+def test_a_stage_is_not_skipped_before_it_has_enough_tries():
+    _history("azure", ss.STAGE_MIN_TRIES - 1, 0)
+    assert ss.plan(SHAPE, ALL) == ALL
+
+def test_a_proven_loser_is_skipped_but_probed_first_every_nth_row():
+    _history("azure", ss.STAGE_MIN_TRIES, 0)
+    plans = [ss.plan(SHAPE, ALL) for _ in range(2 * ss.STAGE_PROBE_EVERY)]
+    probes = [n for n, p in enumerate(plans, 1) if "azure" in p]
+    assert probes == [ss.STAGE_PROBE_EVERY, 2 * ss.STAGE_PROBE_EVERY]
+    assert plans[ss.STAGE_PROBE_EVERY - 1] == ["azure", "mls", "bing"]
+    assert plans[0] == ["mls", "bing"]
+
+def test_other_shapes_are_unaffected():
+    _history("azure", ss.STAGE_MIN_TRIES, 0)
+    assert ss.plan(ss.shape_key(False, True, "NC"), ALL) == ALL
+
+def test_history_persists_and_expires(clock):
+    _history("azure", ss.STAGE_MIN_TRIES, 0)
+    ss._mem.clear()   # a new process reads the counts back from the store
+    assert "azure" not in ss.plan(SHAPE, ALL)
+    ss._mem.clear()
+    clock.advance(ss._TTL + 1)
+    assert ss.plan(SHAPE, ALL) == ALL
@@ -0,0 +1,51 @@
+# tests/test_zillow_links.py
+import pytest
+
+from services import resolver
+
+HD = "https://www.zillow.com/homedetails/123-Main-St-Raleigh-NC-27601/12345678_zpid/"
+ADDR = "123 Main St Raleigh NC 27601"
+
+@pytest.mark.parametrize("url, expected", [
+    # the listing is named: used as-is, canonicalized
+    (HD, (HD, ADDR)),
+    ("http://zillow.com/homedetails/123-Main-St-Raleigh-NC-27601/12345678_zpid", (HD, ADDR)),
+    (HD + "?utm_source=share&utm_medium=email#photos", (HD, ADDR)),
+    ("https://m.zillow.com/homedetails/123-Main-St-Raleigh-NC-27601/12345678_zpid/?rtoken=x", (HD, ADDR)),
+    ("https://www.zillow.com/homedetails/12345678_zpid/", ("https://www.zillow.com/homedetails/12345678_zpid/", "")),
+    ("https://www.zillow.com/homes/12345678_zpid/", ("https://www.zillow.com/homedetails/12345678_zpid/", "")),
+    # only an address: resolved like an address row
+    ("https://www.zillow.com/homes/123-Main-St,-Raleigh,-NC-27601_rb/", ("", ADDR)),
+    ("https://www.zillow.com/homedetails/123-Main-St-Raleigh-NC-27601/", ("", ADDR)),
+    # neither: resolved as a link
+    ("https://www.zillow.com/b/the-lofts-raleigh-nc/5XjKvN/", ("", "")),
+    ("https://www.zillow.com/raleigh-nc/", ("", "")),
+    ("https://www.zillow.com/homes/for_sale/", ("", "")),
+    ("https://notzillow.com/homedetails/123-Main-St/12345678_zpid/", ("", "")),
+    ("https://l.hms.pt/abc123", ("", "")),
+    ("", ("", "")),
+])
+def test_zillow_link(url, expected):
+    assert resolver.zillow_link(url) == expected
+
+@pytest.mark.parametrize("row, kind, target", [
+    ({"url": HD + "?utm_campaign=x"}, "zillow", (HD, ADDR)),
+    ({"Listing URL": "http://zillow.com/homes/12345678_zpid"}, "zillow", ("https://www.zillow.com/homedetails/12345678_zpid/", "")),
+    ({"source_url": "https://www.zillow.com/homes/123-Main-St,-Raleigh,-NC-27601_rb/"}, "address",
+     {"source_url": "https://www.zillow.com/homes/123-Main-St,-Raleigh,-NC-27601_rb/", "address": ADDR}),
+    ({"url": "https://www.zillow.com/b/the-lofts-raleigh-nc/5XjKvN/"}, "link", "https://www.zillow.com/b/the-lofts-raleigh-nc/5XjKvN/"),
+    ({"url": "https://l.hms.pt/abc123"}, "link", "https://l.hms.pt/abc123"),
+    ({"address": "1 Oak Rd", "url": "not a link"}, "address", {"address": "1 Oak Rd", "url": "not a link"}),
+])
+def test_route_row(row, kind, target):
+    assert resolver.route_row(row) == (kind, target)
+
+def test_an_address_link_keeps_the_rows_own_address():
+    row = {"address": "1 Oak Rd, Cary, NC", "url": "https://www.zillow.com/homes/123-Main-St,-Raleigh,-NC-27601_rb/"}
+    assert resolver.route_row(row) == ("address", row)
+
+def test_a_named_listing_resolves_without_the_network(monkeypatch):
+    monkeypatch.setattr(resolver, "process_single_row", lambda *a, **k: pytest.fail("should not resolve"))
+    monkeypatch.setattr(resolver, "resolve_from_source_url", lambda *a, **k: pytest.fail("should not resolve"))
+    res = resolver.resolve_row({"url": HD + "?utm_source=x", "mls_id": "X123"}, {})
+    assert (res["zillow_url"], res["input_address"], res["mls_id"], res["status"]) == (HD, ADDR, "X123", "")
@@ -6,15 +6,11 @@ import os
 import csv
 import io
 import re
-import time
-import json
 import asyncio
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional
 from html import escape
 
-import requests
-import httpx
 import streamlit as st
 import streamlit.components.v1 as components
 
@@ -24,12 +20,6 @@ try:
 except Exception:
     usaddress = None
 
-# ---------- Robust address parser (IDX/Homespotter-safe) ----------
-try:
-    from utils.address_parser import address_as_markdown_link
-except Exception:
-    address_as_markdown_link = None
-
 # ---------- Rerun helper ----------
 def _safe_rerun():
     try:
@@ -74,15 +64,6 @@ for k in [
     except Exception:
         pass
 
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT", "").rstrip("/")
-AZURE_SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX", "")
-AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_API_KEY", "")
-BING_API_KEY = os.getenv("BING_API_KEY", "")
-BING_CUSTOM_ID = os.getenv("BING_CUSTOM_CONFIG_ID", "")
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
-BITLY_TOKEN = os.getenv("BITLY_TOKEN", "")
-REQUEST_TIMEOUT = 12
-
 # ---------- Styles ----------
 st.markdown(
     """
@@ -180,982 +161,57 @@ def result_to_slug(r: Dict[str, Any]) -> str:
     return address_to_slug(addr)
 
 
-# URL helpers
-URL_KEYS = {
-    "url",
-    "link",
-    "source url",
-    "source_url",
-    "listing url",
-    "listing_url",
-    "property url",
-    "property_url",
-    "href",
-}
-
-
-def is_probable_url(s: str) -> bool:
-    s = (s or "").strip()
-    return s.startswith("http://") or s.startswith("https://") or re.match(r"^[a-z]+://", s) is not None
-
-
-UA_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Cache-Control": "no-cache",
-}
-
-
-def expand_url_and_fetch_html(url: str) -> Tuple[str, str, int]:
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-        return r.url, (r.text if r.ok else ""), r.status_code
-    except Exception:
-        return url, "", 0
-
-
-def upgrade_to_homedetails_if_needed(url: str) -> str:
-    """
-    If this is a Zillow /homes/..._rb/ URL, try to upgrade it to /homedetails/..._zpid/
-    by scraping the page.
-
-    For non-Zillow URLs, or URLs already on /homedetails/, return as-is.
-    """
-    if not url:
-        return url
-
-    # Only operate on Zillow URLs
-    if "zillow.com" not in url or "/homedetails/" in url:
-        return url
-
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        if not r.ok:
-            return url
-        m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', r.text)
-        return m.group(1) if m else url
-    except Exception:
-        return url
-
-
-# Content extractors
-def extract_any_mls_id(html: str) -> Optional[str]:
-    if not html:
-        return None
-    for pat in [
-        r'"mlsId"\s*:\s*"([A-Za-z0-9\-]{5,})"',
-        r'"mls"\s*:\s*"([A-Za-z0-9\-]{5,})"',
-        r'"listingId"\s*:\s*"([A-Za-z0-9\-]{5,})"',
-    ]:
-        m = re.search(pat, html, re.I)
-        if m:
-            return m.group(1)
-    m = re.search(r'\bMLS[^A-Za-z0-9]{0,5}#?\s*([A-Za-z0-9\-]{5,})\b', html, re.I)
-    return m.group(1) if m else None
-
-
-def extract_address_from_html(html: str) -> Dict[str, str]:
-    out = {"street": "", "city": "", "state": "", "zip": ""}
-    if not html:
-        return out
-    m = re.search(r'"streetAddress"\s*:\s*"([^"]+)"', html, re.I)
-    out["street"] = m.group(1) if m else ""
-    m = re.search(r'"addressLocality"\s*:\s*"([^"]+)"', html, re.I)
-    out["city"] = m.group(1) if m else ""
-    m = re.search(r'"addressRegion"\s*:\s*"([A-Za-z]{2})"', html, re.I)
-    out["state"] = m.group(1) if m else ""
-    m = re.search(r'"postalCode"\s*:\s*"(\d{5}(?:-\d{4})?)"', html, re.I)
-    out["zip"] = m.group(1) if m else ""
-    if not out["street"]:
-        for pat in [
-            r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
-            r"<title>\s*([^<]+?)\s*</title>",
-        ]:
-            m = re.search(pat, html, re.I)
-            if m:
-                title = m.group(1)
-                if re.search(r"\b[A-Za-z]{2}\b", title) and re.search(r"\d{5}", title):
-                    out["street"] = title
-                    break
-    return out
-
-
-def extract_title_or_desc(html: str) -> str:
-    for pat in [
-        r"<meta[^>]+property=['\"]og:title['\"][^>]+content=['\"]([^'\"]+)['\"]",
-        r"<title>\s*([^<]+)</title>",
-        r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]",
-    ]:
-        m = re.search(pat, html, re.I)
-        if m:
-            return re.sub(r"\s+", " ", m.group(1)).strip()
-    return ""
-
-
-# Zillow canonicalization
-ZPID_RE = re.compile(r"(\d{6,})_zpid", re.I)
-
-
-def canonicalize_zillow(url: str) -> Tuple[str, Optional[str]]:
-    if not url:
-        return "", None
-    base = re.sub(r"[#?].*$", "", url)
-    m_full = re.search(r"^(https?://[^?#]*/homedetails/[^/]+/\d{6,}_zpid/)", url, re.I)
-    canon = m_full.group(1) if m_full else base
-    m_z = ZPID_RE.search(url)
-    return canon, (m_z.group(1) if m_z else None)
-
-
-def make_preview_url(url: str) -> str:
-    if not url:
-        return ""
-    base = re.sub(r"[?#].*$", "", url.strip())
-    canon, _ = canonicalize_zillow(base)
-    return canon if "/homedetails/" in canon else base
-
-
-# Address parsing & variants
-ADDR_PRIMARY = {
-    "full_address",
-    "address",
-    "property address",
-    "property_address",
-    "site address",
-    "site_address",
-    "street address",
-    "street_address",
-    "listing address",
-    "listing_address",
-    "location",
-}
-NUM_KEYS = {"street #", "street number", "street_no", "streetnum", "house_number", "number", "streetnumber"}
-NAME_KEYS = {
-    "street name",
-    "street",
-    "st name",
-    "st_name",
-    "road",
-    "rd",
-    "avenue",
-    "ave",
-    "blvd",
-    "boulevard",
-    "drive",
-    "dr",
-    "lane",
-    "ln",
-    "way",
-    "terrace",
-    "ter",
-    "court",
-    "ct",
-    "place",
-    "pl",
-    "parkway",
-    "pkwy",
-    "square",
-    "sq",
-    "circle",
-    "cir",
-    "highway",
-    "hwy",
-    "route",
-    "rt",
-}
-SUF_KEYS = {"suffix", "st suffix", "street suffix", "suffix1", "suffix2", "street_type", "street type"}
-CITY_KEYS = {"city", "municipality", "town"}
-STATE_KEYS = {"state", "st", "province", "region"}
-ZIP_KEYS = {"zip", "zip code", "postal code", "postalcode", "zip_code", "postal_code"}
-MLS_ID_KEYS = {"mls", "mls id", "mls_id", "mls #", "mls#", "mls number", "mlsnumber", "listing id", "listing_id"}
-MLS_NAME_KEYS = {"mls name", "mls board", "mls provider", "source", "source mls", "mls source"}
-PHOTO_KEYS = {"photo", "image", "photo url", "image url", "picture", "thumbnail", "thumb", "img", "img url", "img_url"}
-
-
-def norm_key(k: str) -> str:
-    return re.sub(r"\s+", " ", (k or "").strip().lower())
-
-
-def get_first_by_keys(row, keys):
-    for k in row.keys():
-        if norm_key(k) in keys:
-            v = str(row[k]).strip()
-            if v:
-                return v
-    return ""
-
-
-def extract_components(row):
-    n = {norm_key(k): (str(v).strip() if v is not None else "") for k, v in row.items()}
-    for k in n.keys():
-        if k in ADDR_PRIMARY and n[k]:
-            return {
-                "street_raw": n[k],
-                "city": "",
-                "state": "",
-                "zip": "",
-                "mls_id": get_first_by_keys(n, MLS_ID_KEYS),
-                "mls_name": get_first_by_keys(n, MLS_NAME_KEYS),
-            }
-    num = get_first_by_keys(n, NUM_KEYS)
-    name = get_first_by_keys(n, NAME_KEYS)
-    suf = get_first_by_keys(n, SUF_KEYS)
-    city = get_first_by_keys(n, CITY_KEYS)
-    state = get_first_by_keys(n, STATE_KEYS)
-    zipc = get_first_by_keys(n, ZIP_KEYS)
-    street_raw = " ".join([x for x in [num, name, suf] if x]).strip()
-    return {
-        "street_raw": street_raw,
-        "city": city,
-        "state": state,
-        "zip": zipc,
-        "mls_id": get_first_by_keys(n, MLS_ID_KEYS),
-        "mls_name": get_first_by_keys(n, MLS_NAME_KEYS),
-    }
-
-
-LAND_LEAD_TOKENS = {"lot", "lt", "tract", "parcel", "blk", "block", "tbd"}
-HWY_EXPAND = {r"\bhwy\b": "highway", r"\bus\b": "US"}
-DIR_MAP = {"s": "south", "n": "north", "e": "east", "w": "west"}
-LOT_REGEX = re.compile(r"\b(?:lot|lt)\s*[-#:]?\s*([A-Za-z0-9]+)\b", re.I)
-
-
-def clean_land_street(street: str) -> str:
-    if not street:
-        return street
-    s = street.strip()
-    s = re.sub(r"^\s*0[\s\-]+", "", s)
-    tokens = re.split(r"[\s\-]+", s)
-    if tokens and tokens[0].lower() in LAND_LEAD_TOKENS:
-        tokens = [t for t in tokens[1:] if t]
-        s = " ".join(tokens)
-    s_lower = f" {s.lower()} "
-    for pat, repl in HWY_EXPAND.items():
-        s_lower = re.sub(pat, f" {repl} ", s_lower)
-    s = re.sub(r"\s+", " ", s_lower).strip()
-    s = re.sub(r"[^\w\s/-]", "", s)
-    return s
-
-
-def compose_query_address(street, city, state, zipc, defaults):
-    parts = [street]
-    c = (city or defaults.get("city", "")).strip()
-    stt = (state or defaults.get("state", "")).strip()
-    z = (zipc or defaults.get("zip", "")).strip()
-    if c:
-        parts.append(c)
-    if stt:
-        parts.append(stt)
-    if z:
-        parts.append(z)
-    return " ".join([p for p in parts if p]).strip()
-
-
-def generate_address_variants(street, city, state, zipc, defaults):
-    city = (city or defaults.get("city", "")).strip()
-    st = (state or defaults.get("state", "")).strip()
-    z = (zipc or defaults.get("zip", "")).strip()
-    base = (street or "").strip()
-
-    lot_match = LOT_REGEX.search(base)
-    lot_num = lot_match.group(1) if lot_match else None
-
-    core = base
-    core = re.sub(r"\bu\.?s\.?\b", "US", core, flags=re.I)
-    core = re.sub(r"\bhwy\b", "highway", core, flags=re.I)
-    core = re.sub(r"\b([NSEW])\b", lambda m: DIR_MAP.get(m.group(1).lower(), m.group(1)), core, flags=re.I)
-
-    variants = {core, re.sub(r"\bhighway\b", "hwy", core, flags=re.I)}
-
-    lot_variants = set(variants)
-    if lot_num:
-        for v in list(variants):
-            lot_variants.update({f"lot {lot_num} {v}", f"{v} lot {lot_num}", f"lot-{lot_num} {v}"})
-
-    stripped_variants = {LOT_REGEX.sub("", v).strip() for v in list(lot_variants)}
-    all_street_variants = lot_variants | stripped_variants
-
-    out = []
-    for sv in all_street_variants:
-        parts = [sv] + [p for p in [city, st, z] if p]
-        out.append(" ".join(parts))
-    return [s for s in dict.fromkeys(out) if s.strip()]
-
-
-# Search (Bing/Azure)
-BING_WEB = "https://api.bing.microsoft.com/v7.0/search"
-BING_CUSTOM = "https://api.bing.microsoft.com/v7.0/custom/search"
-
-
-def _slug(text: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")
-
-
-def url_matches_city_state(url: str, city: str = None, state: str = None) -> bool:
-    u = (url or "")
-    ok = True
-    if state:
-        st2 = state.upper().strip()
-        if f"-{st2}-" not in u and f"/{st2.lower()}/" not in u:
-            ok = False
-    if city and ok:
-        cs = f"-{_slug(city)}-"
-        if cs not in u:
-            ok = False
-    return ok
-
-
-def bing_search_items(query):
-    key = BING_API_KEY
-    custom = BING_CUSTOM_ID
-    if not key:
-        return []
-    h = {"Ocp-Apim-Subscription-Key": key}
-    try:
-        if custom:
-            p = {"q": query, "customconfig": custom, "mkt": "en-US", "count": 15}
-            r = requests.get(BING_CUSTOM, headers=h, params=p, timeout=REQUEST_TIMEOUT)
-        else:
-            p = {"q": query, "mkt": "en-US", "count": 15, "responseFilter": "Webpages"}
-            r = requests.get(BING_WEB, headers=h, params=p, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        data = r.json()
-        return (
-            data.get("webPages", {}).get("value")
-            if "webPages" in data
-            else data.get("items", []) or []
-        )
-    except requests.RequestException:
-        return []
-
-
-MLS_HTML_PATTERNS = [
-    lambda mid: rf'\bMLS[^A-Za-z0-9]{{0,5}}#?\s*{re.escape(mid)}\b',
-    lambda mid: rf'\bMLS\s*#?\s*{re.escape(mid)}\b',
-    lambda mid: rf'"mls"\s*:\s*"{re.escape(mid)}"',
-    lambda mid: rf'"mlsId"\s*:\s*"{re.escape(mid)}"',
-    lambda mid: rf'"mlsId"\s*:\s*{re.escape(mid)}',
-]
-
-
-def page_contains_mls(html: str, mls_id: str) -> bool:
-    for mk in MLS_HTML_PATTERNS:
-        if re.search(mk(mls_id), html, re.I):
-            return True
-    return False
-
-
-def page_contains_city_state(html: str, city: str = None, state: str = None) -> bool:
-    ok = False
-    if city and re.search(re.escape(city), html, re.I):
-        ok = True
-    if state and re.search(rf"\b{re.escape(state)}\b", html, re.I):
-        ok = True
-    return ok
-
-
-def confirm_or_resolve_on_page(
-    url: str, mls_id: str = None, required_city: str = None, required_state: str = None
-):
-    try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        html = r.text
-        if mls_id and page_contains_mls(html, mls_id):
-            return url, "mls_match"
-        if page_contains_city_state(html, required_city, required_state) and "/homedetails/" in url:
-            return url, "city_state_match"
-        if url.endswith("_rb/") and "/homedetails/" not in url:
-            cand = re.findall(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', html)[:8]
-            for u in cand:
-                try:
-                    rr = requests.get(u, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-                    rr.raise_for_status()
-                    h2 = rr.text
-                    if (mls_id and page_contains_mls(h2, mls_id)):
-                        return u, "mls_match"
-                    if page_contains_city_state(h2, required_city, required_state):
-                        return u, "city_state_match"
-                except Exception:
-                    continue
-    except Exception:
-        return None, None
-    return None, None
-
-
-def find_zillow_by_mls_with_confirmation(
-    mls_id,
-    required_state=None,
-    required_city=None,
-    mls_name=None,
-    delay=0.35,
-    require_match=False,
-    max_candidates=20,
-):
-    if not (BING_API_KEY and mls_id):
-        return None, None
-    q_mls = [
-        f'"MLS# {mls_id}" site:zillow.com',
-        f'"{mls_id}" "MLS" site:zillow.com',
-        f"{mls_id} site:zillow.com/homedetails",
-    ]
-    if mls_name:
-        q_mls = [f'{q} "{mls_name}"' for q in q_mls] + q_mls
-    seen, candidates = set(), []
-    for q in q_mls:
-        items = bing_search_items(q)
-        for it in items:
-            url = it.get("url") or it.get("link") or ""
-            if not url or "zillow.com" not in url:
-                continue
-            if "/homedetails/" not in url and "/homes/" not in url:
-                continue
-            if require_match and not url_matches_city_state(url, required_city, required_state):
-                continue
-            if url in seen:
-                continue
-            seen.add(url)
-            candidates.append(url)
-            if len(candidates) >= max_candidates:
-                break
-        if len(candidates) >= max_candidates:
-            break
-    for u in candidates:
-        time.sleep(delay)
-        ok, mtype = confirm_or_resolve_on_page(
-            u, mls_id=mls_id, required_city=required_city, required_state=required_state
-        )
-        if ok:
-            return ok, mtype or "mls_match"
-    return None, None
+# ---------- Shared resolver / enrichment / images ----------
+# Imported after the secrets block above: these modules read their keys from os.environ.
+from utils.address import is_probable_url
+from services.resolver import (
+    canonicalize_zillow,
+    make_preview_url,
+    upgrade_to_homedetails_if_needed,
+    resolve_batch,
+    route_row,
+)
+from services.enrich import enrich_results_async
+from services.images import get_thumbnail_and_log
+from services.tracking import make_trackable_url, bitly_shorten
+from services import resolution_cache, negative_cache, search_cache, page_cache, listing, ratelimit, stage_stats, jobs, shortlinks
+from services.batch import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_PER_HOST_LIMIT,
+    configure_host_limits,
+)
+from services.deadline import ROW_DEADLINE, BATCH_DEADLINE, BUDGET_EXHAUSTED
+from services.journal import Journal, clear as clear_journals
 
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
 
-def azure_search_first_zillow(query_address):
-    if not (AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_INDEX and AZURE_SEARCH_KEY):
-        return None
-    url = f"{AZURE_SEARCH_ENDPOINT}/indexes/{AZURE_SEARCH_INDEX}/docs/search?api-version=2023-11-01"
-    h = {"Content-Type": "application/json", "api-key": AZURE_SEARCH_KEY}
-    try:
-        r = requests.post(
-            url,
-            headers=h,
-            data=json.dumps({"search": query_address, "top": 1}),
-            timeout=REQUEST_TIMEOUT,
-        )
-        r.raise_for_status()
-        data = r.json() or {}
-        hits = data.get("value") or data.get("results") or []
-        if not hits:
-            return None
-        doc = hits[0].get("document") or hits[0]
-        for k in ("zillow_url", "zillowLink", "zillow", "url", "link"):
-            v = doc.get(k) if isinstance(doc, dict) else None
-            if isinstance(v, str) and "zillow.com" in v:
-                return v
-    except requests.RequestException:
-        return None
-    return None
-
-
-def resolve_homedetails_with_bing_variants(
-    address_variants,
-    required_state=None,
-    required_city=None,
-    mls_id=None,
-    delay=0.3,
-    require_match=False,
-):
-    if not BING_API_KEY:
-        return None, None
-    candidates, seen = [], set()
-    for qaddr in address_variants:
-        queries = [
-            f"{qaddr} site:zillow.com/homedetails",
-            f'"{qaddr}" site:zillow.com/homedetails',
-            f"{qaddr} land site:zillow.com/homedetails",
-            f"{qaddr} lot site:zillow.com/homedetails",
-        ]
-        if mls_id:
-            queries = [
-                f'"MLS# {mls_id}" site:zillow.com/homedetails',
-                f"{mls_id} site:zillow.com/homedetails",
-                f'"{mls_id}" "MLS" site:zillow.com/homedetails',
-            ] + queries
-        for q in queries:
-            items = bing_search_items(q)
-            for it in items:
-                url = it.get("url") or it.get("link") or ""
-                if not url or "zillow.com" not in url:
-                    continue
-                if "/homedetails/" not in url and "/homes/" not in url:
-                    continue
-                if require_match and not url_matches_city_state(url, required_city, required_state):
-                    continue
-                if url in seen:
-                    continue
-                seen.add(url)
-                candidates.append(url)
-            time.sleep(delay)
-    for u in candidates:
-        time.sleep(delay)
-        ok, mtype = confirm_or_resolve_on_page(
-            u, mls_id=mls_id, required_city=required_city, required_state=required_state
-        )
-        if ok:
-            return ok, mtype or "city_state_match"
-    return None, None
-
-
-def construct_deeplink_from_parts(street, city, state, zipc, defaults):
-    c = (city or defaults.get("city", "")).strip()
-    st_abbr = (state or defaults.get("state", "")).strip()
-    z = (zipc or defaults.get("zip", "")).strip()
-    slug_parts = [street]
-    loc_parts = [p for p in [c, st_abbr] if p]
-    if loc_parts:
-        slug_parts.append(", ".join(loc_parts))
-    if z:
-        if slug_parts:
-            slug_parts[-1] = f"{slug_parts[-1]} {z}"
-        else:
-            slug_parts.append(z)
-    slug = ", ".join(slug_parts)
-    a = slug.lower()
-    a = re.sub(r"[^\w\s,-]", "", a).replace(",", "")
-    a = re.sub(r"\s+", "-", a.strip())
-    return f"https://www.zillow.com/homes/{a}_rb/"
-
-
-# ---------- Resolve from arbitrary source URL (PATCHED) ----------
-def resolve_from_source_url(source_url: str, defaults: Dict[str, str]) -> Tuple[str, str]:
-    final_url, html, _ = expand_url_and_fetch_html(source_url)
-
-    # 1) Try MLS→Zillow
-    mls_id = extract_any_mls_id(html)
-    if not mls_id:
-        # also try to read trailing ID from URLs like .../tmlspar/10116790
-        m = re.search(r"/([A-Za-z0-9]{6,})/?$", final_url)
-        if m:
-            mls_id = m.group(1)
-    if mls_id:
-        z1, _ = find_zillow_by_mls_with_confirmation(mls_id)
-        if z1:
-            return z1, ""
-
-    # 2) Robust parser: pull address from the page and build a Zillow deeplink
-    street = city = state = zipc = ""
-    if address_as_markdown_link:
-        try:
-            _md, info = address_as_markdown_link(final_url, parse_html=True)
-            street = (info.get("streetAddress") or "").strip()
-            city = (info.get("addressLocality") or "").strip()
-            state = (info.get("addressRegion") or "").strip()
-            zipc = (info.get("postalCode") or "").strip()
-        except Exception:
-            pass
-    if not (street or (city and state)):
-        # fallback to lightweight extractor (older behavior)
-        addr = extract_address_from_html(html)
-        street = street or (addr.get("street", "") or "")
-        city = city or (addr.get("city", "") or "")
-        state = state or (addr.get("state", "") or "")
-        zipc = zipc or (addr.get("zip", "") or "")
-
-    if street or (city and state):
-        used_addr = compose_query_address(street, city, state, zipc, defaults)
-        zurl = construct_deeplink_from_parts(street or used_addr, city, state, zipc, defaults)
-        return zurl, used_addr
-
-    # 3) Title/desc → homedetails search
-    title = extract_title_or_desc(html)
-    if title:
-        for q in [f'"{title}" site:zillow.com/homedetails', f"{title} site:zillow.com"]:
-            items = bing_search_items(q)
-            for it in items:
-                u = it.get("url") or ""
-                if "/homedetails/" in u:
-                    return u, title
-
-    # 4) Give up — but do NOT return a non-Zillow URL.
-    # Let the caller fall back to its own logic instead.
-    return "", ""
-
-
-# Primary resolver
-def process_single_row(
-    row,
-    *,
-    delay=0.5,
+# Row options the Run tab always resolves with (inline and background runs alike).
+RUN_ROW_OPTIONS = dict(
+    delay=0.45,
     land_mode=True,
-    defaults=None,
     require_state=True,
     mls_first=True,
     default_mls_name="",
     max_candidates=20,
-):
-    defaults = defaults or {"city": "", "state": "", "zip": ""}
-    csv_photo = get_first_by_keys(row, PHOTO_KEYS)
-    comp = extract_components(row)
-    street_raw = comp["street_raw"]
-    street_clean = clean_land_street(street_raw) if land_mode else street_raw
-    variants = generate_address_variants(
-        street_raw, comp["city"], comp["state"], comp["zip"], defaults
-    )
-    if land_mode:
-        variants = list(
-            dict.fromkeys(
-                variants
-                + generate_address_variants(
-                    street_clean, comp["city"], comp["state"], comp["zip"], defaults
-                )
-            )
-        )
-    query_address = (
-        variants[0]
-        if variants
-        else compose_query_address(
-            street_raw, comp["city"], comp["state"], comp["zip"], defaults
-        )
-    )
-    deeplink = construct_deeplink_from_parts(
-        street_raw, comp["city"], comp["state"], comp["zip"], defaults
-    )
-    required_state_val = defaults.get("state") if require_state else None
-    required_city_val = comp["city"] or defaults.get("city")
-    zurl, status = None, "fallback"
-    mls_id = (comp.get("mls_id") or "").strip()
-    mls_name = (comp.get("mls_name") or default_mls_name or "").strip()
-    if mls_first and mls_id:
-        zurl, mtype = find_zillow_by_mls_with_confirmation(
-            mls_id,
-            required_state=required_state_val,
-            required_city=required_city_val,
-            mls_name=mls_name,
-            delay=min(delay, 0.6),
-            require_match=require_state,
-            max_candidates=max_candidates,
-        )
-        if zurl:
-            status = "mls_match" if mtype == "mls_match" else "city_state_match"
-    if not zurl:
-        z = azure_search_first_zillow(query_address)
-        if z:
-            zurl, status = z, "azure_hit"
-    if not zurl:
-        zurl, mtype = resolve_homedetails_with_bing_variants(
-            variants,
-            required_state=required_state_val,
-            required_city=required_city_val,
-            mls_id=mls_id or None,
-            delay=min(delay, 0.6),
-            require_match=require_state,
-        )
-        if zurl:
-            status = "mls_match" if mtype == "mls_match" else "city_state_match"
-    if not zurl:
-        zurl, status = deeplink, "deeplink_fallback"
-    time.sleep(min(delay, 0.4))
-    return {
-        "input_address": query_address,
-        "mls_id": mls_id,
-        "zillow_url": zurl,
-        "status": status,
-        "csv_photo": csv_photo,
-    }
-
-
-# Enrichment
-RE_PRICE = re.compile(
-    r'"(?:price|unformattedPrice|priceZestimate)"\s*:\s*"?\$?([\d,]+)"?', re.I
-)
-RE_STATUS = re.compile(r'"(?:homeStatus|statusText)"\s*:\s*"([^"]+)"', re.I)
-RE_BEDS = re.compile(r'"(?:bedrooms|beds)"\s*:\s*(\d+)', re.I)
-RE_BATHS = re.compile(r'"(?:bathrooms|baths)"\s*:\s*([0-9.]+)', re.I)
-RE_SQFT = re.compile(r'"(?:livingArea|livingAreaValue|area)"\s*:\s*([0-9,]+)', re.I)
-RE_DESC = re.compile(
-    r'"(?:description|homeDescription|marketingDescription)"\s*:\s*"([^"]+)"', re.I
 )
 
-KEY_HL = [
-    ("new roof", "roof"),
-    ("hvac", "hvac"),
-    ("ac unit", "ac"),
-    ("furnace", "furnace"),
-    ("water heater", "water heater"),
-    ("renovated", "renovated"),
-    ("updated", "updated"),
-    ("remodeled", "remodeled"),
-    ("open floor plan", "open plan"),
-    ("cul-de-sac", "cul-de-sac"),
-    ("pool", "pool"),
-    ("fenced", "fenced"),
-    ("acre", "acre"),
-    ("hoa", "hoa"),
-    ("primary on main", "primary on main"),
-    ("finished basement", "finished basement"),
-]
-
-
-def _tidy_txt(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "")).strip()
-
-
-def summarize_remarks(text: str, max_sent: int = 2) -> str:
-    text = _tidy_txt(text)
-    if not text:
-        return ""
-    sents = re.split(r"(?<=[\.\!\?])\s+", text)
-    if len(sents) <= max_sent:
-        return text
-    pref_kw = [
-        "updated",
-        "renovated",
-        "new",
-        "roof",
-        "hvac",
-        "kitchen",
-        "bath",
-        "floor",
-        "windows",
-        "mechanicals",
-        "acres",
-        "acre",
-        "lot",
-        "school",
-        "zoned",
-        "hoa",
-        "no hoa",
-    ]
-    scored = [
-        (sum(1 for k in pref_kw if k in s.lower()), i, s)
-        for i, s in enumerate(sents[:8])
-    ]
-    scored.sort(key=lambda x: (-x[0], x[1]))
-    return " ".join([s for _, _, s in scored[:max_sent]])
-
-
-def extract_highlights(text: str) -> List[str]:
-    t = (text or "").lower()
-    out = []
-    for pat, label in KEY_HL:
-        if pat in t:
-            out.append(label)
-    return list(dict.fromkeys(out))[:6]
-
-
-async def _fetch_html_async(client: httpx.AsyncClient, url: str) -> str:
-    try:
-        r = await client.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        if r.status_code == 200:
-            return r.text
-    except Exception:
-        return ""
-    return ""
-
-
-def extract_zillow_first_image(html: str) -> Optional[str]:
-    if not html:
-        return None
-    for target_w in ("960", "1152", "768", "1536"):
-        m = re.search(
-            rf"<img[^>]+src=['\"](https://photos\.zillowstatic\.com/fp/[^'\" ]+-cc_ft_{target_w}\.(?:jpg|webp))['\"]",
-            html,
-            re.I,
-        )
-        if m:
-            return m.group(1)
-    m = re.search(r"srcset=['\"]([^'\"]*photos\.zillowstatic\.com[^'\"]+)['\"]", html, re.I)
-    if m:
-        cand = []
-        for part in m.group(1).split(","):
-            part = part.strip()
-            m2 = re.match(
-                r"(https://photos\.zillowstatic\.com/\S+)\s+(\d+)w", part, re.I
-            )
-            if m2:
-                cand.append((int(m2.group(2)), m2.group(1)))
-        if cand:
-            up = [u for (w, u) in cand if w <= 1152]
-            return (
-                sorted(((w, u) for (w, u) in cand if w <= 1152), key=lambda x: x[0])[
-                    -1
-                ][1]
-                if up
-                else sorted(cand, key=lambda x: x[0])[-1][1]
-            )
-    m = re.search(
-        r"(https://photos\.zillowstatic\.com/fp/\S+-cc_ft_\d+\.(jpg|webp))", html, re.I
-    )
-    return m.group(1) if m else None
-
-
-def parse_listing_meta(html: str) -> Dict[str, Any]:
-    meta: Dict[str, Any] = {}
-    if not html:
-        return meta
-    m = RE_PRICE.search(html)
-    meta["price"] = m.group(1) if m else None
-    m = RE_STATUS.search(html)
-    meta["status"] = m.group(1) if m else None
-    m = RE_BEDS.search(html)
-    meta["beds"] = m.group(1) if m else None
-    m = RE_BATHS.search(html)
-    meta["baths"] = m.group(1) if m else None
-    m = RE_SQFT.search(html)
-    meta["sqft"] = m.group(1) if m else None
-    m = RE_DESC.search(html)
-    remark = m.group(1) if m else None
-    if not remark:
-        m2 = re.search(
-            r"<meta[^>]+name=['\"]description['\"][^>]+content=['\"]([^'\"]+)['\"]",
-            html,
-            re.I,
-        )
-        if m2:
-            remark = m2.group(1)
-    meta["remarks"] = remark
-    img = extract_zillow_first_image(html)
-    if not img:
-        m3 = re.search(
-            r"<meta[^>]+property=['\"]og:image['\"][^>]+content=['\"]([^'\"]+)['\"]",
-            html,
-            re.I,
-        )
-        if m3:
-            img = m3.group(1)
-    meta["image_url"] = img
-    meta["summary"] = summarize_remarks(remark or "")
-    meta["highlights"] = extract_highlights(remark or "")
-    return meta
-
-
-async def enrich_results_async(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    targets = [
-        (i, r["zillow_url"])
-        for i, r in enumerate(results)
-        if "/homedetails/" in (r.get("zillow_url") or "")
-    ]
-    if not targets:
-        return results
-    limits = min(12, max(4, len(targets)))
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        sem = asyncio.Semaphore(limits)
-
-        async def task(i, url):
-            async with sem:
-                html = await _fetch_html_async(client, url)
-                return i, parse_listing_meta(html)
-
-        coros = [task(i, url) for i, url in targets]
-        for fut in asyncio.as_completed(coros):
-            i, meta = await fut
-            if meta:
-                results[i].update(meta)
-    return results
 
-
-# ---------- Images fallback ----------
-def picture_for_result_with_log(
-    query_address: str, zurl: str, csv_photo_url: Optional[str] = None
-):
-    log = {
-        "url": zurl,
-        "csv_provided": bool(csv_photo_url),
-        "stage": None,
-        "status_code": None,
-        "html_len": None,
-        "selected": None,
-        "errors": [],
-    }
-
-    def _ok(u: str) -> bool:
-        return isinstance(u, str) and (
-            u.startswith("http://") or u.startswith("https://") or u.startswith("data:")
-        )
-
-    if csv_photo_url and _ok(csv_photo_url):
-        log["stage"] = "csv_photo"
-        log["selected"] = csv_photo_url
-        return csv_photo_url, log
-
-    if zurl and "/homedetails/" in zurl:
-        try:
-            r = requests.get(zurl, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-            log["status_code"] = r.status_code
-            if r.ok:
-                html = r.text
-                log["html_len"] = len(html)
-                zfirst = extract_zillow_first_image(html)
-                if zfirst:
-                    log["stage"] = "zillow_hero"
-                    log["selected"] = zfirst
-                    return zfirst, log
-                for pat in [
-                    r"<meta[^>]+property=['\"]og:image['\"][^>]+content=['\"]([^'\"]+)['\"]",
-                    r"<meta[^>]+property=['\"]og:image:secure_url['\"][^>]+content=['\"]([^'\"]+)['\"]",
-                    r"\"image\"\s*:\s*\"(https?://[^\"]+)\"",
-                    r"\"image\"\s*:\s*\[\s*\"(https?://[^\"]+)\"",
-                ]:
-                    m = re.search(pat, html, re.I)
-                    if m:
-                        log["stage"] = "og_image"
-                        log["selected"] = m.group(1)
-                        return m.group(1), log
-        except Exception as e:
-            log["errors"].append(f"fetch_err:{e!r}")
-
-    try:
-        key = GOOGLE_MAPS_API_KEY
-        if key and query_address:
-            from urllib.parse import quote_plus
-
-            loc = quote_plus(query_address)
-            sv = f"https://maps.googleapis.com/maps/api/streetview?size=600x400&location={loc}&key={key}"
-            log["stage"] = "street_view"
-            log["selected"] = sv
-            return sv, log
-        else:
-            if not key:
-                log["errors"].append("no_google_maps_key")
-    except Exception as e:
-        log["errors"].append(f"sv_err:{e!r}")
-
-    log["stage"] = "none"
-    return None, log
-
-
-@st.cache_data(ttl=900, show_spinner=False)
-def get_thumbnail_and_log(query_address: str, zurl: str, csv_photo_url: Optional[str]):
-    return picture_for_result_with_log(query_address, zurl, csv_photo_url)
-
-
-# ---------- Tracking + Bitly ----------
-def make_trackable_url(url: str, client_tag: str, campaign_tag: str) -> str:
-    client_tag = re.sub(r"[^a-z0-9\-]+", "", (client_tag or "").lower().replace(" ", "-"))
-    campaign_tag = re.sub(r"[^a-z0-9\-]+", "", (campaign_tag or "").lower().replace(" ", "-"))
-    frag = f"#aa={client_tag}.{campaign_tag}" if (client_tag or campaign_tag) else ""
-    return (url or "") + (frag if url and frag else "")
-
-
-def bitly_shorten(long_url: str) -> Optional[str]:
-    token = BITLY_TOKEN
-    if not token:
-        return None
-    try:
-        r = requests.post(
-            "https://api-ssl.bitly.com/v4/shorten",
-            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-            json={"long_url": long_url},
-            timeout=10,
-        )
-        if r.ok:
-            return r.json().get("link")
-    except Exception:
-        return None
-    return None
+# ---------- Background job progress ----------
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(job_id: str):
+    # Reruns on its own timer, so polling never reruns the rest of the app.
+    job = jobs.status(job_id)
+    if not job or job["status"] in jobs.FINISHED:
+        _safe_rerun()
+        return
+    total = max(1, int(job.get("total") or 0))
+    done = int(job.get("done") or 0)
+    st.progress(done / total, text=f"Background run: resolved {done}/{job.get('total', 0)}")
+    if job.get("resumed"):
+        st.caption(f"Resumed {job['resumed']} row(s) from an interrupted run of this input.")
+    if st.button("Cancel run", key="__job_cancel__"):
+        jobs.cancel(job_id)
+        st.caption("Cancelling — rows already in flight will finish.")
 
 
 # ---------- Supabase sent lookups ----------
@@ -1490,6 +546,110 @@ def render_run_tab(state: dict):
         help="Easier to scan details",
     )
 
+    with st.expander("Speed & cache", expanded=False):
+        sp1, sp2 = st.columns(2)
+        with sp1:
+            max_workers = int(
+                st.number_input(
+                    "Rows in parallel",
+                    min_value=1,
+                    max_value=32,
+                    value=DEFAULT_MAX_WORKERS,
+                    step=1,
+                    help="How many rows resolve at the same time.",
+                )
+            )
+        with sp2:
+            per_host_limit = int(
+                st.number_input(
+                    "Max requests per host",
+                    min_value=1,
+                    max_value=16,
+                    value=DEFAULT_PER_HOST_LIMIT,
+                    step=1,
+                    help="Caps simultaneous calls to any one upstream (Bing, Azure, zillow.com).",
+                )
+            )
+        bd1, bd2 = st.columns(2)
+        with bd1:
+            row_budget = float(
+                st.number_input(
+                    "Time budget per row (s)",
+                    min_value=0,
+                    max_value=600,
+                    value=int(ROW_DEADLINE),
+                    step=5,
+                    help="A row that runs out of time returns its best candidate or the deeplink, marked budget_exhausted. 0 = no limit.",
+                )
+            )
+        with bd2:
+            batch_budget = float(
+                st.number_input(
+                    "Time budget per run (s)",
+                    min_value=0,
+                    max_value=3600,
+                    value=int(BATCH_DEADLINE),
+                    step=30,
+                    help="Caps the whole run; rows still pending when it expires degrade the same way. 0 = no limit.",
+                )
+            )
+        use_cache = st.checkbox(
+            "Reuse earlier resolutions (cache)",
+            value=True,
+            help="Skips Bing/Azure for addresses, MLS ids and links resolved in earlier runs.",
+        )
+        retry_misses = st.checkbox(
+            "Search recent misses again",
+            value=False,
+            help="Addresses that found no listing in the last few hours normally go straight to the Zillow search link. "
+                 "Tick to run every search for them again.",
+        )
+        run_in_background = st.checkbox(
+            "Run in background",
+            value=False,
+            help="Resolves outside the page, so reruns, refreshes and clicks don't lose the batch. Progress updates here.",
+        )
+        rc = resolution_cache.stats()
+        nc = negative_cache.stats()
+        sc = search_cache.stats()
+        pc = page_cache.stats()
+        slc = shortlinks.stats()
+        cc1, cc2 = st.columns([2, 1])
+        with cc1:
+            st.caption(
+                f"Resolution cache: {rc['entries']} saved • {rc['hits']} hits / {rc['misses']} misses since start"
+            )
+            st.caption(
+                f"Recent misses: {nc['entries']} saved • {nc['hits']} searches skipped since start"
+            )
+            st.caption(
+                f"Search cache: {sc['entries']} queries saved • {sc['hits']} hits / {sc['misses']} misses since start"
+            )
+            st.caption(
+                f"Page cache: {pc['entries']} pages ({pc['bytes'] // (1024 * 1024)} MB) • "
+                f"{pc['hits']} hits / {pc['misses']} misses since start"
+            )
+            st.caption(
+                f"Short links: {slc['entries']} expanded • {slc['hits']} hits / {slc['misses']} misses since start"
+            )
+            rl = ratelimit.stats()
+            st.caption(
+                "Rate limits: " + " • ".join(
+                    f"{name} {v['rate']:g}/s (waited {v['waited']:g}s)" for name, v in rl.items() if v["rate"] > 0
+                )
+            )
+        with cc2:
+            if st.button("Clear cache", use_container_width=True, key="__clear_res_cache__"):
+                resolution_cache.clear()
+                negative_cache.clear()
+                search_cache.clear()
+                page_cache.clear()
+                shortlinks.clear()
+                listing.clear()
+                stage_stats.clear()
+                clear_journals()
+                st.success("Resolution, search and page caches cleared.")
+
     client_tag = _norm_tag(client_tag_raw)
     campaign_tag = _norm_tag(campaign_tag_raw)
 
@@ -1941,6 +1101,67 @@ def render_run_tab(state: dict):
                 with st.expander("Details"):
                     st.exception(e)
 
+    # ---------- After resolution (inline and background runs) ----------
+    def _finish_run(results: List[Dict[str, Any]], csv_rows_count: Optional[int], enrich: bool):
+        n_exhausted = sum(1 for r in results if r.get("status") == BUDGET_EXHAUSTED)
+        if n_exhausted:
+            st.warning(f"{n_exhausted} row(s) ran out of time budget and fell back to their best candidate or deeplink.")
+
+        for r in results:
+            for key in ("zillow_url", "display_url"):
+                if r.get(key):
+                    r[key] = upgrade_to_homedetails_if_needed(r[key])
+
+        if enrich:
+            st.write("Enriching details (parallel)…")
+            results = asyncio.run(enrich_results_async(results))
+
+        for r in results:
+            base = r.get("zillow_url")
+            r["preview_url"] = make_preview_url(base) if base else ""
+            display = make_trackable_url(base, client_tag, campaign_tag) if base else base
+            if use_shortlinks and display:
+                short = bitly_shorten(display)
+                r["display_url"] = short or display
+            else:
+                r["display_url"] = display or base
+
+        # ---- Mark duplicates & toured for the *view* client only (no logging here)
+        client_selected = bool(client_tag.strip())
+        tour_map = get_tour_slug_map(client_tag) if client_selected else {}
+        if client_selected:
+            canon_set, zpid_set, canon_info, zpid_info = get_already_sent_maps(
+                client_tag
+            )
+            results = mark_duplicates(
+                results, canon_set, zpid_set, canon_info, zpid_info
+            )
+            for r in results:
+                info = tour_map.get(result_to_slug(r), {})
+                r["toured"] = bool(info)
+                r["toured_date"] = info.get("date") if info else ""
+                r["toured_start"] = info.get("start") if info else ""
+                r["toured_end"] = info.get("end") if info else ""
+            if only_show_new:
+                results = [r for r in results if not r.get("already_sent")]
+        else:
+            for r in results:
+                r["already_sent"] = False
+                r["toured"] = False
+
+        st.success(
+            f"Processed {len(results)} item(s)"
+            + (f" — CSV rows read: {csv_rows_count}" if csv_rows_count is not None else "")
+        )
+
+        _render_results_and_downloads(
+            results,
+            client_tag,
+            campaign_tag,
+            include_notes=enrich,
+            client_selected=client_selected,
+        )
+
     # ---------- Run click ----------
     if clicked:
         try:
@@ -1963,100 +1184,84 @@ def render_run_tab(state: dict):
                 st.error("Please paste at least one address or link and/or upload a CSV.")
                 st.stop()
 
-            defaults = {"city": "", "state": "", "zip": ""}
-            total = len(rows_in)
-            results: List[Dict[str, Any]] = []
-
-            prog = st.progress(0, text="Resolving to Zillow…")
-            for i, row in enumerate(rows_in, start=1):
-                url_in = ""
-                url_in = url_in or get_first_by_keys(row, URL_KEYS)
-                url_in = url_in or row.get("source_url", "")
-                if url_in and is_probable_url(url_in):
-                    zurl, used_addr = resolve_from_source_url(url_in, defaults)
-                    results.append(
-                        {
-                            "input_address": used_addr or row.get("address", "") or "",
-                            "mls_id": get_first_by_keys(row, MLS_ID_KEYS),
-                            "zillow_url": zurl,
-                            "status": "",
-                            "csv_photo": get_first_by_keys(row, PHOTO_KEYS),
-                        }
-                    )
-                else:
-                    res = process_single_row(
-                        row,
-                        delay=0.45,
-                        land_mode=True,
-                        defaults=defaults,
-                        require_state=True,
-                        mls_first=True,
-                        default_mls_name="",
-                        max_candidates=20,
-                    )
-                    results.append(res)
-                prog.progress(i / total, text=f"Resolved {i}/{total}")
-            prog.progress(1.0, text="Links resolved")
-
-            for r in results:
-                for key in ("zillow_url", "display_url"):
-                    if r.get(key):
-                        r[key] = upgrade_to_homedetails_if_needed(r[key])
-
-            if enrich_details:
-                st.write("Enriching details (parallel)…")
-                results = asyncio.run(enrich_results_async(results))
-
-            for r in results:
-                base = r.get("zillow_url")
-                r["preview_url"] = make_preview_url(base) if base else ""
-                display = make_trackable_url(base, client_tag, campaign_tag) if base else base
-                if use_shortlinks and display:
-                    short = bitly_shorten(display)
-                    r["display_url"] = short or display
-                else:
-                    r["display_url"] = display or base
-
-            # ---- Mark duplicates & toured for the *view* client only (no logging here)
-            client_selected = bool(client_tag.strip())
-            tour_map = get_tour_slug_map(client_tag) if client_selected else {}
-            if client_selected:
-                canon_set, zpid_set, canon_info, zpid_info = get_already_sent_maps(
-                    client_tag
-                )
-                results = mark_duplicates(
-                    results, canon_set, zpid_set, canon_info, zpid_info
+            direct = sum(1 for r in rows_in if route_row(r)[0] == "zillow")
+            if direct:
+                st.caption(f"{direct} Zillow listing link(s) used as-is (no lookup needed).")
+
+            configure_host_limits(default=per_host_limit)
+            batch_kw = dict(
+                defaults={"city": "", "state": "", "zip": ""},
+                use_cache=use_cache,
+                force=retry_misses,
+                full_pages=enrich_details,
+                max_workers=max_workers,
+                row_budget=row_budget,
+                batch_budget=batch_budget,
+                **RUN_ROW_OPTIONS,
+            )
+            if run_in_background:
+                job_id = jobs.submit(
+                    rows_in,
+                    meta={"csv_rows": csv_rows_count if file is not None else None, "enrich": enrich_details},
+                    **batch_kw,
                 )
-                for r in results:
-                    info = tour_map.get(result_to_slug(r), {})
-                    r["toured"] = bool(info)
-                    r["toured_date"] = info.get("date") if info else ""
-                    r["toured_start"] = info.get("start") if info else ""
-                    r["toured_end"] = info.get("end") if info else ""
-                if only_show_new:
-                    results = [r for r in results if not r.get("already_sent")]
+                st.session_state["__run_job__"] = {"id": job_id}
+                # survives a browser refresh too
+                st.query_params["job"] = job_id
+                _job_progress(job_id)
             else:
-                for r in results:
-                    r["already_sent"] = False
-                    r["toured"] = False
-
-            st.success(
-                f"Processed {len(results)} item(s)"
-                + (f" — CSV rows read: {csv_rows_count}" if file is not None else "")
-            )
+                cache_before = resolution_cache.stats()
+                journal = Journal(rows_in, batch_kw)
+                if journal.resumed:
+                    st.info(f"Resuming an interrupted run of this input: {journal.resumed} row(s) already done.")
+                prog = st.progress(0, text="Resolving to Zillow…")
+                results = resolve_batch(
+                    rows_in,
+                    on_progress=lambda done, n: prog.progress(done / n, text=f"Resolved {done}/{n}"),
+                    journal=journal,
+                    **batch_kw,
+                )
+                prog.progress(1.0, text="Links resolved")
+                if use_cache:
+                    cache_after = resolution_cache.stats()
+                    st.caption(
+                        f"Cache: {cache_after['hits'] - cache_before['hits']} hit(s), "
+                        f"{cache_after['misses'] - cache_before['misses']} miss(es) this run"
+                    )
+                _finish_run(results, csv_rows_count if file is not None else None, enrich_details)
 
-            _render_results_and_downloads(
-                results,
-                client_tag,
-                campaign_tag,
-                include_notes=enrich_details,
-                client_selected=client_selected,
-            )
+        except Exception as e:
+            st.error("We hit an error while processing.")
+            with st.expander("Details"):
+                st.exception(e)
 
+    # ---------- Background run in progress / finished ----------
+    job_info = st.session_state.get("__run_job__") or {}
+    job_id = job_info.get("id") or st.query_params.get("job")
+    job = jobs.status(job_id) if job_id and not clicked else None
+    if job_id and not clicked and not job:
+        st.session_state.pop("__run_job__", None)
+        st.query_params.pop("job", None)
+    elif job and job["status"] not in jobs.FINISHED:
+        _job_progress(job_id)
+        return
+    elif job:
+        st.session_state.pop("__run_job__", None)
+        st.query_params.pop("job", None)
+        if job["status"] == jobs.FAILED:
+            st.error(f"Background run failed: {job.get('error') or 'unknown error'}")
+        elif job["status"] in (jobs.CANCELLED, jobs.INTERRUPTED):
+            st.warning(f"Background run {job['status']}; showing the {job.get('done', 0)} row(s) it finished.")
+        try:
+            # read back from the job record: session_state is gone after a refresh
+            meta = job.get("meta") or {}
+            _finish_run(jobs.results(job_id), meta.get("csv_rows"), bool(meta.get("enrich")))
         except Exception as e:
             st.error("We hit an error while processing.")
             with st.expander("Details"):
                 st.exception(e)
+        jobs.forget(job_id)
+        return
 
     data = st.session_state.get("__results__") or {}
     results = data.get("results") or []
@@ -4,10 +4,11 @@ from datetime import datetime, date
 from html import escape
 from typing import List, Dict, Any, Optional, Tuple
 
-import requests
 import streamlit as st
 from supabase import create_client, Client
 
+from services.transport import http_get
+
 # ---------- Optional PDF support ----------
 try:
     import PyPDF2  # add PyPDF2 to requirements.txt if you want PDF parsing
@@ -148,7 +149,7 @@ def _html_to_text(html: str) -> str:
 
 def _fetch_html(url: str) -> str:
     try:
-        r = requests.get(url, timeout=12, headers={
+        r = http_get(url, timeout=12, headers={
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126 Safari/537.36"
         })
         return r.text if r.ok else ""
@@ -82,13 +82,14 @@ def generate_address_variants(street, city, state, zipc, defaults):
     core = re.sub(r'\bu\.?s\.?\b', 'US', core, flags=re.I)
     core = re.sub(r'\bhwy\b', 'highway', core, flags=re.I)
     core = re.sub(r'\b([NSEW])\b', lambda m: DIR_MAP.get(m.group(1).lower(), m.group(1)), core, flags=re.I)
-    variants = {core, re.sub(r'\bhighway\b', 'hwy', core, flags=re.I)}
-    lot_variants = set(variants)
+    # ordered (not sets) so variants[0] -- the cache key / query address -- is stable across runs
+    variants = list(dict.fromkeys([core, re.sub(r'\bhighway\b', 'hwy', core, flags=re.I)]))
+    lot_variants = list(variants)
     if lot_num:
-        for v in list(variants):
-            lot_variants.update({f"lot {lot_num} {v}", f"{v} lot {lot_num}", f"lot-{lot_num} {v}"})
-    stripped_variants = { LOT_REGEX.sub('', v).strip() for v in list(lot_variants) }
-    all_street_variants = lot_variants | stripped_variants
+        for v in variants:
+            lot_variants += [f"lot {lot_num} {v}", f"{v} lot {lot_num}", f"lot-{lot_num} {v}"]
+    stripped_variants = [LOT_REGEX.sub('', v).strip() for v in lot_variants]
+    all_street_variants = dict.fromkeys(lot_variants + stripped_variants)
     out = []
     for sv in all_street_variants:
         parts = [sv] + [p for p in [city, st, z] if p]
@@ -1,9 +1,13 @@
 # utils/address_parser.py
 # Public API:
-#   - extract_address(url: str, parse_html: bool = True, timeout: float = 12.0) -> Dict[str, Optional[str]]
+#   - extract_address(url: str, parse_html: bool = True, timeout: float = 12.0, fetch: Optional[Fetch] = None) -> Dict[str, Optional[str]]
 #       Returns: {"full","streetAddress","addressLocality","addressRegion","postalCode","source","url_final"}
 #   - address_to_zillow_rb(addr: Dict[str, Optional[str]], default_state: str = "NC") -> str
-#   - address_as_markdown_link(url: str, label: Optional[str] = None, parse_html: bool = True, timeout: float = 12.0)
+#   - address_as_markdown_link(url: str, label: Optional[str] = None, parse_html: bool = True, timeout: float = 12.0, fetch: Optional[Fetch] = None)
+#
+# `fetch(url, headers=, timeout=) -> (final_url, html, status)` defaults to a GET on the pooled
+# sessions (services.transport.http_get); the app passes its shared page cache
+# (services.page_cache.fetch_page) instead.
 #
 # This module focuses on being resilient for IDX/Homespotter ("l.hms.pt", "idx.homespotter.com") pages.
 # Strategy:
@@ -20,9 +24,10 @@ from __future__ import annotations
 
 import re
 import json
-from typing import Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, Optional, Tuple
 from urllib.parse import urlparse, unquote
-import requests
+
+from services.transport import http_get
 
 try:
     from bs4 import BeautifulSoup  # type: ignore
@@ -36,6 +41,8 @@ UA_HEADERS = {
     "Cache-Control": "no-cache",
 }
 
+Fetch = Callable[..., Tuple[str, str, int]]
+
 def _normalize(d: Dict[str, Optional[str]]) -> Optional[str]:
     """Return a single 'full' string if we have enough parts; else None."""
     street = (d.get("streetAddress") or "").strip()
@@ -241,20 +248,20 @@ def _addr_from_hs_specific(soup) -> Optional[Dict[str, str]]:
                     return cand
     return None
 
-def _fetch_html(url: str, timeout: float = 12.0) -> Tuple[str, str, int]:
+def _fetch_html(url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 12.0) -> Tuple[str, str, int]:
     try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=timeout, allow_redirects=True)
+        r = http_get(url, headers=headers or UA_HEADERS, timeout=timeout, allow_redirects=True)
         return r.url, (r.text if r.ok else ""), r.status_code
     except Exception:
         return url, "", 0
 
-def extract_address(url: str, parse_html: bool = True, timeout: float = 12.0) -> Dict[str, Optional[str]]:
+def extract_address(url: str, parse_html: bool = True, timeout: float = 12.0, fetch: Optional[Fetch] = None) -> Dict[str, Optional[str]]:
     """
     Expand a URL and try *hard* to extract a postal address from the landing page.
     Works well with Homespotter IDX links and many other listing providers.
     Returns a dict containing components and a 'full' normalized string when possible.
     """
-    final_url, html, _ = _fetch_html(url, timeout=timeout)
+    final_url, html, _ = (fetch or _fetch_html)(url, headers=UA_HEADERS, timeout=timeout)
     info: Dict[str, Optional[str]] = {
         "full": None, "streetAddress": None, "addressLocality": None,
         "addressRegion": None, "postalCode": None, "source": None,
@@ -327,8 +334,9 @@ def address_to_zillow_rb(addr: Dict[str, Optional[str]], default_state: str = "N
     slug = _slugify(", ".join(parts))
     return f"https://www.zillow.com/homes/{slug}_rb/"
 
-def address_as_markdown_link(url: str, label: Optional[str] = None, parse_html: bool = True, timeout: float = 12.0) -> Tuple[str, Dict[str, Optional[str]]]:
-    info = extract_address(url, parse_html=parse_html, timeout=timeout)
+def address_as_markdown_link(url: str, label: Optional[str] = None, parse_html: bool = True, timeout: float = 12.0,
+                             fetch: Optional[Fetch] = None) -> Tuple[str, Dict[str, Optional[str]]]:
+    info = extract_address(url, parse_html=parse_html, timeout=timeout, fetch=fetch)
     text = label or info.get("full")
     if not text:
         netloc = urlparse(info.get("url_final") or url).netloc or "Listing"
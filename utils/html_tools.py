@@ -4,8 +4,9 @@ from __future__ import annotations
 
 import re
 import json
-from typing import Any, Dict, List, Optional, Tuple
-import requests
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.transport import http_get
 
 UA_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
@@ -14,9 +15,12 @@ UA_HEADERS = {
     "Cache-Control": "no-cache",
 }
 
-def expand_url_and_fetch_html(url: str, timeout: float = 12.0) -> Tuple[str, str, int]:
+def expand_url_and_fetch_html(url: str, timeout: float = 12.0,
+                              fetch: Optional[Callable[..., Tuple[str, str, int]]] = None) -> Tuple[str, str, int]:
+    """`fetch(url, headers=, timeout=)`: e.g. services.page_cache.fetch_page; a GET on the pooled sessions otherwise."""
+    if fetch: return fetch(url, headers=UA_HEADERS, timeout=timeout)
     try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=timeout, allow_redirects=True)
+        r = http_get(url, headers=UA_HEADERS, timeout=timeout, allow_redirects=True)
         return r.url, (r.text if r.ok else ""), r.status_code
     except Exception:
         return url, "", 0
@@ -1,7 +1,7 @@
 # utils/showingtime.py
 import re
 from typing import List, Dict, Any, Tuple, Optional
-import requests
+from services.transport import http_get
 
 UA = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
@@ -9,7 +9,7 @@ UA = {
 
 def fetch_html(url: str) -> str:
     try:
-        r = requests.get(url, headers=UA, timeout=15)
+        r = http_get(url, headers=UA, timeout=15)
         if r.ok:
             return r.text
     except Exception:
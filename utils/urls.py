@@ -1,5 +1,6 @@
-import re, requests
+import re
 from core.config import REQUEST_TIMEOUT
+from services.transport import http_get
 UA_HEADERS = {"User-Agent": "Mozilla/5.0 ..."}
 
 ZPID_RE = re.compile(r'(\d{6,})_zpid', re.I)
@@ -19,12 +20,16 @@ def make_preview_url(url: str) -> str:
     canon, _ = canonicalize_zillow(base)
     return canon if "/homedetails/" in canon else base
 
-def upgrade_to_homedetails_if_needed(url: str) -> str:
-    if not url or "/homedetails/" in url: return url
+def _get_html(url, headers=None, timeout=REQUEST_TIMEOUT):
     try:
-        r = requests.get(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
-        if not r.ok: return url
-        m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', r.text)
-        return m.group(1) if m else url
+        r = http_get(url, headers=headers, timeout=timeout)
+        return r.url, (r.text if r.ok else ""), r.status_code
     except Exception:
-        return url
+        return url, "", 0
+
+def upgrade_to_homedetails_if_needed(url: str, fetch=None) -> str:
+    """`fetch(url, headers=, timeout=) -> (final_url, html, status)`, e.g. services.page_cache.fetch_page."""
+    if not url or "/homedetails/" in url: return url
+    _, html, _ = (fetch or _get_html)(url, headers=UA_HEADERS, timeout=REQUEST_TIMEOUT)
+    m = re.search(r'href="(https://www\.zillow\.com/homedetails/[^"]+)"', html) if html else None
+    return m.group(1) if m else url